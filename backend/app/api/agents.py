@@ -1,4 +1,7 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 
 from ..models import (
@@ -6,15 +9,14 @@ from ..models import (
     ErrorResponse, PersonaUpdateRequest, PersonaUpdateResponse, Persona,
     SettingsUpdateRequest, SettingsUpdateResponse, AgentSettings
 )
-from ..services.agent_service import AgentService
+from ..services.agent_service import AgentService, get_agent_service as _shared_agent_service
 
 router = APIRouter(prefix="/agent", tags=["agent"])
 
 
-def get_agent_service():
+async def get_agent_service() -> AgentService:
     """Dependency function for AgentService - lazy initialization"""
-    # Service is lazy, so __init__ won't fail - GCP clients initialize on first use
-    return AgentService()
+    return _shared_agent_service()
 
 
 @router.post("/create", response_model=AgentCreateResponse)
@@ -72,8 +74,10 @@ async def delete_agent(
         if session_id and agent.session_id != session_id:
             raise HTTPException(status_code=403, detail="Agent not accessible for this session")
         
-        # Delete agent and cascade delete related data
-        success = agent_service.delete_agent(agent_id)
+        # Delete agent and cascade delete related data (blocking Firestore work, off the event loop)
+        success = await asyncio.get_running_loop().run_in_executor(
+            None, agent_service.delete_agent, agent_id
+        )
         
         if success:
             return {"success": True, "message": "Agent deleted successfully", "agent_id": agent_id}
@@ -85,7 +89,7 @@ async def delete_agent(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/{agent_id}/persona", response_model=Persona)
+@router.get("/{agent_id}/persona", response_class=ORJSONResponse, responses={200: {"model": Persona}})
 async def get_persona(
     agent_id: str,
     agent_service: AgentService = Depends(get_agent_service)
@@ -97,7 +101,8 @@ async def get_persona(
         persona = agent_service.get_persona(agent_id)
         if not persona:
             raise HTTPException(status_code=404, detail="Persona not found")
-        return persona
+        # Already a validated Persona - serialize once, skipping response_model re-validation
+        return ORJSONResponse(content=persona.model_dump(mode="json"))
     except HTTPException:
         raise
     except Exception as e:
@@ -138,7 +143,7 @@ async def update_persona(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/{agent_id}/settings", response_model=AgentSettings)
+@router.get("/{agent_id}/settings", response_class=ORJSONResponse, responses={200: {"model": AgentSettings}})
 async def get_settings(
     agent_id: str,
     agent_service: AgentService = Depends(get_agent_service)
@@ -149,7 +154,7 @@ async def get_settings(
     """
     try:
         settings = agent_service.get_settings(agent_id)
-        return settings
+        return ORJSONResponse(content=settings.model_dump(mode="json"))
     except HTTPException:
         raise
     except Exception as e:
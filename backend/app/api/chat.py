@@ -1,24 +1,31 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+import json
+import asyncio
+from functools import partial
+
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from typing import Optional, List
 
 from ..models import (
     ChatRequest, ChatResponse, ChatTeachRequest, ChatTeachResponse,
+    ChatTeachBatchResponse,
     ErrorResponse
 )
-from ..services.chat_service import ChatService
+from ..services.chat_service import ChatService, get_chat_service as _shared_chat_service
 
 router = APIRouter(prefix="/chat", tags=["agent"])
 
 
-def get_chat_service():
+async def get_chat_service() -> ChatService:
     """Dependency function for ChatService - lazy initialization"""
-    # Service is lazy, so __init__ won't fail - GCP clients initialize on first use
-    return ChatService()
+    return _shared_chat_service()
 
 
 @router.post("", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
+    background_tasks: BackgroundTasks,
     chat_service: ChatService = Depends(get_chat_service)
 ):
     """
@@ -30,10 +37,15 @@ async def chat(
     3. Evaluates rules
     4. If rule matched: executes DO action (possibly skips LLM)
     5. Else: embeds message, retrieves KB, builds prompt, calls Vertex AI
-    6. Logs full trace
+    6. Logs full trace (in the background, after the response is sent)
     """
     try:
-        result = chat_service.chat(request)
+        # chat() does blocking Vertex AI / Firestore I/O - keep it off the event loop
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, partial(chat_service.chat, request, defer_log=True)
+        )
+        # The trace write isn't needed for the reply - persist it after the response is sent
+        background_tasks.add_task(chat_service.persist_chat_log, result["chat_log"])
         return ChatResponse(
             response=result["response"],
             trace=result["trace"],
@@ -44,6 +56,61 @@ async def chat(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
+    chat_service: ChatService = Depends(get_chat_service)
+):
+    """
+    Chat with an agent, streaming the answer as Server-Sent Events.
+    
+    Emits `{"delta": ...}` events while the LLM generates, then a final
+    `{"done": true, "response", "trace", "images", "chat_id"}` event carrying
+    the complete response (which may include follow-up questions or citations).
+    The chat log is written after the stream completes.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    def on_delta(text: str):
+        loop.call_soon_threadsafe(queue.put_nowait, text)
+    
+    future = loop.run_in_executor(None, partial(chat_service.chat, request, on_delta=on_delta, defer_log=True))
+    background_tasks = BackgroundTasks()
+    # Deltas are queued via call_soon_threadsafe, so this sentinel always lands after them
+    future.add_done_callback(lambda _: queue.put_nowait(None))
+    
+    async def events():
+        while (delta := await queue.get()) is not None:
+            yield f"data: {json.dumps({'delta': delta})}\n\n"
+        
+        try:
+            result = future.result()
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            return
+        
+        # Runs once the stream has been fully sent
+        background_tasks.add_task(chat_service.persist_chat_log, result["chat_log"])
+        
+        final = jsonable_encoder({
+            "done": True,
+            "response": result["response"],
+            "trace": result["trace"],
+            "images": result.get("images", []),
+            "chat_id": result.get("chat_id")
+        })
+        yield f"data: {json.dumps(final)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # identity encoding keeps GZipMiddleware from buffering the event stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Content-Encoding": "identity"},
+        background=background_tasks
+    )
+
+
 @router.post("/teach", response_model=ChatTeachResponse)
 async def teach_agent(
     request: ChatTeachRequest,
@@ -59,7 +126,9 @@ async def teach_agent(
     4. Stores in knowledge base
     """
     try:
-        knowledge_id = chat_service.teach_from_chat(
+        knowledge_id = await asyncio.get_running_loop().run_in_executor(
+            None,
+            chat_service.teach_from_chat,
             request.agent_id,
             request.chat_id,
             request.approved_response
@@ -72,23 +141,61 @@ async def teach_agent(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/history")
+@router.post("/teach/batch", response_model=ChatTeachBatchResponse)
+async def teach_agent_batch(
+    requests: List[ChatTeachRequest],
+    chat_service: ChatService = Depends(get_chat_service)
+):
+    """
+    Teach agents from many approved chat responses at once.
+    
+    Embeddings are generated with one batched Vertex AI call per agent
+    and the knowledge entries are written with Firestore batches.
+    """
+    if not requests:
+        raise HTTPException(status_code=400, detail="No chats to teach")
+    
+    try:
+        knowledge_ids = await asyncio.get_running_loop().run_in_executor(
+            None, chat_service.teach_from_chat_batch, requests
+        )
+        return ChatTeachBatchResponse(
+            knowledge_ids=knowledge_ids,
+            message=f"Agent taught from {len(knowledge_ids)} chats"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/history", response_class=ORJSONResponse)
 async def get_chat_history(
     agent_id: str = Query(..., description="Agent ID"),
     session_id: str = Query(..., description="Session ID"),
-    limit: int = Query(50, description="Maximum number of messages to return"),
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of chats to return"),
+    before: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
     chat_service: ChatService = Depends(get_chat_service)
 ):
     """
     Get chat history for a specific agent and session.
     
-    Returns chat messages in chronological order.
+    Returns the most recent chats in chronological order. Pass `next_cursor`
+    back as `before` to load older history.
     """
+    cursor = None
+    if before:
+        try:
+            cursor = ChatService.decode_history_cursor(before)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
     try:
-        messages = chat_service.get_chat_history(agent_id, session_id, limit)
+        page = await asyncio.get_running_loop().run_in_executor(
+            None, chat_service.get_chat_history, agent_id, session_id, limit, cursor
+        )
         return {
-            "messages": messages,
-            "count": len(messages)
+            "messages": page["messages"],
+            "count": len(page["messages"]),
+            "next_cursor": page["next_cursor"]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get chat history: {str(e)}")
@@ -106,7 +213,9 @@ async def clear_chat_history(
     Deletes all chat logs for the given agent/session combination.
     """
     try:
-        deleted_count = chat_service.clear_chat_history(agent_id, session_id)
+        deleted_count = await asyncio.get_running_loop().run_in_executor(
+            None, chat_service.clear_chat_history, agent_id, session_id
+        )
         return {
             "success": True,
             "deleted_count": deleted_count,
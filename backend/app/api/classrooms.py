@@ -1,36 +1,59 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 
 from ..models import Classroom, ClassroomResponse
-from ..services.teacher_service import TeacherService
-from ..services.student_service import StudentService
+from ..services.response_cache import get_classroom_response_cache
+from ..services.teacher_service import TeacherService, get_teacher_service as _shared_teacher_service
+from ..services.student_service import StudentService, get_student_service as _shared_student_service
 
 router = APIRouter(prefix="/api/classrooms", tags=["classrooms"])
 
 
 # Dependency to get services
-def get_teacher_service():
-    return TeacherService()
+async def get_teacher_service() -> TeacherService:
+    return _shared_teacher_service()
 
-def get_student_service():
-    return StudentService()
+
+async def get_student_service() -> StudentService:
+    return _shared_student_service()
+
+
+CLASSROOM_CACHE_CONTROL = "private, max-age=30"
+
+
+def _cached_response(request: Request, etag: str, body: bytes) -> Response:
+    """Serve a cached body, or an empty 304 when the client already has it"""
+    headers = {"ETag": etag, "Cache-Control": CLASSROOM_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.get("/{hashcode}")
 async def get_classroom_by_hashcode(
     hashcode: str,
+    request: Request,
     teacher_service: TeacherService = Depends(get_teacher_service)
 ):
     """Get classroom information by hashcode (for student join)"""
     try:
-        classroom_info = await teacher_service.get_classroom_by_hashcode(hashcode)
-        if not classroom_info:
-            raise HTTPException(status_code=404, detail="Classroom not found")
+        cache = get_classroom_response_cache()
+        cache_key = f"hashcode:{hashcode}"
+        cached = cache.get(cache_key)
+        if cached is None:
+            classroom_info = await teacher_service.get_classroom_by_hashcode(hashcode)
+            if not classroom_info:
+                raise HTTPException(status_code=404, detail="Classroom not found")
+            
+            cached = cache.put(cache_key, {
+                "success": True,
+                "data": classroom_info
+            }, tag=classroom_info['classroom_id'])
         
-        return {
-            "success": True,
-            "data": classroom_info
-        }
+        return _cached_response(request, *cached)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -38,37 +61,47 @@ async def get_classroom_by_hashcode(
 @router.get("/{classroom_id}/students")
 async def get_classroom_students(
     classroom_id: str,
+    request: Request,
     student_service: StudentService = Depends(get_student_service)
 ):
     """Get all students in a specific classroom"""
     try:
-        students = await student_service.get_students_by_classroom(classroom_id)
-        return {
-            "success": True,
-            "data": students,
-            "total_students": len(students)
-        }
+        cache = get_classroom_response_cache()
+        cache_key = f"students:{classroom_id}"
+        cached = cache.get(cache_key)
+        if cached is None:
+            students = await student_service.get_students_by_classroom(classroom_id)
+            cached = cache.put(cache_key, {
+                "success": True,
+                "data": students,
+                "total_students": len(students)
+            }, tag=classroom_id)
+        
+        return _cached_response(request, *cached)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/{classroom_id}/projects")
+@router.get("/{classroom_id}/projects", response_class=ORJSONResponse)
 async def get_classroom_projects(
     classroom_id: str,
     student_service: StudentService = Depends(get_student_service)
 ):
     """Get all projects in a specific classroom"""
     try:
-        # Get all students in the classroom
-        students = await student_service.get_students_by_classroom(classroom_id)
+        # Only the id and name of each student are needed here
+        students = await student_service.get_classroom_roster(classroom_id)
+        
+        # Fetch every student's projects in one batched query instead of one per student
+        projects_by_student = await student_service.get_projects_by_student_ids(
+            [student['student_id'] for student in students]
+        )
         
-        # Collect all projects from all students
         all_projects = []
         for student in students:
-            student_projects = await student_service.get_student_projects(student.student_id)
-            for project in student_projects:
-                project['student_name'] = student.name
-                project['student_id'] = student.student_id
+            for project in projects_by_student.get(student['student_id'], []):
+                project['student_name'] = student.get('name')
+                project['student_id'] = student['student_id']
                 all_projects.append(project)
         
         return {
@@ -89,6 +122,9 @@ async def update_classroom(
 ):
     """Update classroom information (name, status)"""
     try:
+        # Cached classroom reads must not outlive a change to the classroom
+        get_classroom_response_cache().invalidate(classroom_id)
+        
         # This would need to be implemented in TeacherService
         # For now, return not implemented
         raise HTTPException(status_code=501, detail="Update classroom not implemented yet")
@@ -103,6 +139,9 @@ async def delete_classroom(
 ):
     """Delete classroom and remove all students"""
     try:
+        # Cached classroom reads must not outlive a change to the classroom
+        get_classroom_response_cache().invalidate(classroom_id)
+        
         # This would need to be implemented in TeacherService
         # For now, return not implemented
         raise HTTPException(status_code=501, detail="Delete classroom not implemented yet")
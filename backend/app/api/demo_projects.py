@@ -1,16 +1,17 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 
 from ..models import (
     DemoProject, DemoProjectCreate, DemoProjectResponse,
     DemoProjectListResponse
 )
-from ..services.demo_project_service import DemoProjectService
+from ..services.demo_project_service import DemoProjectService, get_demo_project_service as _shared_demo_project_service
 
 router = APIRouter(prefix="/api/demo-projects", tags=["demo-projects"])
 
-def get_demo_project_service():
-    return DemoProjectService()
+async def get_demo_project_service() -> DemoProjectService:
+    return _shared_demo_project_service()
 
 @router.post("/classrooms/{classroom_id}", response_model=DemoProjectResponse, status_code=201)
 async def create_demo_project(
@@ -56,7 +57,7 @@ async def get_classroom_demos(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/students/{student_id}", response_model=DemoProjectListResponse)
+@router.get("/students/{student_id}", response_model=None, response_class=ORJSONResponse)
 async def get_student_accessible_demos(
     student_id: str,
     demo_project_service: DemoProjectService = Depends(get_demo_project_service)
@@ -64,7 +65,8 @@ async def get_student_accessible_demos(
     """Get all demo projects accessible to a specific student"""
     try:
         demos = await demo_project_service.get_student_accessible_demos(student_id)
-        return DemoProjectListResponse(data=demos)
+        # Demos are already validated models - dump once instead of re-validating via response_model
+        return {"success": True, "data": [demo.model_dump(mode="json") for demo in demos]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
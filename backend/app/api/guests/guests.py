@@ -1,26 +1,42 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Depends, Request
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Depends, Request, Response
+from fastapi.responses import ORJSONResponse, RedirectResponse, StreamingResponse
+from typing import List, Optional, Tuple
 import json
+import hashlib
 import logging
 import asyncio
-from datetime import datetime, timezone
+import functools
+import mimetypes
+import os
+import re
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
 import uuid
 from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import aiohttp
+import google.auth.credentials
+import google.auth.transport.requests
+from google.cloud.exceptions import NotFound
+from pydantic import TypeAdapter, ValidationError
 
 from ...models import (
     Project, ProjectCreate, ProjectUpdate, ProjectListResponse, 
     ProjectResponse, ProjectStatusResponseWrapper, TrainingConfig,
     FileUploadResponse, TrainingResponse, ErrorResponse,
     ExampleAdd, ExamplesBulkAdd, PredictionRequest, PredictionResponse,
-    GuestSessionResponse, TrainedModel, Dataset, TextExample, GuestUpdate,
-    PaginationInfo
+    GuestSessionResponse, TrainedModel, Dataset, TextExample, GuestProjectView,
+    ProjectType, ImageUrlAdd, ImageUrlsBulkAdd, TEACHABLE_MACHINE_TYPES, TEACHABLE_MACHINE_URL_PREFIX
 )
-from ...services.guest_service import GuestService
-from ...services.project_service import ProjectService
-from ...training_service import trainer, distilbert_trainer
-from ...image_training_service import image_trainer
+from ...services.guest_service import GuestService, get_guest_service as _shared_guest_service
+from ...services.project_service import ProjectService, get_project_service as _shared_project_service
+from ...services.response_cache import get_guest_projects_response_cache
+from ...services.gcs_io import gcs_call
+from ...services.image_embeddings import embeddings_dir, embedding_prefix, delete_embeddings
 from ...training_job_service import training_job_service
-from ...config import gcp_clients
+from ...config import gcp_clients, settings
 
 router = APIRouter(prefix="/api/guests", tags=["guests"])
 
@@ -30,13 +46,203 @@ logger = logging.getLogger(__name__)
 # Thread pool executor for concurrent training (allows multiple trainings to run simultaneously)
 _training_executor = ThreadPoolExecutor(max_workers=15, thread_name_prefix="training")
 
+# Separate small pool for model inference so predictions never queue behind training jobs
+_prediction_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="predict")
+
+# Project types accepted by the ProjectType enum
+_VALID_TYPES = frozenset(t.value for t in ProjectType)
+
+# Per-image upload limit (files and URL downloads), images per upload, and per-dataset limit
+_MAX_IMAGE_BYTES = 10 * 1024 * 1024
+_MAX_IMAGES_PER_UPLOAD = 20
+_MAX_DATASET_BYTES = 100 * 1024 * 1024
+
+# Accepted upload content types, and the extension given to extension-less image filenames
+_ALLOWED_DATASET_TYPES = frozenset({
+    'text/csv',
+    'application/json',
+    'text/plain',
+    'application/vnd.ms-excel',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+})
+_ALLOWED_IMAGE_TYPES = frozenset({'image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp'})
+_EXT_BY_CTYPE = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+}
+
+# Served images: GCS range-request size, and the size of each chunk handed to the client
+_IMAGE_DOWNLOAD_CHUNK = 256 * 1024
+_IMAGE_STREAM_CHUNK = 64 * 1024
+
+# Lifetime of the signed GCS URLs guest images are redirected to
+_SIGNED_IMAGE_URL_TTL = timedelta(minutes=15)
+
+# Set on the first signing failure so later image requests proxy without retrying
+_image_url_signing_failed = False
+
+# gs://<bucket>/<object>, capturing both parts
+_GCS_URL_RE = re.compile(r'^gs://([^/]+)/(.+)$')
+
+# Validates a whole stored example list in one pass
+_TEXT_EXAMPLES_ADAPTER = TypeAdapter(List[TextExample])
+
+# Text projects with more examples than this are trained by the worker queue, not in the request
+_INLINE_TRAINING_MAX_EXAMPLES = 500
+
+
+def _inline_job_id(prefix: str, project_id: str) -> str:
+    """Job id for training run inline in the request; unique even for re-submits within the same second"""
+    return f"{prefix}-{project_id}-{time.monotonic_ns():x}-{secrets.token_hex(3)}"
+
+def _validate_tm_link(link: Optional[str], project_type: str) -> None:
+    """Raise a 400 unless link is a Teachable Machine URL"""
+    if not link:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"teachable_machine_link is required for {project_type} projects"
+        )
+    if not link.startswith(TEACHABLE_MACHINE_URL_PREFIX):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid teachable machine link. Must be a valid Teachable Machine URL starting with '{TEACHABLE_MACHINE_URL_PREFIX}'"
+        )
+
+def _build_filters(session_id: str, status: Optional[str], type_: Optional[str]) -> dict:
+    """Build the canonical project filter dict for a guest session (unset filters are omitted)"""
+    filters = {'guest_session_id': session_id}
+    if status:
+        filters['status'] = status
+    if type_:
+        filters['type'] = type_
+    return filters
+
+@functools.lru_cache(maxsize=32)
+def _ext_for(ctype: str) -> str:
+    """File extension for an image content type (known types first, then mimetypes, then .jpg)"""
+    return _EXT_BY_CTYPE.get(ctype) or mimetypes.guess_extension(ctype) or '.jpg'
+
+
+def _reject_oversized_body(request: Request, max_bytes: int, detail: str) -> None:
+    """Raise a 413 when the declared Content-Length exceeds max_bytes"""
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=detail)
+
+
+def _sign_image_url(blob, filename: str) -> str:
+    """Short-lived V4 GET URL for an image blob (blocking - call through gcs_call)
+    
+    Credentials without a private key, such as Cloud Run's default service account, sign
+    through the IAM signBlob API with the account email and a current access token.
+    """
+    credentials = blob.client._credentials
+    iam_signing = {}
+    if not isinstance(credentials, google.auth.credentials.Signing):
+        # Metadata-server credentials only learn their real email on refresh
+        if not credentials.valid or getattr(credentials, "service_account_email", "default") == "default":
+            credentials.refresh(google.auth.transport.requests.Request())
+        iam_signing = {"service_account_email": credentials.service_account_email, "access_token": credentials.token}
+    return blob.generate_signed_url(
+        version="v4",
+        expiration=_SIGNED_IMAGE_URL_TTL,
+        method="GET",
+        response_disposition=f'inline; filename="{filename}"',
+        **iam_signing
+    )
+
+
+async def _download_image_to_gcs(
+    http_session: aiohttp.ClientSession,
+    project_service: ProjectService,
+    image_url: str,
+    gcs_dir: str,
+    default_stem: str
+) -> dict:
+    """Stream one remote image into GCS under gcs_dir; any failure is raised as a 400"""
+    # Validate URL
+    if not image_url.startswith(('http://', 'https://')):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid URL format. Must start with http:// or https://"
+        )
+    
+    # Download image from URL with the shared app-wide client
+    try:
+        async with http_session.get(image_url) as response:
+            if response.status != 200:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Failed to download image from URL. HTTP {response.status}"
+                )
+            
+            # Get content type
+            content_type = response.headers.get('content-type', 'image/jpeg')
+            
+            # Validate content type (ignoring parameters such as charset)
+            ctype = content_type.partition(';')[0].strip().lower()
+            if ctype not in _ALLOWED_IMAGE_TYPES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid image type: {content_type}. Only JPEG, PNG, GIF, and WebP images are allowed."
+                )
+            
+            # Reject early when the server announces an oversized body
+            content_length = response.headers.get('content-length')
+            if content_length and content_length.isdigit() and int(content_length) > _MAX_IMAGE_BYTES:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Image is too large. Maximum size is 10MB."
+                )
+            
+            # Name the object after the URL, with a unique suffix: concurrent downloads of
+            # URLs sharing a basename (".../image.jpg", ".../200") must not overwrite each other
+            stem, ext = os.path.splitext(os.path.basename(urlparse(image_url).path))
+            filename = f"{stem or default_stem}_{uuid.uuid4().hex[:8]}{ext or _ext_for(ctype)}"
+            
+            # Pipe the body straight into GCS; the size cap is enforced while streaming
+            gcs_path = f"{gcs_dir}/{filename}"
+            try:
+                size = await project_service.stream_to_blob(gcs_path, response.content, content_type, _MAX_IMAGE_BYTES)
+            except ValueError:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Image is too large. Maximum size is 10MB."
+                )
+            
+            return {
+                "image_url": f"gs://{project_service.bucket.name}/{gcs_path}",
+                "filename": filename,
+                "size": size,
+                "content_type": content_type
+            }
+    
+    except aiohttp.ClientError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to download image from URL: {str(e)}"
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=400,
+            detail="Timeout while downloading image from URL"
+        )
+
+
+# Dependency to get the shared outbound HTTP client (opened at app startup)
+async def get_http_session(request: Request) -> aiohttp.ClientSession:
+    return request.app.state.http
+
 # Dependency to get guest service
-def get_guest_service():
-    return GuestService()
+async def get_guest_service() -> GuestService:
+    return _shared_guest_service()
 
 # Dependency to get project service
-def get_project_service():
-    return ProjectService()
+async def get_project_service() -> ProjectService:
+    return _shared_project_service()
 
 # Session validation dependency
 async def validate_session_dependency(session_id: str, guest_service: GuestService = Depends(get_guest_service)):
@@ -57,6 +263,75 @@ async def validate_session_dependency(session_id: str, guest_service: GuestServi
         raise HTTPException(status_code=500, detail=f"Session validation error: {str(e)}")
 
 
+# Project ownership dependency
+def owned_project(*fields: str, raw: bool = False, cached: bool = False):
+    """Dependency factory every project-scoped guest route loads its project through
+    
+    The session is validated while the project loads. Session errors take precedence;
+    a project that is missing or owned by another session is a 404 either way.
+    
+    By default the typed Project is returned, with ownership part of the query. raw=True
+    returns the stored document instead: with fields, only those field paths (plus
+    id/createdBy) are read, and cached=True lets read-only routes reuse a read from the
+    last couple of seconds.
+    """
+    field_paths = sorted({'id', 'createdBy', *fields}) if fields else None
+    
+    async def load(project_id: str, session_id: str, guest_service: GuestService, project_service: ProjectService):
+        if not raw:
+            # A foreign project is never read
+            return await project_service.get_project_if_owned(project_id, session_id)
+        fetch = guest_service.get_guest_project_cached if cached else guest_service.get_guest_project_by_id
+        guest_project = await fetch(project_id, field_paths)
+        if guest_project and guest_project.get('createdBy') == f"guest:{session_id}":
+            return guest_project
+        return None
+    
+    async def dependency(
+        project_id: str,
+        session_id: str,
+        guest_service: GuestService = Depends(get_guest_service),
+        project_service: ProjectService = Depends(get_project_service)
+    ):
+        session, project = await asyncio.gather(
+            validate_session_dependency(session_id, guest_service),
+            load(project_id, session_id, guest_service, project_service),
+            return_exceptions=True
+        )
+        if isinstance(session, BaseException):
+            raise session
+        if isinstance(project, BaseException):
+            raise HTTPException(status_code=500, detail=str(project))
+        
+        if not project:
+            logger.error(f"Project {project_id} not found in session {session_id}")
+            raise HTTPException(status_code=404, detail="Project not found")
+        return project
+    
+    return dependency
+
+
+# Typed project
+get_owned_project = owned_project()
+
+# Full stored document, read fresh (training needs dataset.examples)
+get_owned_guest_project = owned_project(raw=True)
+
+
+def guest_route(handler):
+    """Uniform error handling for guest routes: HTTPExceptions pass through, anything else is logged and becomes a 500"""
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await handler(*args, **kwargs)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.exception(f"❌ {handler.__name__} failed")
+            raise HTTPException(status_code=500, detail=str(e))
+    return wrapper
+
+
 # ============================================================================
 # DEBUG ENDPOINTS
 # ============================================================================
@@ -65,7 +340,7 @@ async def validate_session_dependency(session_id: str, guest_service: GuestServi
 async def debug_session(session_id: str):
     """Debug endpoint to check session status"""
     try:
-        guest_service = GuestService()
+        guest_service = _shared_guest_service()
         session = await guest_service.get_simple_guest_session(session_id)
         return {
             "session_id": session_id,
@@ -83,19 +358,13 @@ async def debug_session(session_id: str):
 async def debug_projects(session_id: str):
     """Debug endpoint to check projects without session validation"""
     try:
-        project_service = ProjectService()
-        projects = await project_service.get_projects(
-            limit=10, 
-            offset=0, 
-            status=None, 
-            type=None, 
-            created_by=None, 
-            guest_session_id=session_id
-        )
+        project_service = _shared_project_service()
+        projects_count = await project_service.count_guest_projects(session_id)
+        projects = await project_service.get_guest_project_summaries(session_id, limit=10)
         return {
             "session_id": session_id,
-            "projects_count": len(projects),
-            "projects": [p.model_dump() for p in projects]
+            "projects_count": projects_count,
+            "projects": projects
         }
     except Exception as e:
         return {
@@ -108,39 +377,44 @@ async def debug_projects(session_id: str):
 async def fix_project_types(session_id: str):
     """Fix project types for a session by updating invalid enum values"""
     try:
-        from google.cloud import firestore
-        from ...config import gcp_clients
-        
         db = gcp_clients.get_firestore_client()
         projects_collection = db.collection("projects")
         
-        # Query projects for this session
-        query = projects_collection.where('student_id', '==', session_id)
-        docs = query.get()
+        # Only fetch the malformed projects for this session - Firestore filters out
+        # valid types server-side (needs the student_id + type composite index).
+        # not-in never matches a null type, so those are fetched with a second query.
+        session_query = projects_collection.where('student_id', '==', session_id)
+        docs = (
+            session_query.where('type', 'not-in', list(_VALID_TYPES)).get()
+            + session_query.where('type', '==', None).get()
+        )
+        total_docs = session_query.count().get()[0][0].value
         
-        fixed_count = 0
+        queued_count = 0
         errors = []
         
+        # BulkWriter sends the updates in parallel batches with rate limiting and retries
+        writer = db.bulk_writer()
+        
+        def on_write_error(error, _writer):
+            errors.append(f"Error fixing project {error.operation.reference.id}: {error.message}")
+            return False  # Don't retry - report it instead
+        
+        writer.on_write_error(on_write_error)
+        
         for doc in docs:
-            try:
-                data = doc.to_dict()
-                if 'type' in data and data['type'] not in ['text-recognition', 'image-recognition', 'image-recognition-teachable-machine', 'pose-recognition-teachable-machine', 'classification', 'regression', 'custom']:
-                    # Fix invalid type
-                    old_type = data['type']
-                    data['type'] = 'text-recognition'  # Default to text-recognition
-                    
-                    # Update the document
-                    doc.reference.update({'type': data['type']})
-                    fixed_count += 1
-                    logger.info(f"Fixed project {doc.id}: {old_type} -> {data['type']}")
-                    
-            except Exception as e:
-                errors.append(f"Error fixing project {doc.id}: {str(e)}")
+            # Fix invalid type - default to text-recognition
+            writer.update(doc.reference, {'type': 'text-recognition'})
+            queued_count += 1
+            logger.info(f"Fixing project {doc.id}: {doc.get('type')} -> text-recognition")
+        
+        writer.close()  # Flushes all pending writes
+        fixed_count = queued_count - len(errors)
         
         return {
             "session_id": session_id,
             "fixed_count": fixed_count,
-            "total_docs": len(docs),
+            "total_docs": total_docs,
             "errors": errors
         }
         
@@ -177,7 +451,7 @@ async def create_guest_session(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/session/{session_id}", response_model=GuestSessionResponse)
+@router.get("/session/{session_id}", response_class=ORJSONResponse, responses={200: {"model": GuestSessionResponse}})
 async def get_guest_session(
     session_id: str,
     guest_service: GuestService = Depends(get_guest_service)
@@ -188,7 +462,8 @@ async def get_guest_session(
         if not guest_session:
             raise HTTPException(status_code=404, detail="Guest session not found")
         
-        return GuestSessionResponse(data=guest_session)
+        # Already a validated GuestSession - serialize once, skipping response_model re-validation
+        return ORJSONResponse(content={"success": True, "data": guest_session.model_dump(mode="json")})
     except HTTPException:
         raise
     except Exception as e:
@@ -199,71 +474,76 @@ async def get_guest_session(
 # PROJECT MANAGEMENT
 # ============================================================================
 
-@router.get("/session/{session_id}/projects", response_model=ProjectListResponse)
+@router.get("/session/{session_id}/projects", response_class=ORJSONResponse, responses={200: {"model": ProjectListResponse}})
 async def get_guest_projects(
     session_id: str,
     limit: int = Query(50, ge=1, le=100, description="Number of projects to return"),
-    offset: int = Query(0, ge=0, description="Number of projects to skip"),
+    offset: int = Query(0, ge=0, deprecated=True, description="Number of projects to skip (use cursor instead)"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's pagination.next_cursor"),
     status: Optional[str] = Query(None, description="Filter by project status"),
     type: Optional[str] = Query(None, description="Filter by project type"),
     search: Optional[str] = Query(None, description="Search query"),
     session: dict = Depends(validate_session_dependency),
     project_service: ProjectService = Depends(get_project_service)
 ):
-    """Get all projects for a guest session with optional filtering and search"""
+    """Get all projects for a guest session with optional filtering and search
+    
+    Pages are newest first. Pass `pagination.next_cursor` back as `cursor` to fetch
+    the next page; `offset` is still honoured for older clients.
+    """
+    after = None
+    if cursor:
+        try:
+            after = ProjectService.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
     try:
-        logger.info(f"Getting projects for guest session: {session_id}")
+        # Polling clients repeat the same page request; serve bursts of it from the list
+        # cache. Local writes clear it, and its short TTL bounds staleness from other instances
+        cache = get_guest_projects_response_cache()
+        params = "|".join(str(value) for value in (status, type, search, offset, limit, cursor))
+        cache_key = f"projects:{session_id}:{hashlib.sha1(params.encode('utf-8')).hexdigest()}"
+        cached = cache.get(cache_key)
+        if cached:
+            return Response(content=cached[1], media_type="application/json")
+        
+        next_cursor = None
+        filters = _build_filters(session_id, status, type)
+        logger.info("Getting projects for guest session: %s", session_id)
         if search:
-            # Use search functionality
-            filters = {'guest_session_id': session_id}
-            if status:
-                filters['status'] = status
-            if type:
-                filters['type'] = type
-            
-            all_projects = await project_service.search_projects(search, filters)
-            total = len(all_projects)
-            
-            # Apply pagination to search results
-            projects = all_projects[offset:offset + limit]
-        else:
-            # Get projects directly with guest session filter
-            projects = await project_service.get_projects(
-                limit=limit, 
-                offset=offset, 
-                status=status, 
-                type=type, 
-                created_by=None, 
-                guest_session_id=session_id
+            # Search returns only the requested page plus the total match count
+            projects, total = await project_service.search_projects(search, filters, offset, limit)
+        elif after or offset == 0:
+            # Seek by (createdAt, id) and count in parallel
+            (projects, next_cursor), total = await asyncio.gather(
+                project_service.list_by_session_cursor(filters, after, limit),
+                project_service.count_projects(filters)
             )
-            
-            # For total count, get all projects for this session
-            all_projects = await project_service.get_projects(
-                limit=1000,  # Get all projects to count them
-                offset=0,
-                status=status,
-                type=type,
-                created_by=None,
-                guest_session_id=session_id
-            )
-            total = len(all_projects)
+        else:
+            # Get the page and the exact total for this guest session in one service call
+            projects, total = await project_service.get_projects_with_count(filters, limit=limit, offset=offset)
         
-        logger.info(f"Found {len(projects)} projects for session {session_id}")
-        logger.info(f"Project types: {[p.type for p in projects]}")
-        
-        return ProjectListResponse(
-            data=projects,
-            pagination=PaginationInfo(
-                limit=limit,
-                offset=offset,
-                total=total
-            )
-        )
+        logger.info("Found %d projects for session %s", len(projects), session_id)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Project types: %s", [p.type for p in projects])
+        
+        # Projects are already validated models - dump them once instead of
+        # re-validating through ProjectListResponse
+        payload = {
+            "success": True,
+            "data": [project.model_dump(mode="json") for project in projects],
+            "pagination": {
+                "limit": limit,
+                "offset": offset,
+                "total": total,
+                "next_cursor": next_cursor
+            }
+        }
+        _, body = cache.put(cache_key, payload, tag=session_id)
+        return Response(content=body, media_type="application/json")
     except Exception as e:
-        logger.error(f"Error getting projects for session {session_id}: {str(e)}")
-        logger.error(f"Error type: {type(e)}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception("Error getting projects for session %s", session_id)
         
         # Check if it's a validation error and provide more helpful message
         if "validation error" in str(e).lower():
@@ -325,20 +605,7 @@ async def create_guest_project(
     }
     """
     try:
-        # Validate project type and teachable machine link
-        if project_data.type in ["image-recognition-teachable-machine", "pose-recognition-teachable-machine"]:
-            if not project_data.teachable_machine_link:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"teachable_machine_link is required for {project_data.type} projects"
-                )
-            
-            # Validate teachable machine link format
-            if not project_data.teachable_machine_link.startswith("https://teachablemachine.withgoogle.com/"):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Invalid teachable machine link. Must be a valid Teachable Machine URL starting with 'https://teachablemachine.withgoogle.com/'"
-                )
+        # Teachable Machine link and config rules are already enforced by ProjectCreate
         
         # Set guest session info in project data
         project_data.createdBy = f"guest:{session_id}"
@@ -347,11 +614,6 @@ async def create_guest_project(
         project_data.classroom_id = ""
         project_data.student_id = session_id
         
-        # For teachable machine projects, don't save config since they use Teachable Machine
-        # For regular projects, use config like text recognition
-        if project_data.type in ["image-recognition-teachable-machine", "pose-recognition-teachable-machine"]:
-            project_data.config = None
-        
         project = await project_service.create_project(project_data)
         return ProjectResponse(data=project)
     except HTTPException:
@@ -364,24 +626,10 @@ async def create_guest_project(
 async def get_guest_project(
     session_id: str,
     project_id: str,
-    session: dict = Depends(validate_session_dependency),
-    project_service: ProjectService = Depends(get_project_service)
+    project: Project = Depends(get_owned_project)
 ):
     """Get project by ID for a guest session"""
-    try:
-        project = await project_service.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Verify project belongs to this session
-        if project.student_id != session_id:
-            raise HTTPException(status_code=403, detail="Project not accessible for this session")
-        
-        return ProjectResponse(data=project)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return ProjectResponse(data=project)
 
 
 @router.put("/session/{session_id}/projects/{project_id}", response_model=ProjectResponse)
@@ -389,7 +637,7 @@ async def update_guest_project(
     session_id: str,
     project_id: str,
     project_data: ProjectUpdate,
-    session: dict = Depends(validate_session_dependency),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Update project for a guest session
@@ -400,38 +648,17 @@ async def update_guest_project(
     - config field is ignored (not saved) since these projects use Teachable Machine models
     """
     try:
-        # First verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project.student_id != session_id:
-            raise HTTPException(status_code=403, detail="Project not accessible for this session")
-        
-        # Validate project type and teachable machine link if being updated
-        if project_data.type in ["image-recognition-teachable-machine", "pose-recognition-teachable-machine"] or (project_data.type is None and project.type in ["image-recognition-teachable-machine", "pose-recognition-teachable-machine"]):
-            # If updating to teachable machine project or already is teachable machine project
+        # ProjectUpdate checks a link sent with a Teachable Machine type and drops config;
+        # the remaining checks depend on the stored project
+        if project_data.type is None and project.type in TEACHABLE_MACHINE_TYPES:
             if project_data.teachable_machine_link is not None:
-                # Validate teachable machine link format if provided
-                if not project_data.teachable_machine_link.startswith("https://teachablemachine.withgoogle.com/"):
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Invalid teachable machine link. Must be a valid Teachable Machine URL starting with 'https://teachablemachine.withgoogle.com/'"
-                    )
-            elif project_data.type in ["image-recognition-teachable-machine", "pose-recognition-teachable-machine"] and not project.teachable_machine_link:
-                # If changing to teachable machine project but no teachable machine link provided
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"teachable_machine_link is required for {project_data.type} projects"
-                )
-            
-            # For teachable machine projects, don't save config
-            # For regular projects, save config like text recognition
-            if project_data.type in ["image-recognition-teachable-machine", "pose-recognition-teachable-machine"]:
-                project_data.config = None
+                _validate_tm_link(project_data.teachable_machine_link, project.type)
+        elif project_data.type in TEACHABLE_MACHINE_TYPES and project_data.teachable_machine_link is None:
+            # Changing to a teachable machine project without a new link - the existing one must do
+            _validate_tm_link(project.teachable_machine_link, project_data.type)
         
-        # Update project
-        updated_project = await project_service.update_project(project_id, project_data)
+        # Update the already-loaded project
+        updated_project = await project_service.update_project_for_session(project, project_data)
         return ProjectResponse(data=updated_project)
     except HTTPException:
         raise
@@ -443,24 +670,14 @@ async def update_guest_project(
 async def delete_guest_project(
     session_id: str,
     project_id: str,
-    session: dict = Depends(validate_session_dependency),
+    # Only the owner is needed to authorize a delete, not the whole document
+    guest_project: dict = Depends(owned_project('createdBy', raw=True)),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Delete project for a guest session"""
     try:
-        # First verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project.student_id != session_id:
-            raise HTTPException(status_code=403, detail="Project not accessible for this session")
-        
-        # Delete project
-        await project_service.delete_project(project_id)
+        await project_service.delete_project_for_session(project_id, session_id)
         return {"success": True, "message": "Project deleted successfully"}
-    except HTTPException:
-        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -473,44 +690,27 @@ async def delete_guest_project(
 async def upload_guest_dataset(
     session_id: str,
     project_id: str,
+    request: Request,
     file: UploadFile = File(..., description="Dataset file to upload"),
     records: Optional[int] = Form(None, description="Number of records in dataset"),
     description: Optional[str] = Form("", description="Dataset description"),
-    session: dict = Depends(validate_session_dependency),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Upload dataset file for a guest project"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
+        # Reject oversized uploads from their declared size before touching the body
+        _reject_oversized_body(request, _MAX_DATASET_BYTES, "File too large. Maximum size is 100MB.")
+        if file.size is not None and file.size > _MAX_DATASET_BYTES:
+            raise HTTPException(status_code=413, detail="File too large. Maximum size is 100MB.")
         
         # Validate file type
-        allowed_types = [
-            'text/csv',
-            'application/json',
-            'text/plain',
-            'application/vnd.ms-excel',
-            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        ]
-        
-        if file.content_type not in allowed_types:
+        if file.content_type not in _ALLOWED_DATASET_TYPES:
             raise HTTPException(
                 status_code=400, 
                 detail="Invalid file type. Only CSV, JSON, and Excel files are allowed."
             )
         
-        # Read file content
-        file_content = await file.read()
-        
-        # Check file size (100MB limit)
-        if len(file_content) > 100 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400,
-                detail="File too large. Maximum size is 100MB."
-            )
-        
         # Prepare metadata
         metadata = {
             'records': records,
@@ -520,14 +720,18 @@ async def upload_guest_dataset(
             'guest_session_id': session_id
         }
         
-        # Upload to service
-        result = await project_service.upload_dataset(
-            project_id,
-            file_content,
-            file.filename,
-            file.content_type,
-            metadata
-        )
+        # Stream to GCS through the service (100MB limit, enforced while streaming)
+        try:
+            result = await project_service.upload_dataset(
+                project_id,
+                file,
+                file.filename,
+                file.content_type,
+                metadata,
+                max_bytes=_MAX_DATASET_BYTES
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return FileUploadResponse(
             success=result['success'],
@@ -544,16 +748,11 @@ async def add_guest_examples(
     session_id: str,
     project_id: str,
     examples_data: ExamplesBulkAdd,
-    session: dict = Depends(validate_session_dependency),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Add text examples to a guest project"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         # Validate number of examples
         if len(examples_data.examples) > 50:
             raise HTTPException(
@@ -586,18 +785,14 @@ async def add_guest_examples(
 async def upload_guest_images(
     session_id: str,
     project_id: str,
+    request: Request,
     files: List[UploadFile] = File(..., description="Image files to upload"),
     label: str = Form(..., description="Label for these images"),
-    session: dict = Depends(validate_session_dependency),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Upload image examples to a guest project"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         # Validate project type
         if project.type != "image-recognition":
             raise HTTPException(
@@ -606,46 +801,59 @@ async def upload_guest_images(
             )
         
         # Validate number of files
-        if len(files) > 20:
+        if len(files) > _MAX_IMAGES_PER_UPLOAD:
             raise HTTPException(
                 status_code=400,
-                detail="Maximum 20 images can be uploaded at once"
+                detail=f"Maximum {_MAX_IMAGES_PER_UPLOAD} images can be uploaded at once"
             )
         
-        # Validate file types
-        allowed_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp']
-        uploaded_images = []
+        # Reject oversized requests from their declared size before reading any image
+        _reject_oversized_body(
+            request,
+            _MAX_IMAGES_PER_UPLOAD * _MAX_IMAGE_BYTES,
+            f"Upload too large. Maximum is {_MAX_IMAGES_PER_UPLOAD} images of 10MB each."
+        )
         
+        # Validate type and size of every file before uploading any of them
         for file in files:
-            if file.content_type not in allowed_types:
+            if file.content_type not in _ALLOWED_IMAGE_TYPES:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Invalid file type: {file.content_type}. Only JPEG, PNG, GIF, and WebP images are allowed."
                 )
-            
-            # Check file size (10MB limit per image)
-            file_content = await file.read()
-            if len(file_content) > 10 * 1024 * 1024:
+            if file.size is not None and file.size > _MAX_IMAGE_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File {file.filename} is too large. Maximum size is 10MB."
+                )
+        
+        # Upload concurrently; GCS calls are bounded process-wide by the shared GCS pool
+        async def upload_one(file: UploadFile) -> dict:
+            # Stream to GCS (10MB limit per image, enforced while streaming)
+            gcs_path = f"images/{project_id}/{label}/{file.filename}"
+            try:
+                size = await project_service.stream_to_blob(gcs_path, file, file.content_type, _MAX_IMAGE_BYTES)
+            except ValueError:
                 raise HTTPException(
                     status_code=400,
                     detail=f"File {file.filename} is too large. Maximum size is 10MB per image."
                 )
-            
-            # Upload to GCS
-            gcs_path = f"images/{project_id}/{label}/{file.filename}"
-            blob = project_service.bucket.blob(gcs_path)
-            blob.upload_from_string(file_content, content_type=file.content_type)
+            finally:
+                # Release the spooled temp file now rather than when the whole batch finishes
+                await file.close()
             
             # Generate public URL
             image_url = f"gs://{project_service.bucket.name}/{gcs_path}"
             
-            uploaded_images.append({
+            return {
                 "image_url": image_url,
                 "label": label,
                 "filename": file.filename,
-                "size": len(file_content),
+                "size": size,
                 "content_type": file.content_type
-            })
+            }
+        
+        uploaded_images = list(await asyncio.gather(*(upload_one(file) for file in files)))
         
         # Add image examples to project
         result = await project_service.add_image_examples(project_id, uploaded_images)
@@ -670,16 +878,12 @@ async def upload_guest_images_from_url(
     project_id: str,
     image_url: str = Form(..., description="URL of the image to upload"),
     label: str = Form(..., description="Label for this image"),
-    session: dict = Depends(validate_session_dependency),
-    project_service: ProjectService = Depends(get_project_service)
+    project: Project = Depends(get_owned_project),
+    project_service: ProjectService = Depends(get_project_service),
+    http_session: aiohttp.ClientSession = Depends(get_http_session)
 ):
     """Upload image from URL to a guest project"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         # Validate project type
         if project.type != "image-recognition":
             raise HTTPException(
@@ -687,104 +891,93 @@ async def upload_guest_images_from_url(
                 detail="Image uploads are only allowed for image-recognition projects"
             )
         
-        # Validate URL
-        if not image_url.startswith(('http://', 'https://')):
+        # Download straight into the label's folder
+        uploaded_image = await _download_image_to_gcs(
+            http_session, project_service, image_url, f"images/{project_id}/{label}", "image"
+        )
+        uploaded_image["label"] = label
+        gcs_url = uploaded_image["image_url"]
+        
+        # Add image example to project
+        result = await project_service.add_image_examples(project_id, [uploaded_image])
+        
+        return {
+            "success": True,
+            "message": f"Uploaded image from URL with label '{label}'",
+            "totalImages": result['totalImages'],
+            "labels": result['labels'],
+            "uploadedImages": 1,
+            "imageUrls": [gcs_url]  # Include GCS URL for prediction
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/session/{session_id}/projects/{project_id}/images/urls", response_model=dict)
+async def upload_guest_images_from_urls(
+    session_id: str,
+    project_id: str,
+    images: ImageUrlsBulkAdd,
+    project: Project = Depends(get_owned_project),
+    project_service: ProjectService = Depends(get_project_service),
+    http_session: aiohttp.ClientSession = Depends(get_http_session)
+):
+    """Upload several images from URLs to a guest project in one request"""
+    try:
+        # Validate project type
+        if project.type != "image-recognition":
             raise HTTPException(
                 status_code=400,
-                detail="Invalid URL format. Must start with http:// or https://"
+                detail="Image uploads are only allowed for image-recognition projects"
             )
         
-        import aiohttp
-        import uuid
-        from urllib.parse import urlparse
+        # Validate number of URLs
+        if len(images.images) > _MAX_IMAGES_PER_UPLOAD:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Maximum {_MAX_IMAGES_PER_UPLOAD} images can be uploaded at once"
+            )
         
-        # Download image from URL
-        async with aiohttp.ClientSession() as session_client:
+        # Download concurrently (bounded by the shared HTTP connector and GCS pool);
+        # a bad URL is reported back instead of failing the batch
+        async def fetch_one(item: ImageUrlAdd):
             try:
-                async with session_client.get(image_url, timeout=30) as response:
-                    if response.status != 200:
-                        raise HTTPException(
-                            status_code=400,
-                            detail=f"Failed to download image from URL. HTTP {response.status}"
-                        )
-                    
-                    # Get content type
-                    content_type = response.headers.get('content-type', 'image/jpeg')
-                    
-                    # Validate content type
-                    allowed_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp']
-                    if not any(allowed_type in content_type for allowed_type in allowed_types):
-                        raise HTTPException(
-                            status_code=400,
-                            detail=f"Invalid image type: {content_type}. Only JPEG, PNG, GIF, and WebP images are allowed."
-                        )
-                    
-                    # Read image content
-                    file_content = await response.read()
-                    
-                    # Check file size (10MB limit)
-                    if len(file_content) > 10 * 1024 * 1024:
-                        raise HTTPException(
-                            status_code=400,
-                            detail="Image is too large. Maximum size is 10MB."
-                        )
-                    
-                    # Generate filename from URL or create one
-                    parsed_url = urlparse(image_url)
-                    filename = parsed_url.path.split('/')[-1] if parsed_url.path.split('/')[-1] else f"image_{uuid.uuid4().hex[:8]}.jpg"
-                    
-                    # Ensure filename has an extension
-                    if '.' not in filename:
-                        if 'jpeg' in content_type or 'jpg' in content_type:
-                            filename += '.jpg'
-                        elif 'png' in content_type:
-                            filename += '.png'
-                        elif 'gif' in content_type:
-                            filename += '.gif'
-                        elif 'webp' in content_type:
-                            filename += '.webp'
-                        else:
-                            filename += '.jpg'  # Default to jpg
-                    
-                    # Upload to GCS
-                    gcs_path = f"images/{project_id}/{label}/{filename}"
-                    blob = project_service.bucket.blob(gcs_path)
-                    blob.upload_from_string(file_content, content_type=content_type)
-                    
-                    # Generate GCS URL
-                    gcs_url = f"gs://{project_service.bucket.name}/{gcs_path}"
-                    
-                    # Create image data
-                    uploaded_image = {
-                        "image_url": gcs_url,
-                        "label": label,
-                        "filename": filename,
-                        "size": len(file_content),
-                        "content_type": content_type
-                    }
-                    
-                    # Add image example to project
-                    result = await project_service.add_image_examples(project_id, [uploaded_image])
-                    
-                    return {
-                        "success": True,
-                        "message": f"Uploaded image from URL with label '{label}'",
-                        "totalImages": result['totalImages'],
-                        "labels": result['labels'],
-                        "uploadedImages": 1,
-                        "imageUrls": [gcs_url]  # Include GCS URL for prediction
-                    }
-                    
-            except aiohttp.ClientError as e:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Failed to download image from URL: {str(e)}"
-                )
-            except asyncio.TimeoutError:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Timeout while downloading image from URL"
+                image = await _download_image_to_gcs(
+                    http_session, project_service, item.image_url, f"images/{project_id}/{item.label}", "image"
                 )
+            except HTTPException as e:
+                return None, {"image_url": item.image_url, "error": e.detail}
+            except Exception as e:
+                logger.warning(f"Failed to store image from {item.image_url}: {str(e)}")
+                return None, {"image_url": item.image_url, "error": f"Failed to store image: {str(e)}"}
+            image["label"] = item.label
+            return image, None
+        
+        results = await asyncio.gather(*(fetch_one(item) for item in images.images))
+        uploaded_images = [image for image, _ in results if image]
+        failed_images = [failure for _, failure in results if failure]
+        
+        if not uploaded_images:
+            raise HTTPException(
+                status_code=400,
+                detail={"message": "None of the images could be downloaded", "failed": failed_images}
+            )
+        
+        # One project write for the whole batch
+        result = await project_service.add_image_examples(project_id, uploaded_images)
+        
+        return {
+            "success": True,
+            "message": f"Uploaded {len(uploaded_images)} images from URLs",
+            "totalImages": result['totalImages'],
+            "labels": result['labels'],
+            "uploadedImages": len(uploaded_images),
+            "imageUrls": [image["image_url"] for image in uploaded_images],
+            "failed": failed_images
+        }
     
     except HTTPException:
         raise
@@ -796,17 +989,13 @@ async def upload_guest_images_from_url(
 async def upload_image_for_prediction_only(
     session_id: str,
     project_id: str,
+    request: Request,
     files: List[UploadFile] = File(..., description="Image files for prediction only"),
-    session: dict = Depends(validate_session_dependency),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Upload image for prediction only - does NOT store in training dataset"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         # Validate project type
         if project.type != "image-recognition":
             raise HTTPException(
@@ -822,27 +1011,30 @@ async def upload_image_for_prediction_only(
             )
         
         # Validate file types
-        allowed_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp']
         file = files[0]
         
-        if file.content_type not in allowed_types:
+        if file.content_type not in _ALLOWED_IMAGE_TYPES:
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid file type: {file.content_type}. Only JPEG, PNG, GIF, and WebP images are allowed."
             )
         
-        # Check file size (10MB limit per image)
-        file_content = await file.read()
-        if len(file_content) > 10 * 1024 * 1024:
+        # Reject oversized images from their declared size before reading them
+        _reject_oversized_body(request, _MAX_IMAGE_BYTES, "Image is too large. Maximum size is 10MB.")
+        if file.size is not None and file.size > _MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail="Image is too large. Maximum size is 10MB.")
+        
+        # Stream to GCS with prediction-specific path (not in training data), 10MB limit
+        gcs_path = f"predictions/{project_id}/{file.filename}"
+        try:
+            size = await project_service.stream_to_blob(gcs_path, file, file.content_type, _MAX_IMAGE_BYTES)
+        except ValueError:
             raise HTTPException(
                 status_code=400,
                 detail=f"File {file.filename} is too large. Maximum size is 10MB per image."
             )
-        
-        # Upload to GCS with prediction-specific path (not in training data)
-        gcs_path = f"predictions/{project_id}/{file.filename}"
-        blob = project_service.bucket.blob(gcs_path)
-        blob.upload_from_string(file_content, content_type=file.content_type)
+        finally:
+            await file.close()
         
         # Generate GCS URL for prediction
         gcs_url = f"gs://{project_service.bucket.name}/{gcs_path}"
@@ -852,7 +1044,7 @@ async def upload_image_for_prediction_only(
             "message": "Image uploaded for prediction",
             "imageUrl": gcs_url,
             "filename": file.filename,
-            "size": len(file_content),
+            "size": size,
             "content_type": file.content_type
         }
     
@@ -867,16 +1059,12 @@ async def upload_image_url_for_prediction_only(
     session_id: str,
     project_id: str,
     image_url: str = Form(..., description="URL of the image for prediction only"),
-    session: dict = Depends(validate_session_dependency),
-    project_service: ProjectService = Depends(get_project_service)
+    project: Project = Depends(get_owned_project),
+    project_service: ProjectService = Depends(get_project_service),
+    http_session: aiohttp.ClientSession = Depends(get_http_session)
 ):
     """Upload image from URL for prediction only - does NOT store in training dataset"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         # Validate project type
         if project.type != "image-recognition":
             raise HTTPException(
@@ -884,92 +1072,19 @@ async def upload_image_url_for_prediction_only(
                 detail="Image predictions are only allowed for image-recognition projects"
             )
         
-        # Validate URL
-        if not image_url.startswith(('http://', 'https://')):
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid URL format. Must start with http:// or https://"
-            )
-        
-        import aiohttp
-        import uuid
-        from urllib.parse import urlparse
+        # Download to a prediction-specific path (not in training data)
+        image = await _download_image_to_gcs(
+            http_session, project_service, image_url, f"predictions/{project_id}", "prediction"
+        )
         
-        # Download image from URL
-        async with aiohttp.ClientSession() as session_client:
-            try:
-                async with session_client.get(image_url, timeout=30) as response:
-                    if response.status != 200:
-                        raise HTTPException(
-                            status_code=400,
-                            detail=f"Failed to download image from URL. HTTP {response.status}"
-                        )
-                    
-                    # Get content type
-                    content_type = response.headers.get('content-type', 'image/jpeg')
-                    
-                    # Validate content type
-                    allowed_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp']
-                    if not any(allowed_type in content_type for allowed_type in allowed_types):
-                        raise HTTPException(
-                            status_code=400,
-                            detail=f"Invalid image type: {content_type}. Only JPEG, PNG, GIF, and WebP images are allowed."
-                        )
-                    
-                    # Read image content
-                    file_content = await response.read()
-                    
-                    # Check file size (10MB limit)
-                    if len(file_content) > 10 * 1024 * 1024:
-                        raise HTTPException(
-                            status_code=400,
-                            detail="Image is too large. Maximum size is 10MB."
-                        )
-                    
-                    # Generate filename from URL or create one
-                    parsed_url = urlparse(image_url)
-                    filename = parsed_url.path.split('/')[-1] if parsed_url.path.split('/')[-1] else f"prediction_{uuid.uuid4().hex[:8]}.jpg"
-                    
-                    # Ensure filename has an extension
-                    if '.' not in filename:
-                        if 'jpeg' in content_type or 'jpg' in content_type:
-                            filename += '.jpg'
-                        elif 'png' in content_type:
-                            filename += '.png'
-                        elif 'gif' in content_type:
-                            filename += '.gif'
-                        elif 'webp' in content_type:
-                            filename += '.webp'
-                        else:
-                            filename += '.jpg'  # Default to jpg
-                    
-                    # Upload to GCS with prediction-specific path (not in training data)
-                    gcs_path = f"predictions/{project_id}/{filename}"
-                    blob = project_service.bucket.blob(gcs_path)
-                    blob.upload_from_string(file_content, content_type=content_type)
-                    
-                    # Generate GCS URL for prediction
-                    gcs_url = f"gs://{project_service.bucket.name}/{gcs_path}"
-                    
-                    return {
-                        "success": True,
-                        "message": "Image uploaded for prediction from URL",
-                        "imageUrl": gcs_url,
-                        "filename": filename,
-                        "size": len(file_content),
-                        "content_type": content_type
-                    }
-                    
-            except aiohttp.ClientError as e:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Failed to download image from URL: {str(e)}"
-                )
-            except asyncio.TimeoutError:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Timeout while downloading image from URL"
-                )
+        return {
+            "success": True,
+            "message": "Image uploaded for prediction from URL",
+            "imageUrl": image["image_url"],
+            "filename": image["filename"],
+            "size": image["size"],
+            "content_type": image["content_type"]
+        }
     
     except HTTPException:
         raise
@@ -981,16 +1096,11 @@ async def upload_image_url_for_prediction_only(
 async def get_guest_examples(
     session_id: str,
     project_id: str,
-    session: dict = Depends(validate_session_dependency),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Get all examples for a guest project"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         examples = await project_service.get_examples(project_id)
         
         # Also get the labels list from the project
@@ -1014,16 +1124,11 @@ async def get_guest_examples(
 async def get_guest_images(
     session_id: str,
     project_id: str,
-    session: dict = Depends(validate_session_dependency),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Get all image examples for a guest project"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         image_examples = await project_service.get_image_examples(project_id)
         
         # Also get the labels list from the project
@@ -1048,27 +1153,36 @@ async def get_guest_image(
     session_id: str,
     project_id: str,
     image_path: str,
-    session: dict = Depends(validate_session_dependency),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Serve individual images from GCS"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         # Construct the full GCS path
         gcs_path = f"images/{project_id}/{image_path}"
+        filename = os.path.basename(image_path)
         
         # Get the blob from GCS
         blob = project_service.bucket.blob(gcs_path)
         
-        if not blob.exists():
-            raise HTTPException(status_code=404, detail="Image not found")
+        # Hand the client a short-lived signed URL so image bytes bypass the API entirely
+        global _image_url_signing_failed
+        if not settings.proxy_images and not _image_url_signing_failed:
+            try:
+                signed_url = await gcs_call(_sign_image_url, blob, filename)
+                return RedirectResponse(signed_url, status_code=302)
+            except Exception as e:
+                # e.g. the service account may not sign for itself - proxy from now on
+                _image_url_signing_failed = True
+                logger.warning("Could not sign image URLs, proxying images from now on: %s", e)
         
-        # Download the image content
-        image_content = blob.download_as_bytes()
+        # Single streamed GET - a missing object surfaces as NotFound on the first read
+        reader = blob.open("rb", chunk_size=_IMAGE_DOWNLOAD_CHUNK)
+        try:
+            first_chunk = await gcs_call(reader.read, _IMAGE_STREAM_CHUNK)
+        except NotFound:
+            reader.close()
+            raise HTTPException(status_code=404, detail="Image not found")
         
         # Determine content type from file extension
         content_type = "image/jpeg"  # default
@@ -1079,14 +1193,21 @@ async def get_guest_image(
         elif image_path.lower().endswith('.webp'):
             content_type = "image/webp"
         
-        # Return the image with appropriate headers
-        from fastapi.responses import Response
-        return Response(
-            content=image_content,
+        def iter_image():
+            try:
+                yield first_chunk
+                yield from iter(lambda: reader.read(_IMAGE_STREAM_CHUNK), b"")
+            finally:
+                reader.close()
+        
+        # Stream the image; re-uploading a file with the same name replaces it, and images
+        # belong to one session, so only the browser may keep it and only for a while
+        return StreamingResponse(
+            iter_image(),
             media_type=content_type,
             headers={
-                "Cache-Control": "public, max-age=3600",  # Cache for 1 hour
-                "Content-Disposition": f"inline; filename={image_path.split('/')[-1]}"
+                "Cache-Control": "private, max-age=3600",
+                "Content-Disposition": f"inline; filename={filename}"
             }
         )
         
@@ -1102,49 +1223,59 @@ async def get_guest_image(
 # ============================================================================
 
 @router.post("/session/{session_id}/projects/{project_id}/train", response_model=TrainingResponse)
+@guest_route
 async def start_guest_training(
     session_id: str,
     project_id: str,
     training_config: Optional[TrainingConfig] = None,
-    session: dict = Depends(validate_session_dependency),
+    guest_project: dict = Depends(get_owned_guest_project),
     guest_service: GuestService = Depends(get_guest_service)
 ):
     """Start training job for a guest project using logistic regression or EfficientNet"""
-    try:
-        # Get guest project by project_id from the projects collection
-        guest_project = await guest_service.get_guest_project_by_id(project_id)
-        if not guest_project:
-            raise HTTPException(status_code=404, detail="Guest project not found")
-        
-        # Verify the project belongs to this session
-        if guest_project.get('createdBy') != f"guest:{session_id}":
-            raise HTTPException(status_code=404, detail="Project not found in this session")
-        
-        project_type = guest_project.get('type', 'text-recognition')
-        
-        # Handle image recognition projects
-        if project_type == 'image-recognition':
-            return await _train_image_recognition_project(
-                session_id, project_id, guest_project, training_config, guest_service
-            )
-        
-        # Handle text recognition projects (existing logic)
-        return await _train_text_recognition_project(
+    project_type = GuestProjectView.model_validate(guest_project).type
+    
+    # Handle image recognition projects
+    if project_type == 'image-recognition':
+        return await _train_image_recognition_project(
             session_id, project_id, guest_project, training_config, guest_service
         )
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Training error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    # Handle text recognition projects (existing logic)
+    return await _train_text_recognition_project(
+        session_id, project_id, guest_project, training_config, guest_service
+    )
+
+
+async def _queue_text_training(
+    project_id: str, training_config: Optional[TrainingConfig], guest_service: GuestService
+) -> TrainingResponse:
+    """Hand text training to the worker queue instead of training in the request"""
+    config_dict = training_config.model_dump() if training_config else None
+    # The job, currentJobId and the guest status fields are written in one batch
+    training_job = await asyncio.shield(training_job_service.create_training_job(
+        project_id, config_dict,
+        project_updates={'training_status': 'training', 'status': 'training'}
+    ))
+    guest_service.invalidate_guest_project(project_id)
+    
+    return TrainingResponse(
+        success=True,
+        message="Training job queued successfully!",
+        jobId=training_job.id
+    )
 
 
 async def _train_text_recognition_project(
     session_id: str, project_id: str, guest_project: dict, 
     training_config: Optional[TrainingConfig], guest_service: GuestService
 ) -> TrainingResponse:
-    """Train text recognition project using DistilBERT (default) or Logistic Regression"""
+    """Train text recognition project using DistilBERT (default) or Logistic Regression
+    
+    Small datasets are trained inline; larger ones go straight to the worker queue.
+    """
+    # Deferred so sklearn/spaCy are only loaded by workers that actually train or predict
+    from ...training_service import trainer, distilbert_trainer
+    
     try:
         # Get examples for training from guest project
         examples = guest_project.get('dataset', {}).get('examples', [])
@@ -1154,169 +1285,153 @@ async def _train_text_recognition_project(
                 detail="Need at least 2 examples to start training. Add some examples first."
             )
         
-        # Convert examples to the format expected by trainer
+        logger.info("Starting text recognition training for project %s", project_id)
+        logger.info("Examples count: %s", len(examples))
+        
+        # Convert examples to the format expected by trainer, dropping malformed rows
         try:
-            logger.info(f"Starting text recognition training for project {project_id}")
-            logger.info(f"Examples count: {len(examples)}")
-            logger.info(f"Example types: {[type(ex).__name__ for ex in examples]}")
-            
-            # Convert examples to the format expected by trainer
-            training_examples = []
-            for i, ex in enumerate(examples):
-                logger.info(f"Processing example {i}: {ex}")
-                if isinstance(ex, dict) and 'text' in ex and 'label' in ex:
-                    try:
-                        text_example = TextExample(**ex)
-                        training_examples.append(text_example)
-                        logger.info(f"Converted dict example {i}: text='{text_example.text[:50]}...', label='{text_example.label}'")
-                    except Exception as conv_error:
-                        logger.error(f"Failed to convert example {i}: {conv_error}")
-                        logger.error(f"Example data: {ex}")
-                else:
-                    logger.warning(f"Unexpected example format {i}: {type(ex)} - {ex}")
-            
-            if not training_examples:
-                raise ValueError("No valid examples found for training")
-            
-            logger.info(f"Training with {len(training_examples)} examples")
-            logger.info(f"Example labels: {[ex.label for ex in training_examples]}")
-            
-            # Use DistilBERT by default (better accuracy for text classification)
-            use_distilbert = True  # Can be made configurable later
-            
-            if use_distilbert:
-                logger.info("🤖 Using DistilBERT for text classification")
-                try:
-                    # Run training in thread pool executor to allow concurrent training
-                    training_result = await asyncio.get_event_loop().run_in_executor(
-                        _training_executor,
-                        distilbert_trainer.train_model,
-                        training_examples
-                    )
-                    logger.info(f"DistilBERT training successful: {training_result}")
-                    
-                    # Save DistilBERT model to GCS (directory structure)
-                    model_path = f"models/{project_id}"  # Directory path for Hugging Face format
-                    
-                    logger.info(f"Saving DistilBERT model to GCS: {model_path}")
-                    distilbert_trainer.save_model_to_gcs(
-                        gcp_clients.get_bucket(), 
-                        model_path, 
-                        training_result['model'],
-                        training_result['tokenizer']
-                    )
-                    logger.info("DistilBERT model saved to GCS successfully")
-                    
-                    # Update guest project with model info and status
-                    model_update = {
-                        'model.filename': 'distilbert_model',  # Directory name
-                        'model.gcsPath': model_path,  # Directory path
-                        'model.accuracy': training_result.get('accuracy'),
-                        'model.loss': None,  # DistilBERT doesn't use loss in same way
-                        'model.labels': training_result.get('labels', []),
-                        'model.modelType': 'distilbert',
-                        'model.trainedAt': datetime.now(timezone.utc).isoformat(),
-                        'model.endpointUrl': f"/api/guests/session/{session_id}/projects/{project_id}/predict",
-                        'status': 'trained',
-                        'updatedAt': datetime.now(timezone.utc).isoformat()
-                    }
-                    
-                    # Update the project document
-                    project_doc_ref = guest_service.projects_collection.document(project_id)
-                    project_doc_ref.update(model_update)
-                    
-                    logger.info(f"Guest project {project_id} updated with DistilBERT model info")
-                    
-                    # Return success response for DistilBERT
-                    return TrainingResponse(
-                        success=True,
-                        message="Training completed successfully with DistilBERT!",
-                        jobId=f"direct-{project_id}-{int(datetime.now().timestamp())}"
-                    )
-                    
-                except Exception as distilbert_error:
-                    logger.warning(f"DistilBERT training failed: {distilbert_error}, falling back to Logistic Regression")
-                    use_distilbert = False
-            
-            if not use_distilbert:
-                # Fallback to Logistic Regression
-                logger.info("📊 Using Logistic Regression for text classification")
+            training_examples = _TEXT_EXAMPLES_ADAPTER.validate_python(examples)
+        except ValidationError as validation_error:
+            errors = validation_error.errors()
+            bad_rows = {err['loc'][0] for err in errors if err['loc']}
+            logger.warning("Skipping %s malformed examples, first errors: %s", len(bad_rows), errors[:5])
+            training_examples = _TEXT_EXAMPLES_ADAPTER.validate_python(
+                [ex for i, ex in enumerate(examples) if i not in bad_rows]
+            )
+        logger.info("Converted %s/%s examples", len(training_examples), len(examples))
+        
+        if not training_examples:
+            # Training validation failed
+            return TrainingResponse(
+                success=False,
+                message="No valid examples found for training"
+            )
+        
+        if len(training_examples) > _INLINE_TRAINING_MAX_EXAMPLES:
+            logger.info("%s examples exceeds the inline limit, queueing worker training", len(training_examples))
+            return await _queue_text_training(project_id, training_config, guest_service)
+        
+        logger.info("Training with %s examples", len(training_examples))
+        logger.info("Example labels: %s", sorted({ex.label for ex in training_examples}))
+        
+        # Use DistilBERT by default (better accuracy for text classification)
+        use_distilbert = True  # Can be made configurable later
+        
+        if use_distilbert:
+            logger.info("🤖 Using DistilBERT for text classification")
+            try:
                 # Run training in thread pool executor to allow concurrent training
                 training_result = await asyncio.get_event_loop().run_in_executor(
                     _training_executor,
-                    trainer.train_model,
+                    distilbert_trainer.train_model,
                     training_examples
                 )
-                logger.info(f"Logistic Regression training successful: {training_result}")
+                logger.info("DistilBERT training successful (accuracy %s)", training_result.get('accuracy'))
                 
-                # Save the trained model to GCS
-                model_filename = f"model_{project_id}.pkl"
-                model_path = f"models/{project_id}/{model_filename}"
+                # Save DistilBERT model to GCS (directory structure)
+                model_path = f"models/{project_id}"  # Directory path for Hugging Face format
                 
-                logger.info(f"Saving model to GCS: {model_path}")
-                trainer.save_model_to_gcs(gcp_clients.get_bucket(), model_path, training_result['model'])
-                logger.info("Model saved to GCS successfully")
+                logger.info("Saving DistilBERT model to GCS: %s", model_path)
+                await gcs_call(
+                    distilbert_trainer.save_model_to_gcs,
+                    gcp_clients.get_bucket(), 
+                    model_path, 
+                    training_result['model'],
+                    training_result['tokenizer']
+                )
+                logger.info("DistilBERT model saved to GCS successfully")
                 
                 # Update guest project with model info and status
+                trained_at = datetime.now(timezone.utc).isoformat()
                 model_update = {
-                    'model.filename': model_filename,
-                    'model.gcsPath': model_path,
+                    'model.filename': 'distilbert_model',  # Directory name
+                    'model.gcsPath': model_path,  # Directory path
                     'model.accuracy': training_result.get('accuracy'),
-                    'model.loss': training_result.get('loss'),
+                    'model.loss': None,  # DistilBERT doesn't use loss in same way
                     'model.labels': training_result.get('labels', []),
-                    'model.modelType': 'logistic_regression',
-                    'model.trainedAt': datetime.now(timezone.utc).isoformat(),
+                    'model.modelType': 'distilbert',
+                    'model.trainedAt': trained_at,
                     'model.endpointUrl': f"/api/guests/session/{session_id}/projects/{project_id}/predict",
                     'status': 'trained',
-                    'updatedAt': datetime.now(timezone.utc).isoformat()
+                    'updatedAt': trained_at
                 }
                 
-                # Update the project document directly
-                project_doc_ref = guest_service.projects_collection.document(project_id)
-                project_doc_ref.update(model_update)
+                # Verify ownership and update the project document in one transaction
+                # Shielded so a client disconnect cannot drop the write after training finished
+                if not await asyncio.shield(guest_service.update_guest_project_if_owned(project_id, session_id, model_update)):
+                    raise HTTPException(status_code=404, detail="Project not found in this session")
                 
-                logger.info(f"Guest project {project_id} updated with model info")
+                logger.info("Guest project %s updated with DistilBERT model info", project_id)
                 
-                # Create a simple training job response
+                # Return success response for DistilBERT
                 return TrainingResponse(
                     success=True,
-                    message="Training completed successfully!",
-                    jobId=f"direct-{project_id}-{int(datetime.now().timestamp())}"
+                    message="Training completed successfully with DistilBERT!",
+                    jobId=_inline_job_id("direct", project_id)
                 )
                 
-        except Exception as training_error:
-            logger.error(f"Direct training failed: {training_error}")
-            logger.error(f"Training error type: {type(training_error)}")
-            logger.error(f"Training error details: {str(training_error)}")
-            
-            # Fall back to worker-based training
-            logger.info("Falling back to worker-based training")
-            
-            config_dict = training_config.model_dump() if training_config else None
-            training_job = await training_job_service.create_training_job(project_id, config_dict)
-            
-            # Update guest session with job ID and status
-            await guest_service.update_guest_session(session_id, GuestUpdate(
-                currentJobId=training_job.id,
-                training_status="training",
-                status="training"
-            ))
-            
-            return TrainingResponse(
-                success=True,
-                message="Training job queued successfully!",
-                jobId=training_job.id
-            )
-            
-        except ValueError as e:
-            # Training validation failed
-            return TrainingResponse(
-                success=False,
-                message=str(e)
+            except HTTPException:
+                raise
+            except Exception as distilbert_error:
+                logger.warning("DistilBERT training failed: %s, falling back to Logistic Regression", distilbert_error)
+                use_distilbert = False
+        
+        # Fallback to Logistic Regression
+        logger.info("📊 Using Logistic Regression for text classification")
+        try:
+            # Run training in thread pool executor to allow concurrent training
+            training_result = await asyncio.get_event_loop().run_in_executor(
+                _training_executor,
+                trainer.train_model,
+                training_examples
             )
+        except (MemoryError, TimeoutError) as resource_error:
+            # Out of room in this worker; the training queue runs on dedicated workers
+            logger.warning("Inline training ran out of resources (%s), queueing worker training", resource_error)
+            return await _queue_text_training(project_id, training_config, guest_service)
+        logger.info("Logistic Regression training successful (accuracy %s)", training_result.get('accuracy'))
+        
+        # Save the trained model to GCS
+        model_filename = f"model_{project_id}.joblib"
+        model_path = f"models/{project_id}/{model_filename}"
+        
+        logger.info("Saving model to GCS: %s", model_path)
+        await gcs_call(trainer.save_model_to_gcs, gcp_clients.get_bucket(), model_path, training_result['model'])
+        logger.info("Model saved to GCS successfully")
+        
+        # Update guest project with model info and status
+        trained_at = datetime.now(timezone.utc).isoformat()
+        model_update = {
+            'model.filename': model_filename,
+            'model.gcsPath': model_path,
+            'model.accuracy': training_result.get('accuracy'),
+            'model.loss': training_result.get('loss'),
+            'model.labels': training_result.get('labels', []),
+            'model.modelType': 'logistic_regression',
+            'model.trainedAt': trained_at,
+            'model.endpointUrl': f"/api/guests/session/{session_id}/projects/{project_id}/predict",
+            'status': 'trained',
+            'updatedAt': trained_at
+        }
+        
+        # Verify ownership and update the project document in one transaction
+        # Shielded so a client disconnect cannot drop the write after training finished
+        if not await asyncio.shield(guest_service.update_guest_project_if_owned(project_id, session_id, model_update)):
+            raise HTTPException(status_code=404, detail="Project not found in this session")
+        
+        logger.info("Guest project %s updated with model info", project_id)
+        
+        # Create a simple training job response
+        return TrainingResponse(
+            success=True,
+            message="Training completed successfully!",
+            jobId=_inline_job_id("direct", project_id)
+        )
             
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Text training error: {str(e)}")
+        logger.error("Text training error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -1325,6 +1440,9 @@ async def _train_image_recognition_project(
     training_config: Optional[TrainingConfig], guest_service: GuestService
 ) -> TrainingResponse:
     """Train image recognition project using EfficientNet"""
+    # Deferred so TensorFlow is only initialized on the first image request
+    from ...image_training_service import image_trainer
+    
     try:
         # Get image examples for training from guest project
         image_examples = guest_project.get('dataset', {}).get('image_examples', [])
@@ -1334,49 +1452,56 @@ async def _train_image_recognition_project(
                 detail="Need at least 5 image examples to start training. Add some images first."
             )
         
-        logger.info(f"Starting image recognition training for project {project_id}")
-        logger.info(f"Image examples count: {len(image_examples)}")
+        logger.info("Starting image recognition training for project %s", project_id)
+        logger.info("Image examples count: %s", len(image_examples))
         
         # Update Firestore status to training
-        image_trainer.update_firestore_training_status(project_id, session_id, "training")
+        await asyncio.to_thread(image_trainer.update_firestore_training_status, project_id, session_id, "training")
         
         # Clear any existing model to prevent shape mismatch issues
         model_path = f"image_recog/{project_id}"
-        logger.info(f"Clearing any existing model at: {model_path}")
-        image_trainer.clear_existing_model(gcp_clients.get_bucket(), model_path)
-        
-        # Clear TensorFlow cache to avoid cached weight issues
-        logger.info("Clearing TensorFlow model cache...")
-        image_trainer.clear_tensorflow_cache()
-        
-        # Prepare training data directly from GCS
-        images, labels, class_names = image_trainer.prepare_training_data_direct(image_examples)
+        logger.info("Clearing any existing model at: %s", model_path)
+        await gcs_call(image_trainer.clear_existing_model, gcp_clients.get_bucket(), model_path)
+        
+        # The TF session is left intact: the shared backbone and its cached features are reused across runs
+        loop = asyncio.get_running_loop()
+        
+        # Prepare backbone features; images with a stored embedding are not downloaded again
+        features, labels, class_names = await loop.run_in_executor(
+            _training_executor,
+            image_trainer.prepare_training_features,
+            gcp_clients.get_bucket(),
+            image_examples,
+            embeddings_dir(project_id)
+        )
         
         try:
-            # Train the model directly - run in thread pool executor to allow concurrent training
+            # Train the classifier head - run in thread pool executor to allow concurrent training
             training_result = await asyncio.get_event_loop().run_in_executor(
                 _training_executor,
-                image_trainer.train_model_direct,
-                images,
+                image_trainer.train_on_features,
+                features,
                 labels,
                 class_names
             )
-            logger.info(f"Image training successful: {training_result}")
+            logger.info("Image training successful (accuracy %s)", training_result.get('accuracy'))
             
             # Save the trained model to GCS in native TensorFlow format
             model_path = f"image_recog/{project_id}"
             
-            logger.info(f"Saving image model to GCS directory: {model_path}")
-            saved_model_path = image_trainer.save_model(gcp_clients.get_bucket(), model_path)
+            logger.info("Saving image model to GCS directory: %s", model_path)
+            saved_model_path = await gcs_call(image_trainer.save_model, gcp_clients.get_bucket(), model_path)
             logger.info("Image model saved to GCS successfully")
             
             # Update Firestore with completed status and model info
-            image_trainer.update_firestore_training_status(
-                project_id, session_id, "completed", 
+            await asyncio.shield(asyncio.to_thread(
+                image_trainer.update_firestore_training_status,
+                project_id, session_id, "completed",
                 training_result, saved_model_path
-            )
+            ))
+            guest_service.invalidate_guest_project(project_id)
             
-            logger.info(f"Guest project {project_id} updated with image model info")
+            logger.info("Guest project %s updated with image model info", project_id)
             
             # No cleanup needed - no temporary files used
             
@@ -1384,16 +1509,16 @@ async def _train_image_recognition_project(
             return TrainingResponse(
                 success=True,
                 message="Image recognition training completed successfully!",
-                jobId=f"image-{project_id}-{int(datetime.now().timestamp())}"
+                jobId=_inline_job_id("image", project_id)
             )
             
         except Exception as training_error:
-            logger.error(f"Image training failed: {training_error}")
-            logger.error(f"Training error type: {type(training_error)}")
-            logger.error(f"Training error details: {str(training_error)}")
+            logger.error("Image training failed: %s", training_error)
+            logger.error("Training error type: %s", type(training_error))
+            logger.error("Training error details: %s", training_error)
             
             # Update Firestore with failed status
-            image_trainer.update_firestore_training_status(project_id, session_id, "failed")
+            await asyncio.to_thread(image_trainer.update_firestore_training_status, project_id, session_id, "failed")
             
             # No cleanup needed - no temporary files used
             
@@ -1403,91 +1528,66 @@ async def _train_image_recognition_project(
             )
             
     except Exception as e:
-        logger.error(f"Image training error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-@router.get("/session/{session_id}/projects/{project_id}/train", response_model=dict)
-async def get_guest_training_status(
-    session_id: str,
-    project_id: str,
-    session: dict = Depends(validate_session_dependency),
-    guest_service: GuestService = Depends(get_guest_service)
-):
-    """Get training status and job information for a guest project"""
-    try:
-        # Get guest project by project_id from the projects collection
-        guest_project = await guest_service.get_guest_project_by_id(project_id)
-        if not guest_project:
-            raise HTTPException(status_code=404, detail="Guest project not found")
-        
-        # Verify the project belongs to this session
-        if guest_project.get('createdBy') != f"guest:{session_id}":
-            raise HTTPException(status_code=404, detail="Project not found in this session")
-        
-        # Get training jobs for this project
-        jobs = await training_job_service.get_project_jobs(project_id)
-        
-        # Get current job status if there's a current job
-        current_job = None
-        if guest_project.get('currentJobId'):
-            current_job = await training_job_service.get_job_status(guest_project['currentJobId'])
-        
-        return {
-            "success": True,
-            "projectStatus": guest_project.get('status', 'draft'),
-            "currentJob": current_job.model_dump() if current_job else None,
-            "allJobs": [job.model_dump() for job in jobs],
-            "totalJobs": len(jobs)
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
+        logger.error("Image training error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.delete("/session/{session_id}/projects/{project_id}/train", response_model=dict)
-async def cancel_guest_training(
-    session_id: str,
-    project_id: str,
-    session: dict = Depends(validate_session_dependency),
-    guest_service: GuestService = Depends(get_guest_service)
-):
-    """Cancel current training job for a guest project"""
-    try:
-        # Get guest project by project_id from the projects collection
-        guest_project = await guest_service.get_guest_project_by_id(project_id)
-        if not guest_project:
-            raise HTTPException(status_code=404, detail="Guest project not found")
-        
-        # Verify the project belongs to this session
-        if guest_project.get('createdBy') != f"guest:{session_id}":
-            raise HTTPException(status_code=404, detail="Project not found in this session")
-        
-        if not guest_project.get('currentJobId'):
-            raise HTTPException(
-                status_code=400,
-                detail="No training job in progress"
-            )
-        
-        # Cancel the job
-        success = await training_job_service.cancel_job(guest_project['currentJobId'])
-        
-        if success:
-            return {
-                "success": True,
-                "message": "Training job cancelled successfully"
-            }
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="Failed to cancel training job"
-            )
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@router.get("/session/{session_id}/projects/{project_id}/train", response_class=ORJSONResponse)
+@guest_route
+async def get_guest_training_status(
+    session_id: str,
+    project_id: str,
+    guest_project: dict = Depends(owned_project('status', 'currentJobId', raw=True, cached=True))
+):
+    """Get training status and job information for a guest project"""
+    # Get training jobs for this project
+    jobs = await training_job_service.get_project_jobs(project_id)
+    
+    # Get current job status if there's a current job
+    view = GuestProjectView.model_validate(guest_project)
+    current_job = None
+    if view.currentJobId:
+        current_job = await training_job_service.get_job_status(view.currentJobId)
+    
+    # Jobs are already validated models - dump them straight to JSON types and skip
+    # the response_model/jsonable_encoder pass, which dominates for long job lists
+    return ORJSONResponse(content={
+        "success": True,
+        "projectStatus": view.status,
+        "currentJob": current_job.model_dump(mode="json") if current_job else None,
+        "allJobs": [job.model_dump(mode="json") for job in jobs],
+        "totalJobs": len(jobs)
+    })
+
+
+@router.delete("/session/{session_id}/projects/{project_id}/train", response_model=dict)
+@guest_route
+async def cancel_guest_training(
+    session_id: str,
+    project_id: str,
+    guest_project: dict = Depends(owned_project('currentJobId', raw=True))
+):
+    """Cancel current training job for a guest project"""
+    current_job_id = GuestProjectView.model_validate(guest_project).currentJobId
+    if not current_job_id:
+        raise HTTPException(
+            status_code=400,
+            detail="No training job in progress"
+        )
+    
+    # Cancel the job
+    success = await training_job_service.cancel_job(current_job_id)
+    
+    if success:
+        return {
+            "success": True,
+            "message": "Training job cancelled successfully"
+        }
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail="Failed to cancel training job"
+        )
 
 
 # ============================================================================
@@ -1495,239 +1595,203 @@ async def cancel_guest_training(
 # ============================================================================
 
 @router.post("/session/{session_id}/projects/{project_id}/predict", response_model=PredictionResponse)
+@guest_route
 async def predict_guest_text(
     session_id: str,
     project_id: str,
     prediction_request: PredictionRequest,
-    session: dict = Depends(validate_session_dependency),
-    guest_service: GuestService = Depends(get_guest_service)
+    guest_project: dict = Depends(owned_project('status', 'type', 'model', raw=True, cached=True))
 ):
     """Make prediction using trained guest model (text or image)"""
-    try:
-        # Get guest project by project_id from the projects collection
-        guest_project = await guest_service.get_guest_project_by_id(project_id)
-        if not guest_project:
-            raise HTTPException(status_code=404, detail="Guest project not found")
-        
-        # Verify the project belongs to this session
-        if guest_project.get('createdBy') != f"guest:{session_id}":
-            raise HTTPException(status_code=404, detail="Project not found in this session")
-        
-        if guest_project.get('status') != 'trained':
+    view = GuestProjectView.model_validate(guest_project)
+    if view.status != 'trained':
+        raise HTTPException(
+            status_code=400, 
+            detail="Project is not trained yet. Train the model first."
+        )
+    
+    project_type = view.type
+    model_type = view.model.modelType
+    
+    # Get the model path from the project
+    model_gcs_path = view.model.gcsPath
+    if not model_gcs_path:
+        raise HTTPException(
+            status_code=400,
+            detail="Model not found. Please ensure the model was saved during training."
+        )
+    
+    # Handle different model types
+    if model_type == 'efficientnet' or project_type == 'image-recognition':
+        # For image recognition, we need to handle image URLs
+        # For now, we'll assume the text field contains a GCS URL to an image
+        gcs_url_match = _GCS_URL_RE.match(prediction_request.text)
+        if not gcs_url_match:
             raise HTTPException(
-                status_code=400, 
-                detail="Project is not trained yet. Train the model first."
+                status_code=400,
+                detail="For image recognition projects, please provide a GCS URL to the image (gs://bucket/path)"
             )
         
-        project_type = guest_project.get('type', 'text-recognition')
-        model_type = guest_project.get('model', {}).get('modelType', 'logistic_regression')
+        # Imported here so text-only workers never initialize TensorFlow
+        from ...image_training_service import image_trainer
         
-        # Get the model path from the project
-        model_gcs_path = guest_project.get('model', {}).get('gcsPath')
-        if not model_gcs_path:
+        # Predict with the project's model, kept resident until it is retrained
+        try:
+            prediction_result = await asyncio.get_running_loop().run_in_executor(
+                _prediction_executor,
+                image_trainer.predict_with_cached_model,
+                gcp_clients.get_bucket(), model_gcs_path, gcs_url_match.groups()
+            )
+        except Exception as e:
+            logger.error("Failed to load image model from GCS path %s: %s", model_gcs_path, e)
             raise HTTPException(
-                status_code=400,
-                detail="Model not found. Please ensure the model was saved during training."
+                status_code=500,
+                detail="Failed to load image model from GCS"
             )
         
-        # Handle different model types
-        if model_type == 'efficientnet' or project_type == 'image-recognition':
-            # For image recognition, we need to handle image URLs
-            # For now, we'll assume the text field contains a GCS URL to an image
-            if not prediction_request.text.startswith('gs://'):
-                raise HTTPException(
-                    status_code=400,
-                    detail="For image recognition projects, please provide a GCS URL to the image (gs://bucket/path)"
-                )
-            
-            # Always load the model for each prediction (remove the is_trained check)
-            logger.info(f"Loading image model from GCS path: {model_gcs_path}")
-            success = image_trainer.load_model_from_gcs(gcp_clients.get_bucket(), model_gcs_path)
-            if not success:
-                logger.error(f"Failed to load image model from GCS path: {model_gcs_path}")
-                raise HTTPException(
-                    status_code=500,
-                    detail="Failed to load image model from GCS"
-                )
-            logger.info("Image model loaded successfully from GCS")
-            
-            # Make prediction using image URL
-            prediction_result = image_trainer.predict_from_gcs(prediction_request.text)
-            
-            # Convert to the expected format
-            return PredictionResponse(
-                success=True,
-                label=prediction_result['predicted_class'],
-                confidence=prediction_result['confidence'],
-                alternatives=[
-                    {
-                        'label': prob['class'],
-                        'confidence': prob['confidence']
-                    } for prob in prediction_result['all_probabilities'][:2]  # Top 2 alternatives
-                ]
-            )
-        elif model_type == 'distilbert':
-            # Handle DistilBERT text recognition
-            logger.info(f"Using DistilBERT for prediction")
-            prediction_result = distilbert_trainer.predict_from_gcs(
-                prediction_request.text,
-                gcp_clients.get_bucket(),
-                model_gcs_path
-            )
-            
-            return PredictionResponse(
-                success=True,
-                label=prediction_result['label'],
-                confidence=prediction_result['confidence'],
-                alternatives=prediction_result['alternatives']
-            )
-        else:
-            # Handle Logistic Regression text recognition (fallback)
-            logger.info(f"Using Logistic Regression for prediction")
-            prediction_result = trainer.predict_from_gcs(
-                prediction_request.text,
-                gcp_clients.get_bucket(),
-                model_gcs_path
-            )
-            
-            return PredictionResponse(
-                success=True,
-                label=prediction_result['label'],
-                confidence=prediction_result['confidence'],
-                alternatives=prediction_result['alternatives']
-            )
+        # Convert to the expected format
+        return PredictionResponse(
+            success=True,
+            label=prediction_result['predicted_class'],
+            confidence=prediction_result['confidence'],
+            alternatives=[
+                {
+                    'label': prob['class'],
+                    'confidence': prob['confidence']
+                } for prob in prediction_result['all_probabilities'][:2]  # Top 2 alternatives
+            ]
+        )
+    elif model_type == 'distilbert':
+        # Handle DistilBERT text recognition
+        logger.info("Using DistilBERT for prediction")
+        from ...training_service import distilbert_trainer
+        prediction_result = await asyncio.get_running_loop().run_in_executor(
+            _prediction_executor,
+            distilbert_trainer.predict_from_gcs,
+            prediction_request.text,
+            gcp_clients.get_bucket(),
+            model_gcs_path
+        )
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return PredictionResponse(
+            success=True,
+            label=prediction_result['label'],
+            confidence=prediction_result['confidence'],
+            alternatives=prediction_result['alternatives']
+        )
+    else:
+        # Handle Logistic Regression text recognition (fallback)
+        logger.info("Using Logistic Regression for prediction")
+        from ...training_service import trainer
+        prediction_result = await asyncio.get_running_loop().run_in_executor(
+            _prediction_executor,
+            trainer.predict_from_gcs,
+            prediction_request.text,
+            gcp_clients.get_bucket(),
+            model_gcs_path
+        )
+        
+        return PredictionResponse(
+            success=True,
+            label=prediction_result['label'],
+            confidence=prediction_result['confidence'],
+            alternatives=prediction_result['alternatives']
+        )
 
 
 # ============================================================================
 # PROJECT STATUS
 # ============================================================================
 
-@router.get("/session/{session_id}/projects/{project_id}/status", response_model=ProjectStatusResponseWrapper)
+@router.get("/session/{session_id}/projects/{project_id}/status", response_class=ORJSONResponse, responses={200: {"model": ProjectStatusResponseWrapper}})
+@guest_route
 async def get_guest_project_status(
     session_id: str,
     project_id: str,
-    session: dict = Depends(validate_session_dependency),
-    guest_service: GuestService = Depends(get_guest_service)
+    guest_project: dict = Depends(owned_project('status', 'dataset.examples', 'dataset.records', 'model.modelType', 'updatedAt', raw=True, cached=True))
 ):
     """Get guest project status and metadata"""
-    try:
-        # Get guest project by project_id from the projects collection
-        guest_project = await guest_service.get_guest_project_by_id(project_id)
-        if not guest_project:
-            raise HTTPException(status_code=404, detail="Guest project not found")
-        
-        # Verify the project belongs to this session
-        if guest_project.get('createdBy') != f"guest:{session_id}":
-            raise HTTPException(status_code=404, detail="Project not found in this session")
-        
-        # Convert guest project data to project status format
-        status_response = {
-            "id": guest_project.get('id'),
-            "status": guest_project.get('status', 'draft'),
-            "dataset": {
-                "examples": guest_project.get('dataset', {}).get('examples', []),
-                "size": guest_project.get('dataset', {}).get('records', 0)
-            },
-            "datasets": [],  # Guest projects only have one dataset
-            "model": {
-                "type": guest_project.get('model', {}).get('modelType', 'logistic_regression'),
-                "version": 1,
-                "status": "available" if guest_project.get('status') == "trained" else "unavailable"
-            },
-            "updatedAt": guest_project.get('updatedAt')
-        }
-        
-        return ProjectStatusResponseWrapper(data=status_response)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Convert guest project data to project status format
+    view = GuestProjectView.model_validate(guest_project)
+    dataset = guest_project.get('dataset') or {}
+    status_response = {
+        "id": view.id,
+        "status": view.status,
+        "dataset": {
+            "examples": dataset.get('examples', []),
+            "size": dataset.get('records', 0)
+        },
+        "datasets": [],  # Guest projects only have one dataset
+        "model": {
+            "type": view.model.modelType,
+            "version": 1,
+            "status": "available" if view.status == "trained" else "unavailable"
+        },
+        "updatedAt": guest_project.get('updatedAt')
+    }
+    
+    # Validate once and serialize in pydantic-core; the examples list can be thousands of rows
+    return Response(
+        content=ProjectStatusResponseWrapper(data=status_response).model_dump_json(),
+        media_type="application/json"
+    )
 
 
 # ============================================================================
 # JOB MANAGEMENT
 # ============================================================================
 
-@router.get("/session/{session_id}/projects/{project_id}/training/jobs/{job_id}", response_model=dict)
+@router.get("/session/{session_id}/projects/{project_id}/training/jobs/{job_id}", response_class=ORJSONResponse)
+@guest_route
 async def get_guest_job_status(
     session_id: str,
     project_id: str,
     job_id: str,
-    session: dict = Depends(validate_session_dependency),
-    guest_service: GuestService = Depends(get_guest_service)
+    guest_project: dict = Depends(owned_project('createdBy', raw=True, cached=True))
 ):
     """Get training job status for a guest project"""
-    try:
-        # Get guest project by project_id from the projects collection
-        guest_project = await guest_service.get_guest_project_by_id(project_id)
-        if not guest_project:
-            raise HTTPException(status_code=404, detail="Guest project not found")
-        
-        # Verify the project belongs to this session
-        if guest_project.get('createdBy') != f"guest:{session_id}":
-            raise HTTPException(status_code=404, detail="Project not found in this session")
-        
-        job = await training_job_service.get_job_status(job_id)
-        if not job:
-            raise HTTPException(status_code=404, detail="Training job not found")
-        
-        # Verify job belongs to this project
-        if job.projectId != project_id:
-            raise HTTPException(status_code=403, detail="Job not accessible for this project")
-        
-        return {
-            "success": True,
-            "job": job.model_dump()
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    job = await training_job_service.get_job_status(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    
+    # Verify job belongs to this project
+    if job.projectId != project_id:
+        raise HTTPException(status_code=403, detail="Job not accessible for this project")
+    
+    return ORJSONResponse(content={
+        "success": True,
+        "job": job.model_dump(mode="json")
+    })
 
 
 @router.delete("/session/{session_id}/projects/{project_id}/training/jobs/{job_id}", response_model=dict)
+@guest_route
 async def cancel_guest_job(
     session_id: str,
     project_id: str,
     job_id: str,
-    session: dict = Depends(validate_session_dependency),
-    project_service: ProjectService = Depends(get_project_service)
+    project: Project = Depends(get_owned_project)
 ):
     """Cancel a training job for a guest project"""
-    try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        job = await training_job_service.get_job_status(job_id)
-        if not job:
-            raise HTTPException(status_code=404, detail="Training job not found")
-        
-        # Verify job belongs to this project
-        if job.projectId != project_id:
-            raise HTTPException(status_code=403, detail="Job not accessible for this project")
-        
-        success = await training_job_service.cancel_job(job_id)
-        if success:
-            return {
-                "success": True,
-                "message": "Training job cancelled successfully"
-            }
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="Failed to cancel training job"
-            )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    job = await training_job_service.get_job_status(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    
+    # Verify job belongs to this project
+    if job.projectId != project_id:
+        raise HTTPException(status_code=403, detail="Job not accessible for this project")
+    
+    success = await training_job_service.cancel_job(job_id)
+    if success:
+        return {
+            "success": True,
+            "message": "Training job cancelled successfully"
+        }
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail="Failed to cancel training job"
+        )
 
 
 # ============================================================================
@@ -1739,16 +1803,10 @@ async def test_guest_project(
     session_id: str,
     project_id: str,
     test_data: dict,
-    session: dict = Depends(validate_session_dependency),
-    project_service: ProjectService = Depends(get_project_service)
+    project: Project = Depends(get_owned_project)
 ):
     """Test a trained guest project with new data"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         if project.status != 'trained':
             raise HTTPException(
                 status_code=400, 
@@ -1773,16 +1831,10 @@ async def test_guest_project(
 async def get_guest_test_results(
     session_id: str,
     project_id: str,
-    session: dict = Depends(validate_session_dependency),
-    project_service: ProjectService = Depends(get_project_service)
+    project: Project = Depends(get_owned_project)
 ):
     """Get test results for a guest project"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         # Return placeholder test results
         return {
             "success": True,
@@ -1805,16 +1857,10 @@ async def enable_guest_scratch(
     session_id: str,
     project_id: str,
     scratch_data: dict,
-    session: dict = Depends(validate_session_dependency),
-    project_service: ProjectService = Depends(get_project_service)
+    project: Project = Depends(get_owned_project)
 ):
     """Enable Scratch integration for a guest project"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         # Enable Scratch integration (placeholder implementation)
         return {
             "success": True,
@@ -1832,16 +1878,10 @@ async def enable_guest_scratch(
 async def get_guest_scratch_status(
     session_id: str,
     project_id: str,
-    session: dict = Depends(validate_session_dependency),
-    project_service: ProjectService = Depends(get_project_service)
+    project: Project = Depends(get_owned_project)
 ):
     """Get Scratch integration status for a guest project"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         # Return Scratch status (placeholder implementation)
         return {
             "success": True,
@@ -1859,30 +1899,65 @@ async def get_guest_scratch_status(
 # MODEL AND EXAMPLE DELETION
 # ============================================================================
 
+def _delete_blobs_batched(bucket, blob_names: List[str]) -> bool:
+    """Delete blobs in one GCS batch request, without an exists() probe first
+    
+    Returns False if any of the blobs was already gone; the rest are still deleted.
+    """
+    try:
+        with bucket.client.batch():
+            for name in blob_names:
+                bucket.blob(name).delete()
+    except NotFound:
+        return False
+    return True
+
+
+def _partition_by_label(dataset: Dataset, label: str) -> Tuple[List[TextExample], int]:
+    """Split a dataset's examples into (examples without the label, count removed)"""
+    positions = dataset.label_index().get(label)
+    if not positions:
+        return dataset.examples, 0
+    dropped = set(positions)
+    return [example for position, example in enumerate(dataset.examples) if position not in dropped], len(positions)
+
+
+def _delete_image_blobs(project_id: str, image_urls: List[str]) -> int:
+    """Delete uploaded example images by gs:// URL, with their stored embeddings
+    
+    Returns how many images were deleted. Blocking - call through gcs_call. Failures
+    are logged and skipped.
+    """
+    bucket = gcp_clients.get_bucket()
+    deleted_count = 0
+    for image_url in image_urls:
+        if not image_url or not image_url.startswith('gs://'):
+            continue
+        delete_embeddings(bucket, embedding_prefix(embeddings_dir(project_id), image_url))
+        try:
+            # Parse GCS URL
+            blob_name = image_url[5:].split('/', 1)[1]
+            bucket.blob(blob_name).delete()
+            deleted_count += 1
+            logger.info(f"Deleted image from GCS: {blob_name}")
+        except NotFound:
+            logger.warning(f"Image not found in GCS: {image_url}")
+        except Exception as e:
+            logger.warning(f"Failed to delete image from GCS {image_url}: {e}")
+    return deleted_count
+
+
 @router.delete("/projects/{project_id}/model")
 async def delete_trained_model(
     project_id: str,
     session_id: str = Query(..., description="Guest session ID"),
-    guest_service: GuestService = Depends(get_guest_service),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Delete trained model from GCS for a guest project"""
     try:
-        # Validate session
-        session = await validate_session_dependency(session_id, guest_service)
         logger.info(f"Session validated for project {project_id}, session {session_id}")
         
-        # Get project to verify ownership and get model path
-        project = await project_service.get_project(project_id)
-        if not project:
-            logger.error(f"Project {project_id} not found")
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Verify project belongs to this guest session
-        if project.student_id != session_id:
-            logger.error(f"Project {project_id} does not belong to session {session_id}")
-            raise HTTPException(status_code=403, detail="Project does not belong to this session")
-        
         # Check if project has a trained model
         if not project.model or not project.model.gcsPath:
             logger.warning(f"Project {project_id} has no trained model to delete")
@@ -1890,11 +1965,7 @@ async def delete_trained_model(
         
         # Delete model from GCS
         try:
-            from google.cloud import storage
-            from ...config import gcp_clients
-            
             # Use the configured bucket from config instead of parsing from path
-            storage_client = storage.Client()
             bucket = gcp_clients.get_bucket()
             
             logger.info(f"Using GCS bucket: {bucket.name}")
@@ -1902,10 +1973,7 @@ async def delete_trained_model(
             logger.info(f"Full GCS object path: gs://{bucket.name}/{project.model.gcsPath}")
             
             # The gcsPath is just the object path within the bucket
-            blob = bucket.blob(project.model.gcsPath)
-            
-            if blob.exists():
-                blob.delete()
+            if await gcs_call(_delete_blobs_batched, bucket, [project.model.gcsPath]):
                 logger.info(f"Successfully deleted model file from GCS: {project.model.gcsPath}")
             else:
                 logger.warning(f"Model file not found in GCS: {project.model.gcsPath}")
@@ -1916,16 +1984,13 @@ async def delete_trained_model(
             raise HTTPException(status_code=500, detail=f"Failed to delete model from GCS: {str(e)}")
         
         # Update project to remove model information
+        deleted_gcs_path = project.model.gcsPath
         try:
             project.model = TrainedModel()  # Reset to empty model
             project.status = "draft"  # Reset status
-            project.updatedAt = datetime.now(timezone.utc)
             
-            # Update in database
-            await project_service.update_project(project_id, ProjectUpdate(
-                status="draft",
-                updatedAt=datetime.now(timezone.utc)
-            ))
+            # Write back the project we already loaded (save_project stamps updatedAt)
+            await project_service.save_project(project)
             
             logger.info(f"Successfully updated project {project_id} after model deletion")
             
@@ -1937,7 +2002,7 @@ async def delete_trained_model(
             "success": True,
             "message": "Trained model deleted successfully",
             "project_id": project_id,
-            "deleted_gcs_path": project.model.gcsPath
+            "deleted_gcs_path": deleted_gcs_path
         }
         
     except HTTPException:
@@ -1952,49 +2017,21 @@ async def delete_examples_by_label(
     project_id: str,
     label: str,
     session_id: str = Query(..., description="Guest session ID"),
-    guest_service: GuestService = Depends(get_guest_service),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Delete all examples under a specific label for a guest project"""
     try:
-        # Validate session
-        session = await validate_session_dependency(session_id, guest_service)
         logger.info(f"Session validated for project {project_id}, session {session_id}, label: {label}")
         
-        # Get project to verify ownership
-        project = await project_service.get_project(project_id)
-        if not project:
-            logger.error(f"Project {project_id} not found")
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Verify project belongs to this guest session
-        if project.student_id != session_id:
-            logger.error(f"Project {project_id} does not belong to session {session_id}")
-            raise HTTPException(status_code=403, detail="Project does not belong to this session")
-        
-        # Ensure dataset is properly typed (in case deserialization had issues)
-        if isinstance(project.dataset, dict):
-            logger.info(f"Debug: Converting dataset dict to Dataset object for project {project_id}")
-            # Convert examples if needed
-            if 'examples' in project.dataset and isinstance(project.dataset['examples'], list):
-                examples = []
-                for example_data in project.dataset['examples']:
-                    if isinstance(example_data, dict):
-                        examples.append(TextExample(**example_data))
-                    else:
-                        examples.append(example_data)
-                project.dataset['examples'] = examples
-            project.dataset = Dataset(**project.dataset)
-        
         # Check if project has examples
         if not project.dataset or not project.dataset.examples:
             logger.warning(f"Project {project_id} has no examples to delete")
             raise HTTPException(status_code=404, detail="No examples found for this project")
         
-        # Count examples before deletion
+        # Count examples before deletion and split off the label in one pass
         examples_before = len(project.dataset.examples)
-        examples_with_label = [ex for ex in project.dataset.examples if ex.label == label]
-        examples_to_delete = len(examples_with_label)
+        retained_examples, examples_to_delete = _partition_by_label(project.dataset, label)
         
         logger.info(f"Project {project_id} has {examples_before} total examples before deletion")
         logger.info(f"Found {examples_to_delete} examples with label '{label}' to delete")
@@ -2004,7 +2041,7 @@ async def delete_examples_by_label(
             raise HTTPException(status_code=404, detail=f"No examples found with label '{label}'")
         
         # Remove examples with the specified label
-        project.dataset.examples = [ex for ex in project.dataset.examples if ex.label != label]
+        project.dataset.examples = retained_examples
         
         # Keep the label in the labels list even if no examples remain
         # This allows users to add examples to the label again without recreating it
@@ -2017,21 +2054,12 @@ async def delete_examples_by_label(
         
         # Save the complete project with updated dataset to database
         try:
-            # Ensure all dataset fields are properly set and preserve the deleted label
-            if not hasattr(project.dataset, 'labels') or project.dataset.labels is None:
-                project.dataset.labels = []
-            
-            # Keep existing labels and add any new ones from examples
-            existing_labels = set(project.dataset.labels)
-            example_labels = set(example.label for example in project.dataset.examples)
+            # dataset.labels is left as is: deleting examples never adds a label, and the
+            # cleared label stays listed
             
-            # Preserve all existing labels (including the one we just cleared examples from)
-            # and add any new labels from examples
-            all_labels = existing_labels.union(example_labels)
-            project.dataset.labels = list(all_labels)
-            
-            # Use the save_project method to avoid any ProjectUpdate serialization issues
-            await project_service.save_project(project)
+            # Write only the removed examples and counters instead of the whole project
+            # Report the count actually stored, which concurrent edits may have changed
+            _, project.dataset.records = await project_service.pull_examples(project_id, label)
             
             logger.info(f"Successfully deleted {examples_to_delete} examples with label '{label}' from project {project_id}")
             logger.info(f"Project saved to database with {project.dataset.records} examples")
@@ -2051,7 +2079,7 @@ async def delete_examples_by_label(
             "label": label,
             "examples_deleted": examples_to_delete,
             "examples_before": examples_before,
-            "examples_after": len(project.dataset.examples)
+            "examples_after": project.dataset.records
         }
         
     except HTTPException:
@@ -2067,86 +2095,47 @@ async def delete_specific_example(
     label: str,
     example_index: int,
     session_id: str = Query(..., description="Guest session ID"),
-    guest_service: GuestService = Depends(get_guest_service),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Delete a specific example by index under a label for a guest project"""
     try:
-        # Validate session
-        session = await validate_session_dependency(session_id, guest_service)
         logger.info(f"Session validated for project {project_id}, session {session_id}, label: {label}, index: {example_index}")
         
-        # Get project to verify ownership
-        project = await project_service.get_project(project_id)
-        if not project:
-            logger.error(f"Project {project_id} not found")
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Verify project belongs to this guest session
-        if project.student_id != session_id:
-            logger.error(f"Project {project_id} does not belong to session {session_id}")
-            raise HTTPException(status_code=403, detail="Project does not belong to this session")
-        
-        # Ensure dataset is properly typed (in case deserialization had issues)
-        if isinstance(project.dataset, dict):
-            logger.info(f"Debug: Converting dataset dict to Dataset object for project {project_id}")
-            # Convert examples if needed
-            if 'examples' in project.dataset and isinstance(project.dataset['examples'], list):
-                examples = []
-                for example_data in project.dataset['examples']:
-                    if isinstance(example_data, dict):
-                        examples.append(TextExample(**example_data))
-                    else:
-                        examples.append(example_data)
-                project.dataset['examples'] = examples
-            project.dataset = Dataset(**project.dataset)
-        
         # Check if project has examples
         if not project.dataset or not project.dataset.examples:
             logger.warning(f"Project {project_id} has no examples to delete")
             raise HTTPException(status_code=404, detail="No examples found for this project")
         
-        # Find examples with the specified label
-        examples_with_label = [ex for ex in project.dataset.examples if ex.label == label]
+        # Find the dataset positions of the examples with the specified label
+        label_positions = project.dataset.label_index().get(label, [])
         
-        if not examples_with_label:
+        if not label_positions:
             logger.warning(f"No examples found with label '{label}' in project {project_id}")
             raise HTTPException(status_code=404, detail=f"No examples found with label '{label}'")
         
         # Validate example index
-        if example_index < 0 or example_index >= len(examples_with_label):
-            logger.error(f"Invalid example index {example_index} for label '{label}' (valid range: 0-{len(examples_with_label)-1})")
+        if example_index < 0 or example_index >= len(label_positions):
+            logger.error(f"Invalid example index {example_index} for label '{label}' (valid range: 0-{len(label_positions)-1})")
             raise HTTPException(
                 status_code=400, 
-                detail=f"Invalid example index. Valid range: 0-{len(examples_with_label)-1}"
+                detail=f"Invalid example index. Valid range: 0-{len(label_positions)-1}"
             )
         
-        # Get the example to delete
-        example_to_delete = examples_with_label[example_index]
-        
-        # Remove the specific example from the dataset
-        project.dataset.examples.remove(example_to_delete)
+        # Remove the specific example from the dataset by position, not by value
+        # (list.remove would rescan and compare every field of each example)
+        example_to_delete = project.dataset.examples.pop(label_positions[example_index])
         
         # Update dataset size
         project.dataset.records = len(project.dataset.examples)
         
         # Save the complete project with updated dataset to database
         try:
-            # Ensure all dataset fields are properly set and preserve empty labels
-            if not hasattr(project.dataset, 'labels') or project.dataset.labels is None:
-                project.dataset.labels = []
-            
-            # Keep existing labels and add any new ones from examples
-            # This preserves empty labels even when they have no examples
-            existing_labels = set(project.dataset.labels)
-            example_labels = set(example.label for example in project.dataset.examples)
+            # dataset.labels is left as is, so a label that just lost its last example stays listed
             
-            # Preserve all existing labels (including empty ones) and add any new labels from examples
-            all_labels = existing_labels.union(example_labels)
-            project.dataset.labels = list(all_labels)
-            
-            # Use the save_project method to avoid any ProjectUpdate serialization issues
-            await project_service.save_project(project)
+            # Write only the removed example and counters instead of the whole project
+            # Report the count actually stored, which concurrent edits may have changed
+            _, project.dataset.records = await project_service.pull_examples(project_id, label, position=example_index)
             
             logger.info(f"Successfully deleted example '{example_to_delete.text[:50]}...' with label '{label}' from project {project_id}")
             logger.info(f"Project saved to database with {project.dataset.records} examples")
@@ -2166,7 +2155,7 @@ async def delete_specific_example(
             "label": label,
             "example_index": example_index,
             "deleted_example": example_to_delete.text[:100],  # First 100 chars for reference
-            "examples_remaining": len(project.dataset.examples)
+            "examples_remaining": project.dataset.records
         }
         
     except HTTPException:
@@ -2181,56 +2170,33 @@ async def delete_label(
     project_id: str,
     label: str,
     session_id: str = Query(..., description="Guest session ID"),
-    guest_service: GuestService = Depends(get_guest_service),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Delete a label completely from a guest project, including all its examples"""
     try:
-        # Validate session
-        session = await validate_session_dependency(session_id, guest_service)
         logger.info(f"Session validated for project {project_id}, session {session_id}, label: {label}")
         
-        # Get project to verify ownership
-        project = await project_service.get_project(project_id)
-        if not project:
-            logger.error(f"Project {project_id} not found")
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Verify project belongs to this guest session
-        if project.student_id != session_id:
-            logger.error(f"Project {project_id} does not belong to session {session_id}")
-            raise HTTPException(status_code=403, detail="Project does not belong to this session")
-        
-        # Ensure dataset is properly typed (in case deserialization had issues)
-        if isinstance(project.dataset, dict):
-            logger.info(f"Debug: Converting dataset dict to Dataset object for project {project_id}")
-            # Convert examples if needed
-            if 'examples' in project.dataset and isinstance(project.dataset['examples'], list):
-                examples = []
-                for example_data in project.dataset['examples']:
-                    if isinstance(example_data, dict):
-                        examples.append(TextExample(**example_data))
-                    else:
-                        examples.append(example_data)
-                project.dataset['examples'] = examples
-            project.dataset = Dataset(**project.dataset)
-        
         # Check if project has dataset
         if not project.dataset:
             logger.warning(f"Project {project_id} has no dataset")
             raise HTTPException(status_code=404, detail="No dataset found for this project")
         
-        # Count examples before deletion
+        # Unknown label (neither listed nor used by an example) - nothing to delete
+        if label not in project.dataset.labels and label not in project.dataset.label_index():
+            logger.warning(f"Label '{label}' not found in project {project_id}")
+            raise HTTPException(status_code=404, detail=f"Label '{label}' not found")
+        
+        # Count examples before deletion and split off the label in one pass
         examples_before = len(project.dataset.examples) if project.dataset.examples else 0
-        examples_with_label = [ex for ex in project.dataset.examples if ex.label == label] if project.dataset.examples else []
-        examples_to_delete = len(examples_with_label)
+        retained_examples, examples_to_delete = _partition_by_label(project.dataset, label)
         
         logger.info(f"Project {project_id} has {examples_before} total examples before deletion")
         logger.info(f"Found {examples_to_delete} examples with label '{label}' to delete")
         
         # Remove examples with the specified label
         if project.dataset.examples:
-            project.dataset.examples = [ex for ex in project.dataset.examples if ex.label != label]
+            project.dataset.examples = retained_examples
         
         # Remove the label from the labels list
         if hasattr(project.dataset, 'labels') and project.dataset.labels:
@@ -2246,14 +2212,9 @@ async def delete_label(
         
         # Save the complete project with updated dataset to database
         try:
-            # Ensure all dataset fields are properly set
-            if not hasattr(project.dataset, 'labels') or project.dataset.labels is None:
-                # Regenerate labels from remaining examples
-                all_labels = set(example.label for example in project.dataset.examples) if project.dataset.examples else set()
-                project.dataset.labels = list(all_labels)
-            
-            # Use the save_project method to avoid any ProjectUpdate serialization issues
-            await project_service.save_project(project)
+            # Write only the removed examples, the label and counters instead of the whole project
+            # Report the count actually stored, which concurrent edits may have changed
+            _, project.dataset.records = await project_service.pull_examples(project_id, label, remove_label=True)
             
             logger.info(f"Successfully deleted label '{label}' and {examples_to_delete} examples from project {project_id}")
             logger.info(f"Project saved to database with {project.dataset.records} examples")
@@ -2273,7 +2234,7 @@ async def delete_label(
             "label": label,
             "examples_deleted": examples_to_delete,
             "examples_before": examples_before,
-            "examples_after": len(project.dataset.examples) if project.dataset.examples else 0,
+            "examples_after": project.dataset.records,
             "label_removed": True
         }
         
@@ -2289,47 +2250,20 @@ async def delete_empty_label(
     project_id: str,
     label: str,
     session_id: str = Query(..., description="Guest session ID"),
-    guest_service: GuestService = Depends(get_guest_service),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Delete an empty label (label with no examples) from a guest project"""
     try:
-        # Validate session
-        session = await validate_session_dependency(session_id, guest_service)
         logger.info(f"Session validated for project {project_id}, session {session_id}, label: {label}")
         
-        # Get project to verify ownership
-        project = await project_service.get_project(project_id)
-        if not project:
-            logger.error(f"Project {project_id} not found")
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Verify project belongs to this guest session
-        if project.student_id != session_id:
-            logger.error(f"Project {project_id} does not belong to session {session_id}")
-            raise HTTPException(status_code=403, detail="Project does not belong to this session")
-        
-        # Ensure dataset is properly typed (in case deserialization had issues)
-        if isinstance(project.dataset, dict):
-            logger.info(f"Debug: Converting dataset dict to Dataset object for project {project_id}")
-            # Convert examples if needed
-            if 'examples' in project.dataset and isinstance(project.dataset['examples'], list):
-                examples = []
-                for example_data in project.dataset['examples']:
-                    if isinstance(example_data, dict):
-                        examples.append(TextExample(**example_data))
-                    else:
-                        examples.append(example_data)
-                project.dataset['examples'] = examples
-            project.dataset = Dataset(**project.dataset)
-        
         # Check if project has dataset
         if not project.dataset:
             logger.warning(f"Project {project_id} has no dataset")
             raise HTTPException(status_code=404, detail="No dataset found for this project")
         
         # Check if label has examples
-        examples_with_label = [ex for ex in project.dataset.examples if ex.label == label] if project.dataset.examples else []
+        examples_with_label = project.dataset.label_index().get(label, [])
         
         if examples_with_label:
             logger.warning(f"Label '{label}' has {len(examples_with_label)} examples, cannot delete as empty label")
@@ -2385,23 +2319,13 @@ async def delete_image_label(
     session_id: str,
     project_id: str,
     label: str,
-    session: dict = Depends(validate_session_dependency),
-    guest_service: GuestService = Depends(get_guest_service),
+    guest_project: dict = Depends(get_owned_guest_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Delete an image label completely from a guest project, including all its examples"""
     try:
         logger.info(f"Deleting image label '{label}' completely from project {project_id}")
         
-        # Get guest project
-        guest_project = await guest_service.get_guest_project_by_id(project_id)
-        if not guest_project:
-            raise HTTPException(status_code=404, detail="Guest project not found")
-        
-        # Verify project belongs to this session
-        if guest_project.get('createdBy') != f"guest:{session_id}":
-            raise HTTPException(status_code=404, detail="Project not found in this session")
-        
         # Get image examples
         image_examples = guest_project.get('dataset', {}).get('image_examples', [])
         if not image_examples:
@@ -2413,24 +2337,9 @@ async def delete_image_label(
             raise HTTPException(status_code=404, detail=f"No image examples found with label '{label}'")
         
         # Delete all images from GCS
-        deleted_count = 0
-        for example in examples_with_label:
-            image_url = example.get('image_url', '')
-            if image_url and image_url.startswith('gs://'):
-                try:
-                    # Parse GCS URL
-                    url_parts = image_url[5:].split('/', 1)
-                    bucket_name = url_parts[0]
-                    blob_name = url_parts[1]
-                    
-                    # Delete from GCS
-                    bucket = gcp_clients.get_bucket()
-                    blob = bucket.blob(blob_name)
-                    blob.delete()
-                    deleted_count += 1
-                    logger.info(f"Deleted image from GCS: {blob_name}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete image from GCS {image_url}: {e}")
+        deleted_count = await gcs_call(
+            _delete_image_blobs, project_id, [example.get('image_url', '') for example in examples_with_label]
+        )
         
         # Remove all examples with this label
         remaining_examples = [ex for ex in image_examples if ex.get('label') != label]
@@ -2474,23 +2383,13 @@ async def delete_empty_image_label(
     session_id: str,
     project_id: str,
     label: str,
-    session: dict = Depends(validate_session_dependency),
-    guest_service: GuestService = Depends(get_guest_service),
+    guest_project: dict = Depends(get_owned_guest_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Delete an empty image label (label with no examples) from a guest project"""
     try:
         logger.info(f"Deleting empty image label '{label}' from project {project_id}")
         
-        # Get guest project
-        guest_project = await guest_service.get_guest_project_by_id(project_id)
-        if not guest_project:
-            raise HTTPException(status_code=404, detail="Guest project not found")
-        
-        # Verify project belongs to this session
-        if guest_project.get('createdBy') != f"guest:{session_id}":
-            raise HTTPException(status_code=404, detail="Project not found in this session")
-        
         # Get image examples
         image_examples = guest_project.get('dataset', {}).get('image_examples', [])
         
@@ -2544,23 +2443,13 @@ async def delete_image_examples_by_label(
     session_id: str,
     project_id: str,
     label: str,
-    session: dict = Depends(validate_session_dependency),
-    guest_service: GuestService = Depends(get_guest_service),
+    guest_project: dict = Depends(get_owned_guest_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Delete all image examples under a specific label for a guest project"""
     try:
         logger.info(f"Deleting all image examples for label '{label}' in project {project_id}")
         
-        # Get guest project
-        guest_project = await guest_service.get_guest_project_by_id(project_id)
-        if not guest_project:
-            raise HTTPException(status_code=404, detail="Guest project not found")
-        
-        # Verify project belongs to this session
-        if guest_project.get('createdBy') != f"guest:{session_id}":
-            raise HTTPException(status_code=404, detail="Project not found in this session")
-        
         # Get image examples
         image_examples = guest_project.get('dataset', {}).get('image_examples', [])
         
@@ -2586,24 +2475,9 @@ async def delete_image_examples_by_label(
             }
         
         # Delete images from GCS
-        deleted_count = 0
-        for example in examples_with_label:
-            image_url = example.get('image_url', '')
-            if image_url and image_url.startswith('gs://'):
-                try:
-                    # Parse GCS URL
-                    url_parts = image_url[5:].split('/', 1)
-                    bucket_name = url_parts[0]
-                    blob_name = url_parts[1]
-                    
-                    # Delete from GCS
-                    bucket = gcp_clients.get_bucket()
-                    blob = bucket.blob(blob_name)
-                    blob.delete()
-                    deleted_count += 1
-                    logger.info(f"Deleted image from GCS: {blob_name}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete image from GCS {image_url}: {e}")
+        deleted_count = await gcs_call(
+            _delete_image_blobs, project_id, [example.get('image_url', '') for example in examples_with_label]
+        )
         
         # Remove examples from project
         remaining_examples = [ex for ex in image_examples if ex.get('label') != label]
@@ -2619,7 +2493,6 @@ async def delete_image_examples_by_label(
             logger.info(f"Added label '{label}' to labels array to keep it as empty label")
         
         # Update project using ProjectService
-        from ...models import ProjectUpdate
         project_update = ProjectUpdate(
             dataset={
                 'image_examples': remaining_examples,
@@ -2653,23 +2526,13 @@ async def delete_specific_image_example(
     project_id: str,
     label: str,
     example_index: int,
-    session: dict = Depends(validate_session_dependency),
-    guest_service: GuestService = Depends(get_guest_service),
+    guest_project: dict = Depends(get_owned_guest_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Delete a specific image example by index under a label for a guest project"""
     try:
         logger.info(f"Deleting specific image example {example_index} for label '{label}' in project {project_id}")
         
-        # Get guest project
-        guest_project = await guest_service.get_guest_project_by_id(project_id)
-        if not guest_project:
-            raise HTTPException(status_code=404, detail="Guest project not found")
-        
-        # Verify project belongs to this session
-        if guest_project.get('createdBy') != f"guest:{session_id}":
-            raise HTTPException(status_code=404, detail="Project not found in this session")
-        
         # Get image examples
         image_examples = guest_project.get('dataset', {}).get('image_examples', [])
         logger.info(f"Total image examples in project: {len(image_examples)}")
@@ -2700,22 +2563,7 @@ async def delete_specific_image_example(
         image_url = example_to_delete.get('image_url', '')
         
         # Delete image from GCS
-        gcs_deleted = False
-        if image_url and image_url.startswith('gs://'):
-            try:
-                # Parse GCS URL
-                url_parts = image_url[5:].split('/', 1)
-                bucket_name = url_parts[0]
-                blob_name = url_parts[1]
-                
-                # Delete from GCS
-                bucket = gcp_clients.get_bucket()
-                blob = bucket.blob(blob_name)
-                blob.delete()
-                gcs_deleted = True
-                logger.info(f"Deleted image from GCS: {blob_name}")
-            except Exception as e:
-                logger.warning(f"Failed to delete image from GCS {image_url}: {e}")
+        gcs_deleted = await gcs_call(_delete_image_blobs, project_id, [image_url]) == 1
         
         # Remove the specific example from project
         image_examples.remove(example_to_delete)
@@ -2724,7 +2572,6 @@ async def delete_specific_image_example(
         current_labels = guest_project.get('dataset', {}).get('labels', [])
         
         # Update project using ProjectService
-        from ...models import ProjectUpdate
         project_update = ProjectUpdate(
             dataset={
                 'image_examples': image_examples,
@@ -2866,18 +2713,11 @@ async def delete_guest_session(
 async def start_scratch_services(
     session_id: str,
     project_id: str,
-    session: dict = Depends(validate_session_dependency),
-    project_service: ProjectService = Depends(get_project_service)
+    project: Project = Depends(get_owned_project)
 ):
     """Start Scratch services for a guest project"""
     try:
-        # Verify project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project or project.student_id != session_id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         # Use production URL in production, localhost in development
-        from ...config import settings
         gui_url = "http://localhost:8601" if settings.node_env == "development" else settings.scratch_editor_url
         vm_url = "http://localhost:8602" if settings.node_env == "development" else settings.scratch_editor_url
         
@@ -2901,7 +2741,6 @@ async def start_all_scratch_services():
     """Start all Scratch services (scratch-gui, scratch-vm, etc.)"""
     try:
         # Use production URL in production, localhost in development
-        from ...config import settings
         gui_url = "http://localhost:8601" if settings.node_env == "development" else settings.scratch_editor_url
         vm_url = "http://localhost:8602" if settings.node_env == "development" else settings.scratch_editor_url
         
@@ -2938,25 +2777,16 @@ async def start_all_scratch_services():
 async def get_guest_examples(
     session_id: str,
     project_id: str,
-    session: dict = Depends(validate_session_dependency),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Get examples and model information for Scratch extension"""
     try:
-        # Validate that the project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Check if project belongs to this session
-        if project.guest_session_id != session_id and project.createdBy != f"guest:{session_id}":
-            raise HTTPException(status_code=403, detail="Project does not belong to this session")
-        
         # Get examples for this project
         examples = await project_service.get_project_examples(project_id)
         
         # Extract unique labels from examples
-        labels = list(set([ex.label for ex in examples if ex.label]))
+        labels = list({ex.label for ex in examples if ex.label})
         
         # Check if model is ready (has training data)
         model_ready = len(examples) > 0
@@ -2986,20 +2816,11 @@ async def train_guest_project(
     session_id: str,
     project_id: str,
     request: dict,
-    session: dict = Depends(validate_session_dependency),
+    project: Project = Depends(get_owned_project),
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Add training data or start training for Scratch extension"""
     try:
-        # Validate that the project belongs to this session
-        project = await project_service.get_project(project_id)
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Check if project belongs to this session
-        if project.guest_session_id != session_id:
-            raise HTTPException(status_code=403, detail="Project does not belong to this session")
-        
         # Check if this is adding training data or starting training
         if 'text' in request and 'label' in request:
             # Adding training data
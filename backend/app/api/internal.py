@@ -1,20 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends
 
 from ..models import CleanupRequest, CleanupResponse, ErrorResponse
-from ..services.agent_service import AgentService
+from ..services.agent_service import AgentService, get_agent_service as _shared_agent_service
 
 router = APIRouter(prefix="/internal", tags=["agent"])
 
 
-def get_agent_service():
+async def get_agent_service() -> AgentService:
     """Dependency function for AgentService - lazy initialization"""
-    try:
-        return AgentService()
-    except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.warning(f"AgentService initialization deferred: {e}")
-        return AgentService()
+    return _shared_agent_service()
 
 
 @router.post("/cleanup", response_model=CleanupResponse)
@@ -7,7 +7,7 @@ from ..models import (
     KnowledgeTextRequest, KnowledgeFileRequest, KnowledgeLinkRequest, KnowledgeQnARequest,
     KnowledgeResponse, KnowledgeFileResponse, ErrorResponse
 )
-from ..services.knowledge_service import KnowledgeService
+from ..services.knowledge_service import KnowledgeService, get_knowledge_service as _shared_knowledge_service
 from ..services.file_service import FileService, get_file_service
 from ..config import gcp_clients
 
@@ -16,10 +16,9 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/kb", tags=["agent"])
 
 
-def get_knowledge_service():
+async def get_knowledge_service() -> KnowledgeService:
     """Dependency function for KnowledgeService - lazy initialization"""
-    # Service is lazy, so __init__ won't fail - GCP clients initialize on first use
-    return KnowledgeService()
+    return _shared_knowledge_service()
 
 
 class KnowledgeUpdateRequest(BaseModel):
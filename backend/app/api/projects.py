@@ -9,8 +9,7 @@ from ..models import (
     FileUploadResponse, TrainingResponse, ErrorResponse,
     ExampleAdd, ExamplesBulkAdd, PredictionRequest, PredictionResponse
 )
-from ..services.project_service import ProjectService
-from ..training_service import trainer
+from ..services.project_service import ProjectService, get_project_service as _shared_project_service
 from ..training_job_service import training_job_service
 from ..config import gcp_clients
 
@@ -18,8 +17,8 @@ router = APIRouter(prefix="/api/projects", tags=["projects"])
 
 
 # Dependency to get project service
-def get_project_service():
-    return ProjectService()
+async def get_project_service() -> ProjectService:
+    return _shared_project_service()
 
 
 @router.get("/", response_model=ProjectListResponse)
@@ -43,10 +42,7 @@ async def get_projects(
             if created_by:
                 filters['createdBy'] = created_by
             
-            projects = await project_service.search_projects(search, filters)
-            total = len(projects)
-            # Apply pagination
-            projects = projects[offset:offset + limit]
+            projects, total = await project_service.search_projects(search, filters, offset, limit)
         else:
             projects = await project_service.get_projects(limit, offset, status, type, created_by)
             total = len(projects)  # In production, you'd get total count separately
@@ -151,6 +147,10 @@ async def upload_dataset(
 ):
     """Upload dataset file for a project"""
     try:
+        # Reject oversized files from their spooled size before streaming them
+        if file.size is not None and file.size > 100 * 1024 * 1024:
+            raise HTTPException(status_code=413, detail="File too large. Maximum size is 100MB.")
+        
         # Validate file type
         allowed_types = [
             'text/csv',
@@ -166,16 +166,6 @@ async def upload_dataset(
                 detail="Invalid file type. Only CSV, JSON, and Excel files are allowed."
             )
         
-        # Read file content
-        file_content = await file.read()
-        
-        # Check file size (100MB limit)
-        if len(file_content) > 100 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400,
-                detail="File too large. Maximum size is 100MB."
-            )
-        
         # Prepare metadata
         metadata = {
             'records': records,
@@ -184,14 +174,18 @@ async def upload_dataset(
             'contentType': file.content_type
         }
         
-        # Upload to service
-        result = await project_service.upload_dataset(
-            project_id,
-            file_content,
-            file.filename,
-            file.content_type,
-            metadata
-        )
+        # Stream to GCS through the service (100MB limit, enforced while streaming)
+        try:
+            result = await project_service.upload_dataset(
+                project_id,
+                file,
+                file.filename,
+                file.content_type,
+                metadata,
+                max_bytes=100 * 1024 * 1024
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return FileUploadResponse(
             success=result['success'],
@@ -371,6 +365,8 @@ async def predict_text(
     project_service: ProjectService = Depends(get_project_service)
 ):
     """Make prediction using trained model"""
+    from ..training_service import trainer
+    
     try:
         # Get project
         project = await project_service.get_project(project_id)
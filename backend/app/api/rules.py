@@ -6,7 +6,7 @@ from ..models import (
     RuleSaveRequest, RuleResponse, RuleListResponse,
     ErrorResponse
 )
-from ..services.rules_service import RulesService
+from ..services.rules_service import RulesService, get_rules_service as _shared_rules_service
 
 router = APIRouter(prefix="/rules", tags=["agent"])
 
@@ -15,10 +15,9 @@ class RuleStatusUpdate(BaseModel):
     active: bool
 
 
-def get_rules_service():
+async def get_rules_service() -> RulesService:
     """Dependency function for RulesService - lazy initialization"""
-    # Service is lazy, so __init__ won't fail - GCP clients initialize on first use
-    return RulesService()
+    return _shared_rules_service()
 
 
 @router.post("/save", response_model=RuleResponse)
@@ -242,7 +242,6 @@ async def start_all_services(background_tasks: BackgroundTasks):
         status = service_manager.get_service_status()
         
         # Use production URL in production, localhost in development
-        from ..config import settings
         gui_url = "http://localhost:8601" if settings.node_env == "development" else settings.scratch_editor_url
         vm_url = "http://localhost:8602" if settings.node_env == "development" else settings.scratch_editor_url
         
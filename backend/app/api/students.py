@@ -4,14 +4,14 @@ from typing import List, Optional
 from ..models import (
     Student, StudentJoin, StudentResponse, StudentListResponse
 )
-from ..services.student_service import StudentService
+from ..services.student_service import StudentService, get_student_service as _shared_student_service
 
 router = APIRouter(prefix="/api/students", tags=["students"])
 
 
 # Dependency to get student service
-def get_student_service():
-    return StudentService()
+async def get_student_service() -> StudentService:
+    return _shared_student_service()
 
 
 @router.post("/join", response_model=StudentResponse, status_code=201)
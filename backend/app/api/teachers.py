@@ -5,14 +5,14 @@ from ..models import (
     Teacher, TeacherCreate, ClassroomCreate, TeacherResponse, 
     TeacherListResponse, ClassroomResponse, TeacherDashboardResponse
 )
-from ..services.teacher_service import TeacherService
+from ..services.teacher_service import TeacherService, get_teacher_service as _shared_teacher_service
 
 router = APIRouter(prefix="/api/teachers", tags=["teachers"])
 
 
 # Dependency to get teacher service
-def get_teacher_service():
-    return TeacherService()
+async def get_teacher_service() -> TeacherService:
+    return _shared_teacher_service()
 
 
 @router.post("/register", response_model=TeacherResponse, status_code=201)
@@ -12,7 +12,7 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
-from ..services.training_chat_service import TrainingChatService
+from ..services.training_chat_service import TrainingChatService, get_training_chat_service as _shared_training_chat_service
 from ..models import (
     CreateChatRequest, CreateChatResponse,
     GetChatsResponse, GetChatResponse,
@@ -24,10 +24,9 @@ from ..models import (
 router = APIRouter(prefix="/training", tags=["training"])
 
 
-def get_training_service():
+async def get_training_service() -> TrainingChatService:
     """Dependency function for TrainingChatService - lazy initialization"""
-    # Service is lazy, so __init__ won't fail - GCP clients initialize on first use
-    return TrainingChatService()
+    return _shared_training_chat_service()
 
 
 # Request/Response Models
@@ -2,7 +2,9 @@ import os
 from typing import Optional
 from pydantic import Field
 from pydantic_settings import BaseSettings
+from google.api_core.client_info import ClientInfo
 from google.cloud import firestore, storage, pubsub_v1
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -25,6 +27,9 @@ class Settings(BaseSettings):
     # Performance optimizations
     firestore_batch_size: int = Field(default=500, env="FIRESTORE_BATCH_SIZE")
     gcs_chunk_size: int = Field(default=8 * 1024 * 1024, env="GCS_CHUNK_SIZE")  # 8MB chunks
+    embedding_cache_path: str = Field(default="/tmp/embedding_cache.sqlite3", env="EMBEDDING_CACHE_PATH")
+    # Stream guest images through the API instead of redirecting to signed GCS URLs
+    proxy_images: bool = Field(default=False, env="PROXY_IMAGES")
     
     # CORS Configuration
     cors_origin: str = Field(default="https://playground-theneural.vercel.app,https://playground.theneural.in", env="CORS_ORIGIN")
@@ -54,6 +59,11 @@ class Settings(BaseSettings):
 settings = Settings()
 
 
+# Keep-alive sockets kept open to GCS; sized for the shared GCS pool plus image prep threads
+_GCS_POOL_CONNECTIONS = 32
+_GCS_POOL_MAXSIZE = 64
+
+
 class GCPClients:
     """GCP client initialization using Application Default Credentials with lazy loading"""
     
@@ -79,7 +89,15 @@ class GCPClients:
             self._projects_collection = self._firestore_client.collection('projects')
             
             # Initialize Storage client
-            self._storage_client = storage.Client(project=self.project_id)
+            self._storage_client = storage.Client(
+                project=self.project_id,
+                client_info=ClientInfo(user_agent="theneural-backend/1.0.0")
+            )
+            # The default adapter keeps only 10 sockets, so concurrent downloads kept reconnecting
+            self._storage_client._http.mount(
+                "https://",
+                HTTPAdapter(pool_connections=_GCS_POOL_CONNECTIONS, pool_maxsize=_GCS_POOL_MAXSIZE)
+            )
             self._bucket = self._storage_client.bucket(settings.gcs_bucket_name)
             
             # Initialize Pub/Sub clients
@@ -10,19 +10,144 @@ import tempfile
 import time
 import shutil
 import zipfile
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Union
 from datetime import datetime, timezone
 import logging
-from google.cloud import storage
 from google.cloud import firestore
+from google.cloud.exceptions import NotFound
+import io
 import json
 import gc
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import time
 from sklearn.metrics.pairwise import cosine_similarity
 
+from .config import gcp_clients
+from .services.model_cache import get_model_cache
+from .services.response_cache import get_guest_projects_response_cache
+from .services.image_embeddings import EMBEDDINGS_SUBDIR, embedding_path, embedding_prefix, delete_embeddings
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Read-ahead for streamed image decodes; covers a typical upload in a single ranged GET
+_IMAGE_READ_CHUNK = 256 * 1024
+
+# Quantized copy of each trained image model, preferred for serving
+TFLITE_MODEL_FILENAME = "model.tflite"
+
+# Training images are fetched and decoded this many at a time (GCS I/O and PIL decode release the GIL)
+_IMAGE_PREP_WORKERS = 16
+_image_prep_executor = ThreadPoolExecutor(max_workers=_IMAGE_PREP_WORKERS, thread_name_prefix="image-prep")
+
+# Frozen ImageNet backbone shared by every image training run in this process
+_backbone = None
+_backbone_lock = threading.Lock()
+
+# Pooled backbone features of recently seen training images, keyed by pixel digest, so a
+# retrain after adding a few examples only runs the backbone on the new images
+_FEATURE_CACHE_MAX_ENTRIES = 4096
+_feature_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+_feature_cache_lock = threading.Lock()
+
+
+def _get_backbone():
+    """Build the frozen MobileNetV2 feature extractor (image -> pooled features) once per process"""
+    global _backbone
+    with _backbone_lock:
+        if _backbone is None:
+            logger.info("🔄 Creating shared MobileNetV2 backbone...")
+            base_model = MobileNetV2(
+                include_top=False,
+                weights="imagenet",
+                input_shape=(128, 128, 3),  # Smaller input size
+                alpha=0.35  # Smaller alpha for even lighter model
+            )
+            base_model.trainable = False
+            inputs = keras.Input(shape=(128, 128, 3), name='rgb_input')
+            outputs = layers.GlobalAveragePooling2D()(base_model(inputs, training=False))
+            _backbone = keras.Model(inputs, outputs, name='mobilenetv2_features')
+            _backbone.trainable = False
+        return _backbone
+
+
+def _unshared_backbone():
+    """Private copy of the backbone (same weights) for assembling one served model
+    
+    Calling the shared instance symbolically is not thread-safe, and every call would add an
+    inbound node to it that keeps the assembled model alive for the life of the process.
+    """
+    backbone = _get_backbone()
+    with _backbone_lock:
+        copy = keras.models.clone_model(backbone)
+        copy.set_weights(backbone.get_weights())
+    copy.trainable = False
+    return copy
+
+
+def _extract_features(images: np.ndarray) -> np.ndarray:
+    """Backbone features for a batch of images, reusing cached rows for images seen before"""
+    digests = [hashlib.blake2b(img.tobytes(), digest_size=16).digest() for img in images]
+    with _feature_cache_lock:
+        features = [_feature_cache.get(digest) for digest in digests]
+    
+    missing = [i for i, feature in enumerate(features) if feature is None]
+    if missing:
+        computed = _get_backbone().predict(images[missing], batch_size=32, verbose=0)
+        with _feature_cache_lock:
+            for i, feature in zip(missing, computed):
+                features[i] = feature
+                _feature_cache[digests[i]] = feature
+            while len(_feature_cache) > _FEATURE_CACHE_MAX_ENTRIES:
+                _feature_cache.popitem(last=False)
+    
+    with _feature_cache_lock:
+        for digest in digests:
+            if digest in _feature_cache:
+                _feature_cache.move_to_end(digest)
+    
+    logger.info(f"🧠 Backbone features: {len(images) - len(missing)} cached, {len(missing)} computed")
+    return np.stack(features)
+
+
+
+def _store_embedding(item: Tuple[Any, np.ndarray]):
+    """Write one image's embedding back to GCS; a failed write only costs a recompute next time"""
+    blob, stored = item
+    try:
+        buffer = io.BytesIO()
+        np.save(buffer, stored)
+        blob.upload_from_string(buffer.getvalue(), content_type='application/octet-stream')
+    except Exception as e:
+        logger.warning(f"Failed to store embedding {blob.name}: {e}")
+
+
+class _TFLiteClassifier:
+    """Keras-style predict() over a quantized TFLite model
+
+    TFLite interpreters are not thread-safe, so calls on one instance are serialized.
+    """
+
+    def __init__(self, model_content: bytes):
+        self._interpreter = tf.lite.Interpreter(model_content=model_content)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._lock = threading.Lock()
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        outputs = []
+        with self._lock:
+            for row in batch:
+                self._interpreter.set_tensor(self._input['index'], row[np.newaxis].astype(self._input['dtype']))
+                self._interpreter.invoke()
+                outputs.append(self._interpreter.get_tensor(self._output['index'])[0])
+        return np.stack(outputs)
+
 class ImageRecognitionTrainer:
     """Ultra-lightweight training service optimized for small datasets (5-10 images per class)"""
     
@@ -68,11 +193,14 @@ class ImageRecognitionTrainer:
                 
                 label_idx = label_to_idx[label]
                 
-                # Process each image with minimal augmentation for speed
-                for i, image_url in enumerate(image_urls):
+                # Download images in parallel, then process each with minimal augmentation for speed
+                downloads = [
+                    _image_prep_executor.submit(self._download_image_to_memory, image_url)
+                    for image_url in image_urls
+                ]
+                for i, (image_url, download) in enumerate(zip(image_urls, downloads)):
                     try:
-                        # Download image directly to memory
-                        image_data = self._download_image_to_memory(image_url)
+                        image_data = download.result()
                         if image_data is not None:
                             # Add original image
                             images.append(image_data)
@@ -94,7 +222,7 @@ class ImageRecognitionTrainer:
                 raise ValueError("No valid image data found for training")
             
             # Convert to numpy arrays
-            images_array = np.array(images)
+            images_array = np.stack(images)
             labels_array = np.array(labels)
             
             logger.info(f"Prepared training data: {len(class_names)} classes, {len(images)} total images")
@@ -137,57 +265,58 @@ class ImageRecognitionTrainer:
             
         return augmented_images
     
-    def _download_image_to_memory(self, gcs_url: str) -> Optional[np.ndarray]:
-        """Download image from GCS URL directly to memory and return as numpy array"""
+    def _download_image_to_memory(self, gcs_url: Union[str, Tuple[str, str]], img_size: Optional[Tuple[int, int]] = None) -> Optional[np.ndarray]:
+        """Download image from GCS URL (or an already parsed (bucket, blob) pair) directly to memory and return as numpy array"""
         try:
-            # Initialize GCS client
-            client = storage.Client()
+            # Reuse the process-wide client and its connection pool
+            client = gcp_clients.get_storage_client()
             
             # Parse GCS URL to get bucket and blob name
-            if gcs_url.startswith('gs://'):
+            if isinstance(gcs_url, tuple):
+                bucket_name, blob_name = gcs_url
+            elif gcs_url.startswith('gs://'):
                 url_parts = gcs_url[5:].split('/', 1)
                 bucket_name = url_parts[0]
                 blob_name = url_parts[1]
             else:
                 raise ValueError(f"Invalid GCS URL format: {gcs_url}")
             
-            # Download the blob to memory
+            # Stream the blob instead of materializing it: PIL pulls bytes as it decodes
             bucket = client.bucket(bucket_name)
             blob = bucket.blob(blob_name)
-            image_bytes = blob.download_as_bytes()
+            target_size = tuple(img_size or self.img_size)
             
-            # Convert bytes to PIL Image
             from PIL import Image
-            import io
-            
-            logger.info(f"Downloaded {len(image_bytes)} bytes from GCS: {gcs_url}")
-            
-            # Debug: Check the first few bytes to see what format it might be
-            header = image_bytes[:20]
-            logger.info(f"Image header bytes: {header}")
-            logger.info(f"Image header as hex: {header.hex()}")
-            
-            # Check if it's a valid image format
-            if image_bytes.startswith(b'\xff\xd8\xff'):
-                logger.info("Detected JPEG format")
-            elif image_bytes.startswith(b'\x89PNG'):
-                logger.info("Detected PNG format")
-            elif image_bytes.startswith(b'GIF8'):
-                logger.info("Detected GIF format")
-            elif image_bytes.startswith(b'RIFF') and b'WEBP' in image_bytes[:12]:
-                logger.info("Detected WebP format")
-            else:
-                logger.warning(f"Unknown image format. Header: {header}")
             
-            try:
-                pil_image = Image.open(io.BytesIO(image_bytes))
-                logger.info(f"Successfully opened image: {pil_image.format}, {pil_image.mode}, {pil_image.size}")
-            except Exception as img_error:
-                logger.error(f"Failed to open image from bytes: {img_error}")
-                # Log error without creating debug files in production (avoids disk fill)
-                logger.error(f"Cannot identify image file: {img_error}")
-                logger.error(f"Image bytes length: {len(image_bytes)} bytes")
-                raise ValueError(f"Cannot identify image file: {img_error}")
+            with blob.open("rb", chunk_size=_IMAGE_READ_CHUNK) as image_file:
+                # Debug: Check the first few bytes to see what format it might be
+                header = image_file.read(20)
+                image_file.seek(0)
+                logger.info(f"Streaming image from GCS: {gcs_url}")
+                logger.info(f"Image header as hex: {header.hex()}")
+                
+                # Check if it's a valid image format
+                if header.startswith(b'\xff\xd8\xff'):
+                    logger.info("Detected JPEG format")
+                elif header.startswith(b'\x89PNG'):
+                    logger.info("Detected PNG format")
+                elif header.startswith(b'GIF8'):
+                    logger.info("Detected GIF format")
+                elif header.startswith(b'RIFF') and b'WEBP' in header[:12]:
+                    logger.info("Detected WebP format")
+                else:
+                    logger.warning(f"Unknown image format. Header: {header}")
+                
+                try:
+                    pil_image = Image.open(image_file)
+                    logger.info(f"Successfully opened image: {pil_image.format}, {pil_image.mode}, {pil_image.size}")
+                    # For JPEGs, let libjpeg decode at the smallest 1/2, 1/4 or 1/8 scale that
+                    # still covers the target size, skipping most of the IDCT work on large photos
+                    pil_image.draft('RGB', target_size)
+                    pil_image.load()
+                except Exception as img_error:
+                    logger.error(f"Failed to open image from GCS stream: {img_error}")
+                    raise ValueError(f"Cannot identify image file: {img_error}")
             
             # Convert to RGB if needed
             if pil_image.mode != 'RGB':
@@ -195,7 +324,7 @@ class ImageRecognitionTrainer:
                 pil_image = pil_image.convert('RGB')
             
             # Resize to target size
-            pil_image = pil_image.resize(self.img_size)
+            pil_image = pil_image.resize(target_size)
             logger.info(f"Resized image to: {pil_image.size}")
             
             # Convert to numpy array
@@ -214,8 +343,8 @@ class ImageRecognitionTrainer:
     def _download_image_from_gcs(self, gcs_url: str, local_path: str):
         """Download image from GCS URL to local path - FIXED VERSION"""
         try:
-            # Initialize GCS client
-            client = storage.Client()
+            # Reuse the process-wide client and its connection pool
+            client = gcp_clients.get_storage_client()
             
             # Parse GCS URL to get bucket and blob name
             if gcs_url.startswith('gs://'):
@@ -250,26 +379,96 @@ class ImageRecognitionTrainer:
             logger.error(f"Failed to download image from GCS: {e}")
             raise
     
-    def train_model_direct(self, images: np.ndarray, labels: np.ndarray, class_names: List[str]) -> Dict[str, Any]:
-        """Train ultra-lightweight MobileNetV2 model optimized for small datasets"""
+    def prepare_training_features(self, bucket, image_examples: List[Dict[str, Any]], embeddings_dir: str) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """Prepare backbone features for training, reusing per-image embeddings stored in GCS
+
+        Each image's embedding file holds the features of the original image and its
+        augmented copies, so a stored image is neither downloaded nor run through the
+        backbone again. Embeddings are keyed on the image's URL and GCS generation, so a
+        re-uploaded image is embedded afresh (and the stale embedding removed). Fetching
+        and decoding run in parallel; new images are embedded in a single batched backbone pass.
+        """
         try:
-            logger.info("🚀 Starting ultra-lightweight MobileNetV2 training for small datasets...")
-            logger.info(f"📊 Training with {len(class_names)} classes: {class_names}")
-            logger.info(f"📊 Training with {len(images)} images, shape: {images.shape}")
+            feature_dim = _get_backbone().output_shape[-1]
+            examples = [
+                (example['label'], example['image_url'])
+                for example in image_examples
+                if example.get('label') and example.get('image_url')
+            ]
             
-            # Clear everything
-            logger.info("🧹 Performing cleanup...")
-            self.model = None
-            self.is_trained = False
+            def _fetch(item: Tuple[str, str]):
+                label, image_url = item
+                try:
+                    # The image's current generation identifies its content
+                    image_bucket, image_name = image_url[5:].split('/', 1)
+                    image_blob = gcp_clients.get_storage_client().bucket(image_bucket).get_blob(image_name)
+                    if image_blob is None:
+                        raise FileNotFoundError(f"Image not found in GCS: {image_url}")
+                    embedding_blob = bucket.blob(embedding_path(embeddings_dir, image_url, image_blob.generation))
+                    
+                    try:
+                        stored = np.load(io.BytesIO(embedding_blob.download_as_bytes()))
+                        if stored.ndim == 2 and stored.shape[1] == feature_dim:
+                            return embedding_blob, stored, None
+                    except NotFound:
+                        # Embeddings of earlier uploads under this URL can never be hit again
+                        delete_embeddings(bucket, embedding_prefix(embeddings_dir, image_url), keep=embedding_blob.name)
+                    
+                    image_data = self._download_image_to_memory((image_bucket, image_name))
+                    variants = np.stack([image_data] + self._apply_minimal_augmentation(image_data))
+                    return embedding_blob, None, variants
+                    
+                except Exception as e:
+                    logger.warning(f"Failed to process image {image_url}: {e}")
+                    return None
+            
+            fetched = list(_image_prep_executor.map(_fetch, examples))
+            
+            # Embed every new image's variants in one backbone pass, then store them for next time
+            new_rows = [i for i, entry in enumerate(fetched) if entry is not None and entry[1] is None]
+            if new_rows:
+                new_features = _extract_features(np.concatenate([fetched[i][2] for i in new_rows]))
+                offset = 0
+                for i in new_rows:
+                    embedding_blob, _, variants = fetched[i]
+                    fetched[i] = (embedding_blob, new_features[offset:offset + len(variants)], None)
+                    offset += len(variants)
+                list(_image_prep_executor.map(_store_embedding, [fetched[i][:2] for i in new_rows]))
+            
+            features = []
+            labels = []
+            class_names = []
+            label_to_idx = {}
             
-            # Clear TensorFlow completely
-            self.nuclear_tensorflow_reset()
+            for (label, _), entry in zip(examples, fetched):
+                if entry is None:
+                    continue
+                if label not in label_to_idx:
+                    label_to_idx[label] = len(class_names)
+                    class_names.append(label)
+                features.append(entry[1])
+                labels.extend([label_to_idx[label]] * len(entry[1]))
             
-            # Get number of classes
-            num_classes = len(class_names)
-            self.class_names = class_names
+            if not class_names:
+                raise ValueError("No valid image data found for training")
+            
+            features_array = np.concatenate(features)
+            labels_array = np.array(labels)
+            
+            reused = len(features) - len(new_rows)
+            logger.info(f"Prepared training features: {len(class_names)} classes, {len(features_array)} rows, {reused} images reused from stored embeddings")
+            
+            return features_array, labels_array, class_names
             
-            logger.info(f"📊 Detected {num_classes} classes: {class_names}")
+        except Exception as e:
+            logger.error(f"Error preparing training features: {e}")
+            raise Exception(f"Failed to prepare training data: {str(e)}")
+    
+    def train_model_direct(self, images: np.ndarray, labels: np.ndarray, class_names: List[str]) -> Dict[str, Any]:
+        """Train ultra-lightweight MobileNetV2 model optimized for small datasets"""
+        try:
+            logger.info("🚀 Starting ultra-lightweight MobileNetV2 training for small datasets...")
+            logger.info(f"📊 Training with {len(images)} images, shape: {images.shape}")
             
             # Verify input data is RGB
             if len(images.shape) != 4:
@@ -281,48 +480,14 @@ class ImageRecognitionTrainer:
             if actual_channels != 3:
                 raise ValueError(f"MobileNetV2 requires RGB images (3 channels), got {actual_channels} channels")
             
-            # Build ultra-lightweight MobileNetV2 model
-            logger.info("🔄 Creating ultra-lightweight MobileNetV2 model...")
-            
+            # The backbone is frozen, so run it once per image and train only the classifier head
             try:
-                # Create MobileNetV2 base model (much smaller than ResNet50)
-                base_model = MobileNetV2(
-                    include_top=False,
-                    weights="imagenet",
-                    input_shape=(128, 128, 3),  # Smaller input size
-                    alpha=0.35  # Smaller alpha for even lighter model
-                )
-                logger.info("✅ MobileNetV2 base model created successfully")
-                
+                features = _extract_features(images)
             except Exception as e:
-                logger.error(f"MobileNetV2 creation failed: {e}")
+                logger.error(f"MobileNetV2 feature extraction failed: {e}")
                 raise Exception(f"Failed to create MobileNetV2 model: {e}")
             
-            # Freeze base model initially
-            base_model.trainable = False
-            
-            # Build simple classifier for speed
-            inputs = keras.Input(shape=(128, 128, 3), name='rgb_input')
-            x = base_model(inputs, training=False)
-            x = layers.GlobalAveragePooling2D()(x)
-            x = layers.Dropout(0.2)(x)  # Minimal dropout for speed
-            outputs = layers.Dense(num_classes, activation="softmax", name='predictions')(x)
-            
-            self.model = keras.Model(inputs, outputs, name=f'mobilenetv2_lightweight_{num_classes}classes')
-            
-            # Compile with higher learning rate for faster convergence
-            self.model.compile(
-                optimizer=keras.optimizers.Adam(learning_rate=0.01),  # Higher LR for speed
-                loss="sparse_categorical_crossentropy",
-                metrics=["accuracy"]
-            )
-            
-            logger.info(f"🏗️ Model built with {num_classes} output classes")
-            logger.info(f"📋 Final model input shape: {self.model.input_shape}")
-            logger.info(f"📋 Final model output shape: {self.model.output_shape}")
-            
-            # Print model summary
-            self.model.summary(print_fn=logger.info)
+            result = self.train_on_features(features, labels, class_names)
             
             # Verify model accepts our data shape
             logger.info(f"🔍 Verifying model accepts data shape: {images.shape}")
@@ -333,21 +498,63 @@ class ImageRecognitionTrainer:
                 logger.error(f"❌ Model verification failed: {verify_error}")
                 raise Exception(f"Model cannot process input data: {verify_error}")
             
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ Training failed: {e}")
+            raise Exception(f"Image model training failed: {str(e)}")
+    
+    def train_on_features(self, features: np.ndarray, labels: np.ndarray, class_names: List[str]) -> Dict[str, Any]:
+        """Train the classifier head on backbone features and assemble the full image model"""
+        try:
+            logger.info(f"📊 Training with {len(class_names)} classes: {class_names}")
+            logger.info(f"📊 Training with {len(features)} feature rows, shape: {features.shape}")
+            
+            # Reset per-run state; the shared backbone stays resident between runs
+            self.model = None
+            self.is_trained = False
+            
+            # Get number of classes
+            num_classes = len(class_names)
+            self.class_names = class_names
+            
+            # Build simple classifier for speed
+            feature_inputs = keras.Input(shape=features.shape[1:], name='backbone_features')
+            x = layers.Dropout(0.2)(feature_inputs)  # Minimal dropout for speed
+            head_outputs = layers.Dense(num_classes, activation="softmax", name='predictions')(x)
+            head = keras.Model(feature_inputs, head_outputs, name=f'classifier_head_{num_classes}classes')
+            
+            # Compile with higher learning rate for faster convergence
+            head.compile(
+                optimizer=keras.optimizers.Adam(learning_rate=0.01),  # Higher LR for speed
+                loss="sparse_categorical_crossentropy",
+                metrics=["accuracy"]
+            )
+            
             # Single phase training for speed
-            logger.info("🎯 Training with frozen base model (single phase for speed)...")
-            history = self.model.fit(
-                images, 
+            logger.info("🎯 Training classifier head on frozen backbone features...")
+            history = head.fit(
+                features, 
                 labels, 
                 epochs=self.epochs,  # Only 20 epochs for speed
                 batch_size=self.batch_size, 
                 verbose=1,
-                validation_split=0.2 if len(images) > 4 else 0,
+                validation_split=0.2 if len(features) > 4 else 0,
                 callbacks=[
                     keras.callbacks.EarlyStopping(patience=10, restore_best_weights=True),  # More patience for small datasets
                     keras.callbacks.ReduceLROnPlateau(factor=0.5, patience=5, min_lr=1e-4)  # More stable LR reduction
                 ]
             )
             
+            # Assemble the image -> label model that is saved and served
+            inputs = keras.Input(shape=(128, 128, 3), name='rgb_input')
+            outputs = head(_unshared_backbone()(inputs))
+            self.model = keras.Model(inputs, outputs, name=f'mobilenetv2_lightweight_{num_classes}classes')
+            
+            logger.info(f"🏗️ Model built with {num_classes} output classes")
+            logger.info(f"📋 Final model input shape: {self.model.input_shape}")
+            logger.info(f"📋 Final model output shape: {self.model.output_shape}")
+            
             # Get final accuracy
             final_accuracy = history.history['accuracy'][-1] if 'accuracy' in history.history else 0.0
             final_loss = history.history['loss'][-1] if 'loss' in history.history else 0.0
@@ -363,7 +570,7 @@ class ImageRecognitionTrainer:
                 'loss': final_loss,
                 'labels': class_names,
                 'num_classes': num_classes,
-                'training_examples': len(images),
+                'training_examples': len(features),
                 'model': self.model,
                 'class_names': class_names,
                 'img_size': self.img_size
@@ -494,32 +701,32 @@ class ImageRecognitionTrainer:
                 'all_probabilities': []
             }
     
-    def predict_from_gcs(self, gcs_url: str) -> Dict[str, Any]:
-        """Make prediction using image from GCS URL"""
+    def _predict_with(self, model, class_names: List[str], img_size, gcs_url: Union[str, Tuple[str, str]]) -> Dict[str, Any]:
+        """Classify the image at gcs_url with the given model and its class names"""
         try:
             # Download image directly to memory
-            img_array = self._download_image_to_memory(gcs_url)
+            img_array = self._download_image_to_memory(gcs_url, img_size)
             
             # Make prediction using the image array
-            if self.model is None:
+            if model is None:
                 raise ValueError("Model not loaded")
             
             # Reshape for model input (add batch dimension)
             img_array = np.expand_dims(img_array, axis=0)
             
             # Make prediction
-            predictions = self.model.predict(img_array, verbose=0)
+            predictions = model.predict(img_array, verbose=0)
             
             # Get the predicted class
             predicted_class_idx = np.argmax(predictions[0])
             confidence = float(predictions[0][predicted_class_idx]) * 100  # Convert to percentage
-            predicted_class = self.class_names[predicted_class_idx]
+            predicted_class = class_names[predicted_class_idx]
             
             # Get all probabilities
             all_probabilities = []
             for i, prob in enumerate(predictions[0]):
                 all_probabilities.append({
-                    'class': self.class_names[i],
+                    'class': class_names[i],
                     'confidence': float(prob) * 100  # Convert to percentage
                 })
             
@@ -540,6 +747,24 @@ class ImageRecognitionTrainer:
                 'all_probabilities': []
             }
     
+    def predict_from_gcs(self, gcs_url: str) -> Dict[str, Any]:
+        """Make prediction using image from GCS URL with the currently loaded model"""
+        return self._predict_with(self.model, self.class_names, self.img_size, gcs_url)
+    
+    def predict_with_cached_model(self, bucket, gcs_path: str, gcs_url: Union[str, Tuple[str, str]]) -> Dict[str, Any]:
+        """Make prediction with the model saved at gcs_path, kept resident between calls
+        
+        gcs_url may be a gs:// URL or an already parsed (bucket, blob) pair.
+        
+        Unlike load_model_from_gcs + predict_from_gcs this never touches the trainer's own
+        model, so concurrent predictions for different projects cannot interfere.
+        """
+        loaded = get_model_cache().get_or_load(
+            bucket, gcs_path, f"{gcs_path}/saved_model.keras",
+            functools.partial(self._load_model_bundle, prefer_tflite=True)
+        )
+        return self._predict_with(loaded['model'], loaded['class_names'], loaded['img_size'], gcs_url)
+    
     def save_model(self, bucket, gcs_path: str) -> str:
         """Save ultra-lightweight MobileNetV2 model to GCS"""
         try:
@@ -583,6 +808,19 @@ class ImageRecognitionTrainer:
             upload_with_retry(metadata_blob, json.dumps(metadata, indent=2), metadata_gcs_path)
             logger.info(f"Uploaded metadata to {metadata_gcs_path}")
             
+            # Save a weight-quantized TFLite copy for serving; written before the .keras file,
+            # whose generation is what prediction caches key on
+            try:
+                converter = tf.lite.TFLiteConverter.from_keras_model(self.model)
+                converter.optimizations = [tf.lite.Optimize.DEFAULT]
+                tflite_data = converter.convert()
+                tflite_gcs_path = f"{gcs_path}/{TFLITE_MODEL_FILENAME}"
+                logger.info(f"📦 Uploading quantized model file ({len(tflite_data) / (1024*1024):.1f} MB)")
+                upload_with_retry(bucket.blob(tflite_gcs_path), tflite_data, tflite_gcs_path)
+            except Exception as convert_err:
+                # Serving falls back to the .keras model
+                logger.warning(f"⚠️ TFLite conversion failed, serving the Keras model instead: {convert_err}")
+            
             # Save main model
             model_gcs_path = f"{gcs_path}/saved_model"
             
@@ -612,51 +850,81 @@ class ImageRecognitionTrainer:
             logger.error(f"❌ Failed to save model: {e}")
             raise Exception(f"Failed to save model: {str(e)}")
     
-    def load_model_from_gcs(self, bucket, gcs_path: str) -> bool:
-        """Load ultra-lightweight MobileNetV2 model from GCS"""
+    @staticmethod
+    def _load_model_bundle(bucket, gcs_path: str, prefer_tflite: bool = False) -> Dict[str, Any]:
+        """Download a saved model and its metadata as {'model', 'class_names', 'img_size', 'metadata'}
+        
+        With prefer_tflite the quantized TFLite copy is used when present; it only
+        supports predict(), so it is for serving, not for restoring the trainer.
+        """
+        logger.info(f"Loading ultra-lightweight MobileNetV2 model from GCS path: {gcs_path}")
+        
+        # Load metadata first
+        metadata_gcs_path = f"{gcs_path}/metadata.json"
+        logger.info(f"Loading metadata from: {metadata_gcs_path}")
+        metadata_blob = bucket.blob(metadata_gcs_path)
+        metadata_data = metadata_blob.download_as_text()
+        metadata = json.loads(metadata_data)
+        logger.info(f"Metadata loaded: {metadata}")
+        
+        if prefer_tflite:
+            try:
+                tflite_data = bucket.blob(f"{gcs_path}/{TFLITE_MODEL_FILENAME}").download_as_bytes()
+                logger.info(f"Loaded quantized TFLite model ({len(tflite_data) / (1024*1024):.1f} MB)")
+                return {
+                    'model': _TFLiteClassifier(tflite_data),
+                    'class_names': metadata['class_names'],
+                    'img_size': metadata['img_size'],
+                    'metadata': metadata,
+                }
+            except NotFound:
+                logger.info("No TFLite model found, loading the Keras model")
+        
+        # Load main model
+        model_gcs_path = f"{gcs_path}/saved_model.keras"
+        logger.info(f"Loading lightweight model from: {model_gcs_path}")
+        model_blob = bucket.blob(model_gcs_path)
+        
+        with tempfile.NamedTemporaryFile(suffix='.keras', delete=False) as temp_file:
+            temp_path = temp_file.name
+        
         try:
-            logger.info(f"Loading ultra-lightweight MobileNetV2 model from GCS path: {gcs_path}")
-            
-            # Load metadata first
-            metadata_gcs_path = f"{gcs_path}/metadata.json"
-            logger.info(f"Loading metadata from: {metadata_gcs_path}")
-            metadata_blob = bucket.blob(metadata_gcs_path)
-            metadata_data = metadata_blob.download_as_text()
-            metadata = json.loads(metadata_data)
-            logger.info(f"Metadata loaded: {metadata}")
-            
-            # Load main model
-            model_gcs_path = f"{gcs_path}/saved_model.keras"
-            logger.info(f"Loading lightweight model from: {model_gcs_path}")
-            model_blob = bucket.blob(model_gcs_path)
+            # Download and load main model
+            model_blob.download_to_filename(temp_path)
+            model = keras.models.load_model(temp_path, compile=False)
             
-            with tempfile.NamedTemporaryFile(suffix='.keras', delete=False) as temp_file:
-                temp_path = temp_file.name
+            # Recompile the model
+            model.compile(
+                optimizer=keras.optimizers.Adam(0.01),
+                loss="sparse_categorical_crossentropy",
+                metrics=["accuracy"]
+            )
             
-            try:
-                # Download and load main model
-                model_blob.download_to_filename(temp_path)
-                self.model = keras.models.load_model(temp_path, compile=False)
-                
-                # Recompile the model
-                self.model.compile(
-                    optimizer=keras.optimizers.Adam(0.01),
-                    loss="sparse_categorical_crossentropy",
-                    metrics=["accuracy"]
-                )
-                
-            finally:
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        
+        return {
+            'model': model,
+            'class_names': metadata['class_names'],
+            'img_size': metadata['img_size'],
+            'metadata': metadata,
+        }
+    
+    def load_model_from_gcs(self, bucket, gcs_path: str) -> bool:
+        """Load ultra-lightweight MobileNetV2 model from GCS"""
+        try:
+            loaded = self._load_model_bundle(bucket, gcs_path)
             
             # Restore model state
-            self.class_names = metadata['class_names']
-            self.img_size = metadata['img_size']
+            self.model = loaded['model']
+            self.class_names = loaded['class_names']
+            self.img_size = loaded['img_size']
             self.is_trained = True
             
             # Log model info
-            model_type = metadata.get('model_type', 'unknown')
-            color_mode = metadata.get('color_mode', 'unknown')
+            model_type = loaded['metadata'].get('model_type', 'unknown')
+            color_mode = loaded['metadata'].get('color_mode', 'unknown')
             logger.info(f"Model loaded - Type: {model_type}, Color mode: {color_mode}")
             
             logger.info(f"✅ Ultra-lightweight MobileNetV2 model loaded from GCS: {gcs_path}")
@@ -718,6 +986,7 @@ class ImageRecognitionTrainer:
             
             # Update the document
             doc_ref.update(update_data)
+            get_guest_projects_response_cache().invalidate(session_id)
             
             logger.info(f"✅ Updated Firestore for project {project_id} with status: {status}")
             return True
@@ -727,13 +996,16 @@ class ImageRecognitionTrainer:
             return False
 
     def clear_existing_model(self, bucket, gcs_path: str) -> bool:
-        """Clear existing model from GCS to prevent shape mismatch issues"""
+        """Clear existing model from GCS to prevent shape mismatch issues (stored embeddings are kept)"""
         try:
             # List all files in the GCS directory
             blobs = bucket.list_blobs(prefix=gcs_path)
             deleted_count = 0
+            embeddings_prefix = f"{gcs_path.rstrip('/')}/{EMBEDDINGS_SUBDIR}/"
             
             for blob in blobs:
+                if blob.name.startswith(embeddings_prefix):
+                    continue
                 blob.delete()
                 deleted_count += 1
                 logger.info(f"Deleted {blob.name}")
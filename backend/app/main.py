@@ -1,10 +1,14 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+import re
+import gzip
 import time
 import logging
 import os
+import aiohttp
 
 from .config import settings
 from .api import (
@@ -23,6 +27,7 @@ from .api import (
     training_chat,
 )
 from .api.guests import router as guests_router
+from .services.gcs_io import shutdown_gcs_executor
 
 # --------------------------------------------------
 # Logging
@@ -41,6 +46,8 @@ app = FastAPI(
     redoc_url="/redoc",
     # Ensure schema generation doesn't fail on errors
     openapi_url="/openapi.json",
+    # orjson is several times faster than the stdlib encoder for large list payloads
+    default_response_class=ORJSONResponse,
 )
 
 # --------------------------------------------------
@@ -62,6 +69,60 @@ if settings.cors_origin:
     extra_origins = [o.strip() for o in settings.cors_origin.split(",")]
     origins.extend([o for o in extra_origins if o])
 
+# --------------------------------------------------
+# Upload Body Size Limits
+# --------------------------------------------------
+class MaxBodySizeMiddleware:
+    """Reject request bodies over a per-route limit before multipart parsing spools them"""
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = [(re.compile(pattern), limit) for pattern, limit in limits]
+
+    def _limit_for(self, path: str):
+        for pattern, limit in self.limits:
+            if pattern.search(path):
+                return limit
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limit = self._limit_for(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Declared size: answer 413 without reading a single body byte
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(status_code=413, content={"detail": "Request body too large"})
+            await response(scope, receive, send)
+            return
+
+        # Undeclared (chunked) size: count as the body arrives and stop once over the limit
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+# Route suffix -> body limit (file limit plus 1MB of multipart overhead)
+_UPLOAD_BODY_LIMITS = [
+    (r"/dataset$", 101 * 1024 * 1024),
+    (r"/images$", 201 * 1024 * 1024),
+    (r"/predict-image$", 11 * 1024 * 1024),
+]
+
+# Added before CORS so 413 responses still carry CORS headers
+app.add_middleware(MaxBodySizeMiddleware, limits=_UPLOAD_BODY_LIMITS)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=list(set(origins)),
@@ -76,6 +137,55 @@ app.add_middleware(
     allowed_hosts=["*"],
 )
 
+# --------------------------------------------------
+# Response Compression
+# --------------------------------------------------
+class JSONGZipMiddleware:
+    """Gzip JSON response bodies for clients that send Accept-Encoding: gzip
+
+    Only single-body application/json responses are compressed. Images and other
+    streamed bodies pass through untouched and keep their Content-Length.
+    """
+
+    def __init__(self, app, minimum_size: int = 500, compresslevel: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or "gzip" not in Headers(scope=scope).get("accept-encoding", ""):
+            await self.app(scope, receive, send)
+            return
+
+        held_start = None
+
+        async def send_compressed(message):
+            nonlocal held_start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if headers.get("content-type", "").startswith("application/json") and "content-encoding" not in headers:
+                    # Hold the headers until the body shows whether it is worth compressing
+                    held_start = message
+                    return
+            elif held_start is not None:
+                start, held_start = held_start, None
+                body = message.get("body", b"")
+                if message["type"] == "http.response.body" and not message.get("more_body", False) and len(body) >= self.minimum_size:
+                    body = gzip.compress(body, compresslevel=self.compresslevel)
+                    headers = MutableHeaders(raw=start["headers"])
+                    headers["Content-Encoding"] = "gzip"
+                    headers["Content-Length"] = str(len(body))
+                    headers.add_vary_header("Accept-Encoding")
+                    message = {**message, "body": body}
+                await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+
+# Compress JSON bodies over 1KB (project/classroom lists shrink several-fold)
+app.add_middleware(JSONGZipMiddleware, minimum_size=1024)
+
 # --------------------------------------------------
 # Request Timing Middleware
 # --------------------------------------------------
@@ -245,6 +355,11 @@ else:
 @app.on_event("startup")
 async def startup_event():
     logger.info("✅ TheNeural Backend API starting")
+    # One pooled HTTP client for outbound downloads (image URLs), shared by all requests
+    app.state.http = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300),
+        timeout=aiohttp.ClientTimeout(total=30)
+    )
     logger.info(f"Environment: {settings.node_env}")
     logger.info(f"GCP Project: {settings.google_cloud_project}")
     logger.info("🚀 Startup complete (no background workers)")
@@ -252,6 +367,8 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("🛑 Shutting down TheNeural Backend API")
+    await app.state.http.close()
+    shutdown_gcs_executor()
 
 # --------------------------------------------------
 # Local Dev Entry Point (NOT used in Cloud Run)
@@ -86,6 +86,14 @@ class ProjectType(str, Enum):
     CUSTOM = "custom"
 
 
+# Project types backed by a Teachable Machine model, and the URL their links must start with
+TEACHABLE_MACHINE_TYPES = frozenset({
+    ProjectType.IMAGE_RECOGNITION_TEACHABLE_MACHINE.value,
+    ProjectType.POSE_RECOGNITION_TEACHABLE_MACHINE.value,
+})
+TEACHABLE_MACHINE_URL_PREFIX = "https://teachablemachine.withgoogle.com/"
+
+
 class ProjectStatus(str, Enum):
     DRAFT = "draft"
     QUEUED = "queued"
@@ -114,6 +122,24 @@ class Dataset(BaseModel):
     examples: List[TextExample] = Field(default_factory=list, description="Text examples")
     image_examples: List[ImageExampleAdd] = Field(default_factory=list, description="Image examples")
     labels: List[str] = Field(default_factory=list, description="Unique labels in dataset")
+    
+    def label_index(self) -> Dict[str, List[int]]:
+        """Map each label to the positions of its examples in `examples`
+        
+        Built on every call, so the positions always match the current list.
+        """
+        index: Dict[str, List[int]] = {}
+        for position, example in enumerate(self.examples):
+            index.setdefault(example.label, []).append(position)
+        return index
+    
+    def detached_copy(self) -> "Dataset":
+        """Copy whose lists can be edited without affecting this dataset (example objects are shared)"""
+        return self.model_copy(update={
+            'examples': list(self.examples),
+            'image_examples': list(self.image_examples),
+            'labels': list(self.labels),
+        })
 
 
 class TrainedModel(BaseModel):
@@ -194,6 +220,17 @@ class ProjectCreate(BaseModel):
     config: Optional[ProjectConfig] = None
     teachable_machine_link: Optional[str] = Field(None, description="Teachable Machine model link for image recognition projects")
 
+    @model_validator(mode='after')
+    def validate_teachable_machine_project(self):
+        """Teachable Machine projects need a Teachable Machine link and never keep a training config"""
+        if self.type in TEACHABLE_MACHINE_TYPES:
+            if not self.teachable_machine_link:
+                raise ValueError(f"teachable_machine_link is required for {self.type.value} projects")
+            if not self.teachable_machine_link.startswith(TEACHABLE_MACHINE_URL_PREFIX):
+                raise ValueError(f"Invalid teachable machine link. Must be a valid Teachable Machine URL starting with '{TEACHABLE_MACHINE_URL_PREFIX}'")
+            self.config = None
+        return self
+
 
 class ProjectUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=100)
@@ -206,6 +243,15 @@ class ProjectUpdate(BaseModel):
     dataset: Optional[Dataset] = None
     teachable_machine_link: Optional[str] = Field(None, description="Teachable Machine model link for image recognition projects")
 
+    @model_validator(mode='after')
+    def validate_teachable_machine_project(self):
+        """Check a link sent with a Teachable Machine type and drop config; checks against the stored project happen in the handler"""
+        if self.type in TEACHABLE_MACHINE_TYPES:
+            if self.teachable_machine_link is not None and not self.teachable_machine_link.startswith(TEACHABLE_MACHINE_URL_PREFIX):
+                raise ValueError(f"Invalid teachable machine link. Must be a valid Teachable Machine URL starting with '{TEACHABLE_MACHINE_URL_PREFIX}'")
+            self.config = None
+        return self
+
 
 class TrainingConfig(BaseModel):
     epochs: Optional[int] = Field(100, ge=1, le=10000)
@@ -224,6 +270,13 @@ class ExamplesBulkAdd(BaseModel):
 class ImageExamplesBulkAdd(BaseModel):
     examples: List[ImageExampleAdd] = Field(..., description="List of image examples to add")
 
+class ImageUrlAdd(BaseModel):
+    image_url: str = Field(..., description="HTTP(S) URL of the image to download")
+    label: str = Field(..., description="Label for this image")
+
+class ImageUrlsBulkAdd(BaseModel):
+    images: List[ImageUrlAdd] = Field(..., min_length=1, description="Images to download and add")
+
 class DatasetUpload(BaseModel):
     records: Optional[int] = Field(None, ge=0)
     description: Optional[str] = Field("")
@@ -281,6 +334,7 @@ class PaginationInfo(BaseModel):
     limit: int
     offset: int
     total: int
+    next_cursor: Optional[str] = None
 
 
 class ProjectListResponse(BaseModel):
@@ -386,6 +440,29 @@ class Guest(BaseModel):
     last_accessed_by: Optional[str] = Field(None, description="Last user who accessed the project")
     last_accessed_at: Optional[datetime] = Field(None, description="Last access timestamp")
 
+class GuestModelView(BaseModel):
+    """Typed read of the model sub-document of a stored guest project"""
+    model_config = ConfigDict(extra='ignore')
+    
+    gcsPath: Optional[str] = Field(None, description="GCS path to the model file or directory")
+    modelType: Optional[str] = Field("logistic_regression", description="Type of model used")
+
+class GuestProjectView(BaseModel):
+    """Typed read of the stored guest project fields the guest routes branch on; other fields are ignored"""
+    model_config = ConfigDict(extra='ignore', protected_namespaces=())
+    
+    id: Optional[str] = Field(None, description="Project identifier")
+    createdBy: str = Field("", description="Owner, as guest:<session_id>")
+    status: Optional[str] = Field("draft", description="Project status")
+    type: Optional[str] = Field("text-recognition", description="Project type")
+    currentJobId: Optional[str] = Field(None, description="Current training job ID")
+    model: GuestModelView = Field(default_factory=GuestModelView, description="Trained model details")
+    
+    @field_validator('model', mode='before')
+    @classmethod
+    def _null_model_as_empty(cls, value):
+        return {} if value is None else value
+
 class GuestCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=100, description="Project name")
     dataset_type: str = Field("text", description="Type of dataset")
@@ -684,6 +761,11 @@ class ChatTeachResponse(BaseModel):
     knowledge_id: str
     message: str
 
+class ChatTeachBatchResponse(BaseModel):
+    success: bool = True
+    knowledge_ids: List[str]
+    message: str
+
 class CleanupRequest(BaseModel):
     days_old: int = Field(7, ge=1, description="Delete agents older than N days")
 
@@ -1,12 +1,16 @@
 # Services package
-from .project_service import ProjectService
-from .teacher_service import TeacherService
-from .student_service import StudentService
-from .demo_project_service import DemoProjectService
+from .project_service import ProjectService, get_project_service
+from .teacher_service import TeacherService, get_teacher_service
+from .student_service import StudentService, get_student_service
+from .demo_project_service import DemoProjectService, get_demo_project_service
 
 __all__ = [
     "ProjectService",
     "TeacherService", 
     "StudentService",
-    "DemoProjectService"
+    "DemoProjectService",
+    "get_project_service",
+    "get_teacher_service",
+    "get_student_service",
+    "get_demo_project_service"
 ]
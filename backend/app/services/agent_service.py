@@ -1,15 +1,20 @@
 import uuid
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
 from google.cloud import firestore
 
 from ..models import Agent, Persona, AgentCreateRequest, PersonaUpdateRequest, AgentSettings, SettingsUpdateRequest
 from ..config import gcp_clients
-from .vertex_ai_service import VertexAIService
+from .vertex_ai_service import get_vertex_ai_service
+from .semantic_cache import get_semantic_cache
 
 logger = logging.getLogger(__name__)
 
+# Cascade deletes for an agent's related collections run in parallel here
+_cascade_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="agent-cascade")
+
 
 class AgentService:
     """Service layer for agent management operations"""
@@ -38,7 +43,7 @@ class AgentService:
             self._settings_collection = self._firestore_client.collection('agent_settings')
             
             # Initialize Vertex AI service
-            self._vertex_ai = VertexAIService(self._project_id)
+            self._vertex_ai = get_vertex_ai_service(self._project_id)
             
             self._initialized = True
             logger.info("✅ AgentService initialized")
@@ -223,6 +228,9 @@ class AgentService:
                 agent_ref = self.agents_collection.document(agent_id)
                 agent_ref.update(agent_update)
             
+            # Cached answers were written in the old persona
+            get_semantic_cache().invalidate(agent_id)
+            
             # Return updated persona
             updated_doc = persona_ref.get()
             updated_data = updated_doc.to_dict()
@@ -269,28 +277,20 @@ class AgentService:
     def delete_agent(self, agent_id: str) -> bool:
         """Delete agent and cascade delete related data"""
         try:
-            # Delete agent
-            agent_ref = self.agents_collection.document(agent_id)
-            agent_ref.delete()
+            # Delete agent, persona and the cascaded collections concurrently
+            futures = [
+                _cascade_executor.submit(self.agents_collection.document(agent_id).delete),
+                _cascade_executor.submit(self.personas_collection.document(agent_id).delete),
+            ] + [
+                _cascade_executor.submit(self._delete_agent_documents, collection_name, agent_id)
+                for collection_name in ('knowledge', 'rules', 'chat_logs')
+            ]
             
-            # Delete persona
-            persona_ref = self.personas_collection.document(agent_id)
-            persona_ref.delete()
+            # Surface the first failure, if any
+            for future in futures:
+                future.result()
             
-            # Delete knowledge (cascade)
-            knowledge_refs = self.firestore_client.collection('knowledge').where('agent_id', '==', agent_id).stream()
-            for knowledge_ref in knowledge_refs:
-                knowledge_ref.reference.delete()
-            
-            # Delete rules (cascade)
-            rule_refs = self.firestore_client.collection('rules').where('agent_id', '==', agent_id).stream()
-            for rule_ref in rule_refs:
-                rule_ref.reference.delete()
-            
-            # Delete chat logs (cascade)
-            chat_refs = self.firestore_client.collection('chat_logs').where('agent_id', '==', agent_id).stream()
-            for chat_ref in chat_refs:
-                chat_ref.reference.delete()
+            get_semantic_cache().invalidate(agent_id)
             
             logger.info(f"✅ Agent deleted: {agent_id}")
             return True
@@ -299,6 +299,21 @@ class AgentService:
             logger.error(f"❌ Failed to delete agent: {e}")
             raise Exception(f"Failed to delete agent: {str(e)}")
     
+    def _delete_agent_documents(self, collection_name: str, agent_id: str) -> int:
+        """Delete every document in a collection belonging to an agent"""
+        # BulkWriter parallelizes the deletes; select([]) streams references without document bodies
+        writer = self.firestore_client.bulk_writer()
+        query = self.firestore_client.collection(collection_name).where('agent_id', '==', agent_id).select([])
+        
+        deleted_count = 0
+        for doc in query.stream():
+            writer.delete(doc.reference)
+            deleted_count += 1
+        writer.close()
+        
+        logger.info(f"🗑️ Deleted {deleted_count} {collection_name} documents for agent {agent_id}")
+        return deleted_count
+    
     def cleanup_old_agents(self, days_old: int = 7) -> int:
         """Delete agents older than N days"""
         try:
@@ -385,6 +400,9 @@ class AgentService:
             # Save to Firestore
             settings_ref.set(update_data)
             
+            # A different model or embedding space makes cached answers stale
+            get_semantic_cache().invalidate(agent_id)
+            
             logger.info(f"✅ Settings updated for agent: {agent_id}")
             logger.info(f"   Model: {update_data['model']}")
             logger.info(f"   Embedding Model: {update_data['embedding_model']}")
@@ -396,3 +414,14 @@ class AgentService:
             logger.error(f"❌ Failed to update settings: {e}")
             raise Exception(f"Failed to update settings: {str(e)}")
 
+
+# Global instance
+_agent_service: Optional[AgentService] = None
+
+
+def get_agent_service() -> AgentService:
+    """Get or create singleton AgentService instance"""
+    global _agent_service
+    if _agent_service is None:
+        _agent_service = AgentService()
+    return _agent_service
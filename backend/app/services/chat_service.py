@@ -1,19 +1,84 @@
+import re
+import json
 import uuid
+import base64
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable, Tuple
 from google.cloud import firestore
 
-from ..models import ChatLog, ChatRequest, Persona, Knowledge
+from ..models import ChatRequest, ChatTeachRequest, Persona, Knowledge
 from ..config import gcp_clients
-from .agent_service import AgentService
-from .knowledge_service import KnowledgeService
-from .rules_service import RulesService
-from .vertex_ai_service import VertexAIService
+from .agent_service import get_agent_service
+from .knowledge_service import get_knowledge_service
+from .rules_service import get_rules_service
+from .vertex_ai_service import get_vertex_ai_service
 from .image_search_service import get_image_search_service
+from .semantic_cache import get_semantic_cache
+from .embedding_cache import get_embedding_cache
 
 logger = logging.getLogger(__name__)
 
+# Independent Firestore / Vertex AI round-trips within one chat turn run concurrently here
+_chat_io_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="chat-io")
+
+
+class _AnswerStreamExtractor:
+    """
+    Incrementally decodes the "answer" string value from a JSON object that is
+    still being streamed, so answer text can be shown before the JSON completes.
+    """
+    
+    _ANSWER_KEY_RE = re.compile(r'"answer"\s*:\s*"')
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+    
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._state = "seek"  # seek -> answer -> done
+    
+    def feed(self, chunk: str) -> str:
+        if self._state == "done":
+            return ""
+        self._buffer += chunk
+        
+        if self._state == "seek":
+            match = self._ANSWER_KEY_RE.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+            self._state = "answer"
+        
+        out = []
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+            if char == '"':
+                self._state = "done"
+                break
+            if char != "\\":
+                out.append(char)
+                self._pos += 1
+                continue
+            # Escape sequence - wait for the rest of it if it was split across chunks
+            if self._pos + 1 >= len(buffer):
+                break
+            code = buffer[self._pos + 1]
+            if code == "u":
+                if self._pos + 6 > len(buffer):
+                    break
+                try:
+                    out.append(chr(int(buffer[self._pos + 2:self._pos + 6], 16)))
+                except ValueError:
+                    pass
+                self._pos += 6
+            else:
+                out.append(self._ESCAPES.get(code, code))
+                self._pos += 2
+        
+        return "".join(out)
+
 
 class ChatService:
     """Service layer for chat operations with rule engine and KB retrieval"""
@@ -27,6 +92,7 @@ class ChatService:
         self._rules_service = None
         self._vertex_ai = None
         self._image_search = None
+        self._semantic_cache = None
         self._initialized = False
     
     def _ensure_initialized(self):
@@ -42,11 +108,12 @@ class ChatService:
             self._chat_logs_collection = self._firestore_client.collection('chat_logs')
             
             # Initialize services
-            self._agent_service = AgentService()
-            self._knowledge_service = KnowledgeService()
-            self._rules_service = RulesService()
-            self._vertex_ai = VertexAIService(self._project_id)
+            self._agent_service = get_agent_service()
+            self._knowledge_service = get_knowledge_service()
+            self._rules_service = get_rules_service()
+            self._vertex_ai = get_vertex_ai_service(self._project_id)
             self._image_search = get_image_search_service()
+            self._semantic_cache = get_semantic_cache()
             
             self._initialized = True
             logger.info("✅ ChatService initialized")
@@ -95,8 +162,20 @@ class ChatService:
         self._ensure_initialized()
         return self._image_search
     
-    def chat(self, request: ChatRequest) -> Dict[str, Any]:
-        """Process chat message with rule engine and KB retrieval"""
+    @property
+    def semantic_cache(self):
+        self._ensure_initialized()
+        return self._semantic_cache
+    
+    def chat(self, request: ChatRequest, on_delta: Optional[Callable[[str], None]] = None, defer_log: bool = False) -> Dict[str, Any]:
+        """
+        Process chat message with rule engine and KB retrieval.
+        
+        If on_delta is given, the answer text is passed to it incrementally while
+        the LLM is still generating (used by the streaming endpoint).
+        If defer_log is True the chat log is not written; it is returned as
+        result["chat_log"] for the caller to pass to persist_chat_log later.
+        """
         try:
             # Use session_id as user_id if user_id is not provided
             user_id = request.user_id if request.user_id else request.session_id
@@ -115,29 +194,45 @@ class ChatService:
                 "images": []  # Relevant images for the response
             }
             
-            # Load agent and persona
-            agent = self.agent_service.get_agent(request.agent_id)
+            # Load agent, persona, settings and recent conversation concurrently
+            agent_future = _chat_io_executor.submit(self.agent_service.get_agent, request.agent_id)
+            persona_future = _chat_io_executor.submit(self.agent_service.get_persona, request.agent_id)
+            settings_future = _chat_io_executor.submit(self.agent_service.get_settings, request.agent_id)
+            history_future = _chat_io_executor.submit(
+                self._get_recent_conversation,
+                request.agent_id,
+                request.session_id,
+                10  # Last 10 messages for context
+            )
+            
+            agent = agent_future.result()
             if not agent:
                 raise ValueError(f"Agent not found: {request.agent_id}")
             
-            persona = self.agent_service.get_persona(request.agent_id)
+            persona = persona_future.result()
             if not persona:
                 raise ValueError(f"Persona not found for agent: {request.agent_id}")
             
             # Load agent settings to get model configuration
-            settings = self.agent_service.get_settings(request.agent_id)
+            settings = settings_future.result()
             model_name = settings.model if settings else None
+            embedding_model_name = settings.embedding_model if settings else None
             logger.info(f"📋 Using model from settings: {model_name}")
             
+            # Start embedding the message now so it overlaps with condition detection and
+            # rule evaluation; it is only awaited if the LLM path needs it
+            embed_future = _chat_io_executor.submit(
+                get_embedding_cache().get_or_compute,
+                request.message,
+                lambda text: self.vertex_ai.generate_embedding(text, embedding_model_name=embedding_model_name),
+                embedding_model_name
+            )
+            
             # Step 1: Detect conditions and build context
             conditions = self._detect_conditions(request.message, model_name)
             
             # Check if this is the first message (conversation start)
-            conversation_history = self._get_recent_conversation(
-                request.agent_id, 
-                request.session_id, 
-                limit=1
-            )
+            conversation_history = history_future.result()
             is_conversation_start = len(conversation_history) == 0
             
             # Build context for rule evaluation
@@ -189,126 +284,150 @@ class ChatService:
                 # Step 4: Use KB + LLM (with rule constraints if matched)
                 llm_used = True
                 
-                # Get conversation history for context
-                conversation_history = self._get_recent_conversation(
-                    request.agent_id, 
-                    request.session_id, 
-                    limit=10  # Last 10 messages for context
-                )
-                
-                # Embed message using embedding model from settings
-                embedding_model_name = settings.embedding_model if settings else None
+                # Embedding was started alongside rule evaluation
                 logger.info(f"🔤 Using embedding model from settings: {embedding_model_name}")
-                message_embedding = self.vertex_ai.generate_embedding(request.message, embedding_model_name=embedding_model_name)
+                message_embedding = embed_future.result()
                 
-                # Check if rule says to use KB
-                force_kb = rule_action_results.get("use_kb", False) if rule_action_results else False
-                kb_source = rule_action_results.get("kb_source") if rule_action_results else None
+                # Semantic cache: near-duplicate questions to an agent with no matching
+                # rule reuse the previous answer instead of re-running retrieval + LLM.
+                # Mid-conversation answers depend on the history, so only cache openers.
+                cacheable = matched_rule is None and is_conversation_start
+                cached = self.semantic_cache.lookup(request.agent_id, message_embedding) if cacheable else None
                 
-                # Retrieve relevant knowledge (threshold=0.5 for better recall)
-                knowledge_items = self.knowledge_service.retrieve_knowledge(
-                    request.agent_id,
-                    message_embedding,
-                    top_k=10 if kb_source else 5,  # Get more if filtering
-                    similarity_threshold=0.3 if kb_source else 0.5  # Lower threshold if filtering
-                )
+                if cached:
+                    response = cached["response"]
+                    image_info = cached.get("image_info") or {}
+                    trace["cache"] = "hit"
+                    trace["cache_similarity"] = cached["similarity"]
+                    trace["kb_used"] = cached.get("kb_used", [])
+                    trace["confidence"] = cached.get("confidence")
+                    trace["follow_up_questions"] = cached.get("follow_up_questions", [])
+                    trace["image_info"] = image_info
+                    trace["web_search_used"] = cached.get("web_search_used", False)
+                    trace["web_sources"] = cached.get("web_sources", [])
+                else:
+                    # Check if rule says to use KB
+                    force_kb = rule_action_results.get("use_kb", False) if rule_action_results else False
+                    kb_source = rule_action_results.get("kb_source") if rule_action_results else None
+                
+                    # Retrieve relevant knowledge (threshold=0.5 for better recall)
+                    knowledge_items = self.knowledge_service.retrieve_knowledge(
+                        request.agent_id,
+                        message_embedding,
+                        top_k=10 if kb_source else 5,  # Get more if filtering
+                        similarity_threshold=0.3 if kb_source else 0.5  # Lower threshold if filtering
+                    )
                 
-                # Filter by specific KB source if provided
-                if kb_source:
-                    original_count = len(knowledge_items)
-                    filtered_items = []
+                    # Filter by specific KB source if provided
+                    if kb_source:
+                        original_count = len(knowledge_items)
+                        filtered_items = []
                     
-                    for kb in knowledge_items:
-                        metadata = kb.metadata or {}
-                        
-                        if kb_source["type"] == "file":
-                            # Filter by file name
-                            if metadata.get("file_name") == kb_source["name"]:
-                                filtered_items.append(kb)
+                        for kb in knowledge_items:
+                            metadata = kb.metadata or {}
                         
-                        elif kb_source["type"] == "link":
-                            # Filter by page title or URL
-                            page_title = metadata.get("page_title", "")
-                            url = metadata.get("url", "")
-                            if kb_source["name"] == page_title or kb_source["name"] in url:
-                                filtered_items.append(kb)
+                            if kb_source["type"] == "file":
+                                # Filter by file name
+                                if metadata.get("file_name") == kb_source["name"]:
+                                    filtered_items.append(kb)
                         
-                        elif kb_source["type"] == "text":
-                            # Filter by content match (for text KB)
-                            if not metadata.get("file_name") and not metadata.get("url"):
-                                # This is text knowledge (no file or link metadata)
-                                if kb_source["content"] in kb.content[:60]:
+                            elif kb_source["type"] == "link":
+                                # Filter by page title or URL
+                                page_title = metadata.get("page_title", "")
+                                url = metadata.get("url", "")
+                                if kb_source["name"] == page_title or kb_source["name"] in url:
                                     filtered_items.append(kb)
+                        
+                            elif kb_source["type"] == "text":
+                                # Filter by content match (for text KB)
+                                if not metadata.get("file_name") and not metadata.get("url"):
+                                    # This is text knowledge (no file or link metadata)
+                                    if kb_source["content"] in kb.content[:60]:
+                                        filtered_items.append(kb)
                     
-                    knowledge_items = filtered_items[:5]  # Limit to top 5 after filtering
-                    logger.info(f"📚 Filtered KB from {original_count} to {len(knowledge_items)} items (source: {kb_source['type']})")
+                        knowledge_items = filtered_items[:5]  # Limit to top 5 after filtering
+                        logger.info(f"📚 Filtered KB from {original_count} to {len(knowledge_items)} items (source: {kb_source['type']})")
                 
-                trace["kb_used"] = [kb.knowledge_id for kb in knowledge_items]
-                trace["kb_source_filter"] = kb_source
-                trace["conversation_context_used"] = len(conversation_history)
+                    trace["kb_used"] = [kb.knowledge_id for kb in knowledge_items]
+                    trace["kb_source_filter"] = kb_source
+                    trace["conversation_context_used"] = len(conversation_history)
                 
-                # DYNAMIC GROUNDING: Enable web search if KB has no relevant results (unless rule says use KB or a rule matched)
-                # If a rule matched, disable web search - rules should provide the response
-                rule_matched = matched_rule is not None
-                enable_web_search = len(knowledge_items) == 0 and not force_kb and not rule_matched
-                if enable_web_search:
-                    logger.info("🌐 No KB matches found - enabling Google Search Grounding for web search")
-                elif rule_matched:
-                    logger.info("🚫 Rule matched - disabling web search (rule should provide the response)")
+                    # DYNAMIC GROUNDING: Enable web search if KB has no relevant results (unless rule says use KB or a rule matched)
+                    # If a rule matched, disable web search - rules should provide the response
+                    rule_matched = matched_rule is not None
+                    enable_web_search = len(knowledge_items) == 0 and not force_kb and not rule_matched
+                    if enable_web_search:
+                        logger.info("🌐 No KB matches found - enabling Google Search Grounding for web search")
+                    elif rule_matched:
+                        logger.info("🚫 Rule matched - disabling web search (rule should provide the response)")
                 
-                # Build prompt with persona, knowledge, conversation history, and rule constraints
-                prompt = self._build_prompt_with_confidence(
-                    persona, 
-                    request.message, 
-                    knowledge_items,
-                    conversation_history,
-                    enable_web_search=enable_web_search,
-                    rule_constraints=rule_action_results  # Pass rule action results as constraints
-                )
+                    # Build prompt with persona, knowledge, conversation history, and rule constraints
+                    prompt = self._build_prompt_with_confidence(
+                        persona, 
+                        request.message, 
+                        knowledge_items,
+                        conversation_history,
+                        enable_web_search=enable_web_search,
+                        rule_constraints=rule_action_results  # Pass rule action results as constraints
+                    )
                 
-                # Generate response using Vertex AI (with optional web search)
-                if enable_web_search:
-                    # Use web search grounding
-                    search_result = self.vertex_ai.generate_text_with_search(prompt, enable_search=True, model_name=model_name)
-                    raw_response = search_result["response"]
+                    # Generate response using Vertex AI (with optional web search)
+                    if enable_web_search:
+                        # Use web search grounding
+                        search_result = self.vertex_ai.generate_text_with_search(prompt, enable_search=True, model_name=model_name)
+                        raw_response = search_result["response"]
                     
-                    # Track grounding info in trace
-                    trace["web_search_used"] = search_result["grounding_used"]
-                    trace["web_sources"] = search_result["sources"]
+                        # Track grounding info in trace
+                        trace["web_search_used"] = search_result["grounding_used"]
+                        trace["web_sources"] = search_result["sources"]
                     
-                    if search_result["grounding_used"]:
-                        logger.info(f"🌐 Web search performed - {len(search_result['sources'])} sources used")
-                else:
-                    # Standard KB-based response
-                    raw_response = self.vertex_ai.generate_text(prompt, model_name=model_name)
-                    trace["web_search_used"] = False
+                        if search_result["grounding_used"]:
+                            logger.info(f"🌐 Web search performed - {len(search_result['sources'])} sources used")
+                    else:
+                        # Standard KB-based response
+                        if on_delta:
+                            raw_response = self._generate_text_streaming(prompt, model_name, on_delta)
+                        else:
+                            raw_response = self.vertex_ai.generate_text(prompt, model_name=model_name)
+                        trace["web_search_used"] = False
                 
-                # Parse confidence and response (with follow-up questions and image requirements)
-                response, confidence, follow_up_questions, image_info = self._parse_confidence_response_v2(raw_response, persona)
-                trace["confidence"] = confidence
-                trace["follow_up_questions"] = follow_up_questions
-                trace["image_info"] = image_info
+                    # Parse confidence and response (with follow-up questions and image requirements)
+                    response, confidence, follow_up_questions, image_info = self._parse_confidence_response_v2(raw_response, persona)
+                    trace["confidence"] = confidence
+                    trace["follow_up_questions"] = follow_up_questions
+                    trace["image_info"] = image_info
                 
-                # Handle citation markers [1, 2, 3...] in response
-                # Keep them if we have sources (frontend will make them clickable)
-                # Strip them only if we have NO sources (they'd be useless)
-                if enable_web_search:
-                    has_sources = trace.get("web_sources") and len(trace.get("web_sources", [])) > 0
-                    if not has_sources:
-                        import re
-                        # Remove citation patterns only when we have no sources to link to
-                        response = re.sub(r'\s*\[[\d,\s]+\]', '', response)
-                    else:
-                        # Keep citations - frontend will make [1], [2], [3] clickable
-                        logger.info(f"📝 Keeping {len(trace.get('web_sources', []))} citation markers for frontend")
+                    # Handle citation markers [1, 2, 3...] in response
+                    # Keep them if we have sources (frontend will make them clickable)
+                    # Strip them only if we have NO sources (they'd be useless)
+                    if enable_web_search:
+                        has_sources = trace.get("web_sources") and len(trace.get("web_sources", [])) > 0
+                        if not has_sources:
+                            import re
+                            # Remove citation patterns only when we have no sources to link to
+                            response = re.sub(r'\s*\[[\d,\s]+\]', '', response)
+                        else:
+                            # Keep citations - frontend will make [1], [2], [3] clickable
+                            logger.info(f"📝 Keeping {len(trace.get('web_sources', []))} citation markers for frontend")
                 
-                # Append source citations if web search was used
-                if enable_web_search and trace.get("web_search_used") and trace.get("web_sources"):
-                    response = self._append_source_citations(response, trace["web_sources"])
+                    # Append source citations if web search was used
+                    if enable_web_search and trace.get("web_search_used") and trace.get("web_sources"):
+                        response = self._append_source_citations(response, trace["web_sources"])
                 
-                logger.info(f"📊 Response confidence: {confidence}%")
-                if follow_up_questions:
-                    logger.info(f"❓ Follow-up questions requested: {len(follow_up_questions)}")
+                    logger.info(f"📊 Response confidence: {confidence}%")
+                    if follow_up_questions:
+                        logger.info(f"❓ Follow-up questions requested: {len(follow_up_questions)}")
+                    
+                    if cacheable:
+                        self.semantic_cache.store(request.agent_id, message_embedding, {
+                            "response": response,
+                            "confidence": confidence,
+                            "follow_up_questions": follow_up_questions,
+                            "image_info": image_info,
+                            "kb_used": trace["kb_used"],
+                            "web_search_used": trace.get("web_search_used", False),
+                            "web_sources": trace.get("web_sources", [])
+                        })
             
             trace["llm_used"] = llm_used
             trace["response"] = response
@@ -352,22 +471,38 @@ class ChatService:
                 logger.warning(f"⚠️ Image search failed (non-fatal): {img_error}")
                 trace["images"] = []
             
-            # Step 6: Log full trace
-            chat_log = self._log_chat(request, response, trace)
+            # Step 6: Log full trace (callers that defer the write persist result["chat_log"] themselves)
+            chat_log = self._build_chat_log(request, response, trace)
+            if not defer_log:
+                self.persist_chat_log(chat_log)
             
-            logger.info(f"✅ Chat processed: {chat_log.chat_id}")
+            logger.info(f"✅ Chat processed: {chat_log['chat_id']}")
             
-            return {
+            result = {
                 "response": response,
                 "trace": trace,
-                "chat_id": chat_log.chat_id,
+                "chat_id": chat_log["chat_id"],
                 "images": trace.get("images", [])  # Include images at top level for easy frontend access
             }
+            if defer_log:
+                result["chat_log"] = chat_log
+            return result
             
         except Exception as e:
             logger.error(f"❌ Failed to process chat: {e}")
             raise Exception(f"Failed to process chat: {str(e)}")
     
+    def _generate_text_streaming(self, prompt: str, model_name: Optional[str], on_delta: Callable[[str], None]) -> str:
+        """Stream the LLM output, forwarding the decoded "answer" field as it arrives"""
+        extractor = _AnswerStreamExtractor()
+        chunks = []
+        for chunk in self.vertex_ai.generate_text_stream(prompt, model_name=model_name):
+            chunks.append(chunk)
+            delta = extractor.feed(chunk)
+            if delta:
+                on_delta(delta)
+        return "".join(chunks).strip()
+    
     def _get_recent_conversation(self, agent_id: str, session_id: str, limit: int = 10) -> List[Dict[str, str]]:
         """Get recent conversation history for context"""
         try:
@@ -405,9 +540,13 @@ class ChatService:
         """Detect conditions (keyword, intent, sentiment)"""
         conditions = {}
         
+        # Intent and sentiment are independent LLM calls - issue them together
+        intent_future = _chat_io_executor.submit(self.vertex_ai.detect_intent, message, model_name=model_name)
+        sentiment_future = _chat_io_executor.submit(self.vertex_ai.detect_sentiment, message, model_name=model_name)
+        
         # Detect intent
         try:
-            intent_data = self.vertex_ai.detect_intent(message, model_name=model_name)
+            intent_data = intent_future.result()
             conditions["intent"] = intent_data
             logger.info(f"🎯 Detected intent: {intent_data}")
         except Exception as e:
@@ -416,7 +555,7 @@ class ChatService:
         
         # Detect sentiment
         try:
-            sentiment_data = self.vertex_ai.detect_sentiment(message, model_name=model_name)
+            sentiment_data = sentiment_future.result()
             conditions["sentiment"] = sentiment_data
             logger.info(f"😊 Detected sentiment: {sentiment_data}")
         except Exception as e:
@@ -956,51 +1095,37 @@ Return ONLY the JSON object, no other text.
             
             return (raw_response, -1, [], no_image_info)
     
-    def _log_chat(self, request: ChatRequest, response: str, trace: Dict[str, Any]) -> ChatLog:
-        """Log chat interaction"""
+    def _build_chat_log(self, request: ChatRequest, response: str, trace: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the chat log document for an interaction"""
+        chat_id = f"CHAT_{uuid.uuid4().hex[:12].upper()}"
+        
+        # Use session_id as user_id if user_id is not provided
+        user_id = request.user_id if request.user_id else request.session_id
+        
+        return {
+            "chat_id": chat_id,
+            "agent_id": request.agent_id,
+            "user_id": user_id,
+            "session_id": request.session_id,
+            "message": request.message,
+            "response": response,
+            "conditions_detected": trace.get("conditions_detected", []),
+            "rule_matched": trace.get("rule_matched"),
+            "kb_used": trace.get("kb_used", []),
+            "llm_used": trace.get("llm_used", False),
+            "trace": trace,
+            "created_at": datetime.now(timezone.utc)
+        }
+    
+    def persist_chat_log(self, chat_log_data: Dict[str, Any]) -> bool:
+        """Save a chat log to Firestore (safe to run as a background task)"""
         try:
-            chat_id = f"CHAT_{uuid.uuid4().hex[:12].upper()}"
-            
-            # Use session_id as user_id if user_id is not provided
-            user_id = request.user_id if request.user_id else request.session_id
-            
-            chat_log_data = {
-                "chat_id": chat_id,
-                "agent_id": request.agent_id,
-                "user_id": user_id,
-                "session_id": request.session_id,
-                "message": request.message,
-                "response": response,
-                "conditions_detected": trace.get("conditions_detected", []),
-                "rule_matched": trace.get("rule_matched"),
-                "kb_used": trace.get("kb_used", []),
-                "llm_used": trace.get("llm_used", False),
-                "trace": trace,
-                "created_at": datetime.now(timezone.utc)
-            }
-            
-            # Save to Firestore
-            chat_ref = self.chat_logs_collection.document(chat_id)
+            chat_ref = self.chat_logs_collection.document(chat_log_data["chat_id"])
             chat_ref.set(chat_log_data)
-            
-            return ChatLog(**chat_log_data)
-            
+            return True
         except Exception as e:
-            logger.error(f"❌ Failed to log chat: {e}")
-            # Return a minimal chat log if saving fails
-            return ChatLog(
-                chat_id=chat_id,
-                agent_id=request.agent_id,
-                user_id=user_id,
-                session_id=request.session_id,
-                message=request.message,
-                response=response,
-                conditions_detected=trace.get("conditions_detected", []),
-                rule_matched=trace.get("rule_matched"),
-                kb_used=trace.get("kb_used", []),
-                llm_used=trace.get("llm_used", False),
-                trace=trace
-            )
+            logger.error(f"❌ Failed to log chat {chat_log_data.get('chat_id')}: {e}")
+            return False
     
     def teach_from_chat(self, agent_id: str, chat_id: str, approved_response: str) -> str:
         """Teach agent from approved chat response"""
@@ -1035,50 +1160,106 @@ Return ONLY the JSON object, no other text.
             logger.error(f"❌ Failed to teach from chat: {e}")
             raise Exception(f"Failed to teach from chat: {str(e)}")
     
-    def get_chat_history(self, agent_id: str, session_id: str, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get chat history for a specific agent and session"""
+    def teach_from_chat_batch(self, items: List[ChatTeachRequest]) -> List[str]:
+        """Teach agents from many approved chat responses in one pass"""
         try:
-            logger.info(f"Getting chat history for agent: {agent_id}, session: {session_id}")
+            logger.info(f"Teaching agents from {len(items)} chats (batch)")
+            
+            # Fetch all chat logs in a single round-trip
+            refs = [self.chat_logs_collection.document(item.chat_id) for item in items]
+            chat_logs = {doc.id: doc.to_dict() for doc in self.firestore_client.get_all(refs) if doc.exists}
+            
+            missing = [item.chat_id for item in items if item.chat_id not in chat_logs]
+            if missing:
+                raise ValueError(f"Chat log not found: {', '.join(missing)}")
+            
+            from ..models import KnowledgeQnARequest
+            qna_requests = [
+                KnowledgeQnARequest(
+                    agent_id=item.agent_id,
+                    question=chat_logs[item.chat_id].get("message", ""),
+                    answer=item.approved_response
+                )
+                for item in items
+            ]
+            
+            knowledge_ids = self.knowledge_service.add_qna_knowledge_batch(qna_requests)
+            
+            logger.info(f"✅ Agents taught: {len(knowledge_ids)} entries")
+            return knowledge_ids
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to teach from chat batch: {e}")
+            raise Exception(f"Failed to teach from chat batch: {str(e)}")
+    
+    @staticmethod
+    def encode_history_cursor(created_at: datetime, doc_id: str) -> str:
+        """Encode a chat log's (created_at, document id) sort key as an opaque page cursor"""
+        key = json.dumps([created_at.isoformat(), doc_id])
+        return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii")
+    
+    @staticmethod
+    def decode_history_cursor(cursor: str) -> Tuple[datetime, str]:
+        """Decode a page cursor back into its (created_at, document id) sort key; raises ValueError if malformed"""
+        try:
+            created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return datetime.fromisoformat(created_at), str(doc_id)
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {str(e)}")
+    
+    def get_chat_history(self, agent_id: str, session_id: str, limit: int = 50, before: Optional[Tuple[datetime, str]] = None) -> Dict[str, Any]:
+        """
+        Get a page of chat history for a specific agent and session.
+        
+        Returns the `limit` most recent chats older than the `before` (created_at, document id)
+        key, in chronological order, plus `next_cursor` for the previous page. The document id
+        breaks ties between chats logged in the same instant, so none are skipped or repeated.
+        Requires the composite index (agent_id ASC, session_id ASC, created_at DESC, __name__ DESC).
+        """
+        try:
+            logger.info(f"Getting chat history for agent: {agent_id}, session: {session_id}, before: {before}")
             
-            # Query chat logs for this agent and session
-            # Note: We don't use order_by to avoid requiring a composite index
-            # Instead, we sort in Python after fetching
             query = (
                 self.chat_logs_collection
                 .where("agent_id", "==", agent_id)
                 .where("session_id", "==", session_id)
+                .order_by("created_at", direction=firestore.Query.DESCENDING)
+                .order_by(firestore.FieldPath.document_id(), direction=firestore.Query.DESCENDING)
             )
+            if before:
+                created_at, doc_id = before
+                query = query.start_after({
+                    "created_at": created_at,
+                    firestore.FieldPath.document_id(): self.chat_logs_collection.document(doc_id)
+                })
             
-            docs = list(query.stream())
-            
-            # Sort by created_at in Python (ascending order)
-            docs_sorted = sorted(
-                docs, 
-                key=lambda d: d.to_dict().get("created_at") or datetime.min.replace(tzinfo=timezone.utc)
-            )
+            snapshots = list(query.limit(limit).stream())
+            docs = [doc.to_dict() for doc in snapshots]
             
-            # Apply limit after sorting
-            docs_sorted = docs_sorted[:limit]
+            # More pages exist only if this one is full; the cursor is its oldest chat
+            next_cursor = None
+            if len(docs) == limit and docs[-1].get("created_at"):
+                next_cursor = self.encode_history_cursor(docs[-1]["created_at"], snapshots[-1].id)
             
             messages = []
-            for doc in docs_sorted:
-                data = doc.to_dict()
+            for data in reversed(docs):
+                timestamp = data.get("created_at").isoformat() if data.get("created_at") else None
                 # Format for frontend consumption
                 messages.append({
                     "id": data.get("chat_id"),
                     "role": "user",
                     "content": data.get("message", ""),
-                    "timestamp": data.get("created_at").isoformat() if data.get("created_at") else None
+                    "timestamp": timestamp
                 })
                 messages.append({
                     "id": f"{data.get('chat_id')}_response",
                     "role": "assistant",
                     "content": data.get("response", ""),
-                    "timestamp": data.get("created_at").isoformat() if data.get("created_at") else None
+                    "timestamp": timestamp
                 })
             
             logger.info(f"✅ Retrieved {len(messages)} messages")
-            return messages
+            return {"messages": messages, "next_cursor": next_cursor}
             
         except Exception as e:
             logger.error(f"❌ Failed to get chat history: {e}")
@@ -1122,3 +1303,14 @@ Return ONLY the JSON object, no other text.
             logger.error(f"❌ Failed to clear chat history: {e}")
             raise Exception(f"Failed to clear chat history: {str(e)}")
 
+
+# Global instance
+_chat_service: Optional[ChatService] = None
+
+
+def get_chat_service() -> ChatService:
+    """Get or create singleton ChatService instance"""
+    global _chat_service
+    if _chat_service is None:
+        _chat_service = ChatService()
+    return _chat_service
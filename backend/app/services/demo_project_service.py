@@ -227,3 +227,15 @@ class DemoProjectService:
                     
         except Exception as e:
             raise Exception(f"Failed to remove demo from students: {str(e)}")
+
+
+# Global instance
+_demo_project_service: Optional[DemoProjectService] = None
+
+
+def get_demo_project_service() -> DemoProjectService:
+    """Get or create singleton DemoProjectService instance"""
+    global _demo_project_service
+    if _demo_project_service is None:
+        _demo_project_service = DemoProjectService()
+    return _demo_project_service
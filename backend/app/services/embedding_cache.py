@@ -0,0 +1,120 @@
+import os
+import re
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Bumped whenever key normalization changes, so rows persisted under the old scheme are never hit
+_KEY_VERSION = "2"
+
+
+class EmbeddingCache:
+    """
+    Content-hash keyed embedding cache.
+
+    L1 is an in-process LRU dict; L2 is a local SQLite table so identical text
+    never hits the embedding API twice, even across process restarts.
+    Keys are SHA-256 of the model name plus the text with whitespace collapsed. Case is
+    kept: embeddings are case-sensitive, so "US" and "us" must not share one.
+    """
+
+    def __init__(self, db_path: str, max_memory_entries: int = 10_000):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        try:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (hash BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+            )
+            self._conn.commit()
+        except Exception as e:
+            logger.warning(f"⚠️ Persistent embedding cache unavailable, using memory only: {e}")
+            self._conn = None
+
+    @staticmethod
+    def _key(text: str, model_name: Optional[str]) -> bytes:
+        normalized = _WHITESPACE_RE.sub(" ", text.strip())
+        return hashlib.sha256(f"{_KEY_VERSION}\x00{model_name or ''}\x00{normalized}".encode("utf-8")).digest()
+
+    def _remember(self, key: bytes, embedding: List[float]):
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str, model_name: Optional[str] = None) -> Optional[List[float]]:
+        key = self._key(text, model_name)
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                return embedding
+
+            if self._conn is None:
+                return None
+            try:
+                row = self._conn.execute("SELECT vec FROM embeddings WHERE hash = ?", (key,)).fetchone()
+            except Exception as e:
+                logger.warning(f"⚠️ Embedding cache read failed: {e}")
+                return None
+            if row is None:
+                return None
+
+            embedding = np.frombuffer(row[0], dtype=np.float32).tolist()
+            self._remember(key, embedding)
+            return embedding
+
+    def put(self, text: str, embedding: List[float], model_name: Optional[str] = None):
+        key = self._key(text, model_name)
+        with self._lock:
+            self._remember(key, embedding)
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+                    (key, np.asarray(embedding, dtype=np.float32).tobytes())
+                )
+                self._conn.commit()
+            except Exception as e:
+                logger.warning(f"⚠️ Embedding cache write failed: {e}")
+
+    def get_or_compute(self, text: str, embed_fn: Callable[[str], List[float]], model_name: Optional[str] = None) -> List[float]:
+        """Return the cached embedding for text, computing and storing it on a miss"""
+        embedding = self.get(text, model_name)
+        if embedding is not None:
+            logger.info(f"🔤 Embedding cache hit ({len(text)} chars)")
+            return embedding
+
+        embedding = embed_fn(text)
+        if embedding:
+            self.put(text, embedding, model_name)
+        return embedding
+
+
+# Global instance
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get or create singleton EmbeddingCache instance"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(settings.embedding_cache_path)
+    return _embedding_cache
@@ -8,12 +8,13 @@ from typing import Optional, Tuple, List, Dict, Any
 from datetime import datetime, timezone
 import uuid
 
-from google.cloud import storage
 import PyPDF2
 import pdfplumber
 import pandas as pd
 from openpyxl import load_workbook
 
+from ..config import gcp_clients
+
 logger = logging.getLogger(__name__)
 
 
@@ -41,7 +42,8 @@ class FileService:
     
     def __init__(self, bucket_name: str = None):
         """Initialize GCS client and bucket"""
-        self.storage_client = storage.Client()
+        # Share the process-wide client (and its connection pool) rather than building another
+        self.storage_client = gcp_clients.get_storage_client()
         self.bucket_name = bucket_name or os.getenv('GCS_BUCKET_NAME', 'neural-playground-kb')
         
         # Try to get or create bucket
@@ -0,0 +1,26 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+# Threads dedicated to blocking google-cloud-storage calls, shared by every request
+_GCS_MAX_WORKERS = 32
+
+# GCS calls allowed in flight (running or queued on the pool) across the whole process
+_GCS_MAX_IN_FLIGHT = 64
+
+_gcs_executor = ThreadPoolExecutor(max_workers=_GCS_MAX_WORKERS, thread_name_prefix="gcs")
+_gcs_slots = asyncio.Semaphore(_GCS_MAX_IN_FLIGHT)
+
+
+async def gcs_call(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking GCS client call on the shared GCS thread pool without blocking the event loop"""
+    async with _gcs_slots:
+        return await asyncio.get_running_loop().run_in_executor(
+            _gcs_executor, functools.partial(fn, *args, **kwargs)
+        )
+
+
+def shutdown_gcs_executor():
+    """Stop the GCS thread pool (called on app shutdown)"""
+    _gcs_executor.shutdown(wait=False)
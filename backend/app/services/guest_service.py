@@ -2,8 +2,11 @@
 Guest Service - Handles guest session and project operations in Firestore
 """
 
+import time
+import asyncio
 import logging
-from typing import List, Optional, Dict, Any
+import threading
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timezone, timedelta
 import uuid
 
@@ -12,9 +15,18 @@ from google.cloud.firestore_v1.base_query import FieldFilter
 
 from ..models import Guest, GuestCreate, GuestUpdate, GuestSession
 from ..config import gcp_clients
+from .response_cache import get_guest_projects_response_cache
 
 logger = logging.getLogger(__name__)
 
+# Validated sessions are trusted for this long before Firestore is checked again
+_SESSION_CACHE_TTL_SECONDS = 60
+_SESSION_CACHE_MAX_ENTRIES = 10_000
+
+# Project reads served from memory for this long, to absorb status-polling loops
+_PROJECT_CACHE_TTL_SECONDS = 2
+_PROJECT_CACHE_MAX_ENTRIES = 10_000
+
 
 class GuestService:
     """Service for managing guest sessions and their embedded projects"""
@@ -24,6 +36,10 @@ class GuestService:
         self._projects_collection = None
         self._session_collection = None
         self._initialized = False
+        self._validated_sessions: Dict[str, Tuple[GuestSession, float]] = {}
+        self._validated_sessions_lock = threading.Lock()
+        self._recent_projects: Dict[Tuple[str, Optional[Tuple[str, ...]]], Tuple[dict, float]] = {}
+        self._recent_projects_lock = threading.Lock()
     
     def _ensure_initialized(self):
         """Lazy initialization - only initialize when first accessed"""
@@ -60,8 +76,9 @@ class GuestService:
             session_id = f"session_{uuid.uuid4().hex[:16]}"
             project_id = f"proj_{uuid.uuid4().hex[:8]}"
             
-            # Calculate expiration time
-            expiration_time = datetime.now(timezone.utc) + timedelta(hours=guest_data.session_duration_hours)
+            # Calculate expiration time (one timestamp for the whole new session)
+            now = datetime.now(timezone.utc)
+            expiration_time = now + timedelta(hours=guest_data.session_duration_hours)
             
             # Create project data that matches your actual Firestore structure
             project_data = {
@@ -70,8 +87,8 @@ class GuestService:
                 "description": "",
                 "type": "text-recognition",
                 "status": "draft",
-                "createdAt": datetime.now(timezone.utc),
-                "updatedAt": datetime.now(timezone.utc),
+                "createdAt": now,
+                "updatedAt": now,
                 "createdBy": f"guest:{session_id}",  # This links the project to the guest session
                 "teacher_id": "",
                 "classroom_id": "",
@@ -138,12 +155,18 @@ class GuestService:
             logger.error(f"Error getting guest session {session_id}: {str(e)}")
             raise
     
-    async def get_guest_project_by_id(self, project_id: str) -> Optional[dict]:
-        """Get a guest project by project_id - looks in projects collection"""
+    async def get_guest_project_by_id(self, project_id: str, fields: Optional[List[str]] = None) -> Optional[dict]:
+        """Get a guest project by project_id - looks in projects collection
+        
+        When fields is given only those field paths are read, so routes that never touch
+        dataset.examples do not pull the whole document.
+        """
         try:
             # Query the projects collection to find a project with the given project_id
             query = self.projects_collection.where("id", "==", project_id).limit(1)
-            docs = query.stream()
+            if fields:
+                query = query.select(fields)
+            docs = await asyncio.to_thread(query.get)
             
             for doc in docs:
                 data = doc.to_dict()
@@ -154,6 +177,58 @@ class GuestService:
             logger.error(f"Error getting guest project by project_id {project_id}: {str(e)}")
             raise
     
+    async def get_guest_project_cached(self, project_id: str, fields: Optional[List[str]] = None) -> Optional[dict]:
+        """Get a guest project, reusing a read from the last _PROJECT_CACHE_TTL_SECONDS
+
+        Only for read-only callers that can tolerate a couple of seconds of staleness.
+        """
+        cache_key = (project_id, tuple(fields) if fields else None)
+        with self._recent_projects_lock:
+            cached = self._recent_projects.get(cache_key)
+        if cached and time.monotonic() - cached[1] < _PROJECT_CACHE_TTL_SECONDS:
+            return cached[0]
+        
+        project = await self.get_guest_project_by_id(project_id, fields)
+        if project is not None:
+            with self._recent_projects_lock:
+                if len(self._recent_projects) >= _PROJECT_CACHE_MAX_ENTRIES:
+                    # Drop the oldest entry (dicts keep insertion order)
+                    self._recent_projects.pop(next(iter(self._recent_projects)), None)
+                self._recent_projects[cache_key] = (project, time.monotonic())
+        return project
+
+    def invalidate_guest_project(self, project_id: str):
+        """Forget a cached project read so the next lookup goes to Firestore"""
+        with self._recent_projects_lock:
+            for key in [k for k in self._recent_projects if k[0] == project_id]:
+                self._recent_projects.pop(key, None)
+
+    async def update_guest_project_if_owned(self, project_id: str, session_id: str, updates: Dict[str, Any]) -> bool:
+        """Apply updates to a guest project in one transaction, only if it still belongs to the session
+
+        Returns False when the project no longer exists or is owned by another session.
+        """
+        doc_ref = self.projects_collection.document(project_id)
+
+        @firestore.transactional
+        def _verify_and_update(transaction) -> bool:
+            snapshot = doc_ref.get(transaction=transaction)
+            if not snapshot.exists or (snapshot.to_dict() or {}).get("createdBy") != f"guest:{session_id}":
+                return False
+            transaction.update(doc_ref, updates)
+            return True
+
+        try:
+            # The sync client blocks for the whole read-verify-write, so keep it off the event loop
+            updated = await asyncio.to_thread(_verify_and_update, self.db.transaction())
+            if updated:
+                self.invalidate_guest_project(project_id)
+                get_guest_projects_response_cache().invalidate(session_id)
+            return updated
+        except Exception as e:
+            logger.error(f"Error updating guest project {project_id}: {str(e)}")
+            raise
+
     async def update_guest_session(self, session_id: str, update_data: GuestUpdate) -> Optional[dict]:
         """Update a guest session"""
         try:
@@ -286,6 +361,7 @@ class GuestService:
             }
             
             doc_ref.update(update_data)
+            get_guest_projects_response_cache().invalidate(session_id)
             
             # Return updated document
             updated_doc = doc_ref.get()
@@ -307,8 +383,9 @@ class GuestService:
             
             doc_ref = docs[0].reference
             
+            now = datetime.now(timezone.utc)
             update_data = {
-                'updatedAt': datetime.now(timezone.utc)
+                'updatedAt': now
             }
             
             if logs:
@@ -319,12 +396,13 @@ class GuestService:
                 update_data['model.loss'] = metrics.get('loss')
                 
             if status == "completed":
-                update_data['model.trainedAt'] = datetime.now(timezone.utc)
+                update_data['model.trainedAt'] = now
                 update_data['status'] = "trained"
             elif status == "failed":
                 update_data['status'] = "failed"
             
             doc_ref.update(update_data)
+            get_guest_projects_response_cache().invalidate(session_id)
             
             # Return updated document
             updated_doc = doc_ref.get()
@@ -342,17 +420,18 @@ class GuestService:
             project_id = f"proj_{uuid.uuid4().hex[:8]}"
             
             # Calculate expiration time (7 days from now)
-            expiration_time = datetime.now(timezone.utc) + timedelta(days=7)
+            now = datetime.now(timezone.utc)
+            expiration_time = now + timedelta(days=7)
             
             # Create simple guest session
             guest_session = GuestSession(
                 session_id=session_id,
-                createdAt=datetime.now(timezone.utc),
+                createdAt=now,
                 expiresAt=expiration_time,
                 active=True,
                 ip_address=ip_address,
                 user_agent=user_agent,
-                last_active=datetime.now(timezone.utc)
+                last_active=now
             )
             
             # Save simple session to Firestore
@@ -367,8 +446,8 @@ class GuestService:
                  "description": "",
                  "type": "text-recognition",
                  "status": "draft",
-                 "createdAt": datetime.now(timezone.utc),
-                 "updatedAt": datetime.now(timezone.utc),
+                 "createdAt": now,
+                 "updatedAt": now,
                  "createdBy": f"guest:{session_id}",  # This links the project to the guest session
                  "teacher_id": "",
                  "classroom_id": "",
@@ -423,7 +502,8 @@ class GuestService:
         """Get a simple guest session by ID"""
         try:
             doc_ref = self.session_collection.document(session_id)
-            doc = doc_ref.get()
+            # The sync client blocks for the round-trip, so keep it off the event loop
+            doc = await asyncio.to_thread(doc_ref.get)
             
             if doc.exists:
                 data = doc.to_dict()
@@ -434,8 +514,24 @@ class GuestService:
             logger.error(f"Error getting simple guest session {session_id}: {str(e)}")
             raise
 
+    def invalidate_validated_session(self, session_id: str):
+        """Forget a cached validation so the next request re-reads the session"""
+        with self._validated_sessions_lock:
+            self._validated_sessions.pop(session_id, None)
+
     async def validate_session(self, session_id: str) -> GuestSession:
-        """Validate a guest session exists and is active"""
+        """Validate a guest session exists and is active
+        
+        A successful validation is cached for _SESSION_CACHE_TTL_SECONDS, during which
+        only the expiry is re-checked and last_active is not rewritten.
+        """
+        with self._validated_sessions_lock:
+            cached = self._validated_sessions.get(session_id)
+        if cached and time.monotonic() - cached[1] < _SESSION_CACHE_TTL_SECONDS:
+            if cached[0].expiresAt > datetime.now(timezone.utc):
+                return cached[0]
+            self.invalidate_validated_session(session_id)
+        
         try:
             session = await self.get_simple_guest_session(session_id)
             
@@ -452,10 +548,16 @@ class GuestService:
             
             # Update last active time
             doc_ref = self.session_collection.document(session_id)
-            doc_ref.update({
+            await asyncio.to_thread(doc_ref.update, {
                 'last_active': current_time
             })
             
+            with self._validated_sessions_lock:
+                if len(self._validated_sessions) >= _SESSION_CACHE_MAX_ENTRIES:
+                    # Drop the oldest entry (dicts keep insertion order)
+                    self._validated_sessions.pop(next(iter(self._validated_sessions)), None)
+                self._validated_sessions[session_id] = (session, time.monotonic())
+            
             return session
             
         except Exception as e:
@@ -474,6 +576,7 @@ class GuestService:
                 return False
             
             doc_ref.delete()
+            self.invalidate_validated_session(session_id)
             logger.info(f"Deleted simple guest session: {session_id}")
             return True
             
@@ -483,4 +586,9 @@ class GuestService:
 
 
 # Global instance
-guest_service = GuestService()
\ No newline at end of file
+guest_service = GuestService()
+
+
+def get_guest_service() -> GuestService:
+    """Get the singleton GuestService instance"""
+    return guest_service
@@ -0,0 +1,43 @@
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Per-image backbone embeddings live under <model dir>/EMBEDDINGS_SUBDIR and survive retrains
+EMBEDDINGS_SUBDIR = "embeddings"
+
+
+def embeddings_dir(project_id: str) -> str:
+    """GCS directory holding an image project's stored embeddings"""
+    return f"image_recog/{project_id}/{EMBEDDINGS_SUBDIR}"
+
+
+def embedding_prefix(directory: str, image_url: str) -> str:
+    """Object name prefix shared by every stored embedding of one image URL"""
+    return f"{directory}/{hashlib.sha256(image_url.encode()).hexdigest()}-"
+
+
+def embedding_path(directory: str, image_url: str, generation: int) -> str:
+    """Embedding object for one version of an image
+
+    The image's generation is part of the name, so re-uploading a file under the same
+    URL never reuses the embedding of the old content.
+    """
+    return f"{embedding_prefix(directory, image_url)}{generation}.npy"
+
+
+def delete_embeddings(bucket, prefix: str, keep: str = None) -> int:
+    """Delete stored embeddings under prefix (except the object named keep), returning how many
+
+    Blocking - call through gcs_call. Failures are logged and skipped.
+    """
+    deleted = 0
+    for blob in bucket.list_blobs(prefix=prefix):
+        if blob.name == keep:
+            continue
+        try:
+            blob.delete()
+            deleted += 1
+        except Exception as e:
+            logger.warning(f"Failed to delete embedding {blob.name}: {e}")
+    return deleted
@@ -9,8 +9,10 @@ import re
 
 from ..models import Knowledge, KnowledgeType, KnowledgeTextRequest, KnowledgeFileRequest, KnowledgeLinkRequest, KnowledgeQnARequest
 from ..config import gcp_clients, settings
-from .vertex_ai_service import VertexAIService
-from .agent_service import AgentService
+from .vertex_ai_service import get_vertex_ai_service
+from .agent_service import get_agent_service
+from .embedding_cache import get_embedding_cache
+from .semantic_cache import get_semantic_cache
 
 logger = logging.getLogger(__name__)
 
@@ -79,10 +81,10 @@ class KnowledgeService:
             self._knowledge_collection = self._firestore_client.collection('knowledge')
             
             # Initialize Vertex AI service
-            self._vertex_ai = VertexAIService(self._project_id)
+            self._vertex_ai = get_vertex_ai_service(self._project_id)
             
             # Initialize Agent Service for loading settings
-            self._agent_service = AgentService()
+            self._agent_service = get_agent_service()
             
             self._initialized = True
             logger.info("✅ KnowledgeService initialized")
@@ -205,6 +207,9 @@ class KnowledgeService:
                 knowledge_ref.set(knowledge_data)
                 knowledge_ids.append(knowledge_id)
             
+            # The agent's knowledge changed - cached answers may now be stale
+            get_semantic_cache().invalidate(request.agent_id)
+            
             logger.info(f"✅ Text knowledge added: {len(knowledge_ids)} chunks")
             return {"knowledge_ids": knowledge_ids, "chunks_added": len(knowledge_ids)}
             
@@ -289,6 +294,8 @@ class KnowledgeService:
                 knowledge_ids.append(knowledge_id)
                 logger.info(f"✅ Stored chunk {i+1}/{len(chunks)}: {knowledge_id}")
             
+            get_semantic_cache().invalidate(agent_id)
+            
             logger.info(f"✅ File knowledge added: {len(knowledge_ids)} chunks from {file_name}")
             return {
                 "knowledge_ids": knowledge_ids,
@@ -310,7 +317,6 @@ class KnowledgeService:
                 blob_name = parts[1] if len(parts) > 1 else ""
                 
                 # Download from GCS
-                from ..config import gcp_clients
                 storage_client = gcp_clients.get_storage_client()
                 bucket = storage_client.bucket(bucket_name)
                 blob = bucket.blob(blob_name)
@@ -599,6 +605,8 @@ class KnowledgeService:
                 knowledge_ref.set(knowledge_data)
                 knowledge_ids.append(knowledge_id)
             
+            get_semantic_cache().invalidate(request.agent_id)
+            
             logger.info(f"✅ Link knowledge added: {len(knowledge_ids)} chunks from {request.url} using {scrape_method}")
             return {
                 "knowledge_ids": knowledge_ids,
@@ -629,7 +637,11 @@ class KnowledgeService:
             logger.info(f"🔤 Adding Q&A knowledge - Using embedding model: {embedding_model_name}")
             
             # Generate embedding
-            embedding = self.vertex_ai.generate_embedding(qna_content, embedding_model_name=embedding_model_name)
+            embedding = get_embedding_cache().get_or_compute(
+                qna_content,
+                lambda text: self.vertex_ai.generate_embedding(text, embedding_model_name=embedding_model_name),
+                model_name=embedding_model_name
+            )
             
             # Create knowledge document with high priority
             knowledge_id = f"KB_{uuid.uuid4().hex[:12].upper()}"
@@ -651,6 +663,8 @@ class KnowledgeService:
             knowledge_ref = self.knowledge_collection.document(knowledge_id)
             knowledge_ref.set(knowledge_data)
             
+            get_semantic_cache().invalidate(request.agent_id)
+            
             logger.info(f"✅ Q&A knowledge added: {knowledge_id}")
             return knowledge_id
             
@@ -658,6 +672,74 @@ class KnowledgeService:
             logger.error(f"❌ Failed to add Q&A knowledge: {e}")
             raise Exception(f"Failed to add Q&A knowledge: {str(e)}")
     
+    def add_qna_knowledge_batch(self, requests: List[KnowledgeQnARequest]) -> List[str]:
+        """Add many Q&A knowledge entries with one embedding call per agent and batched writes"""
+        try:
+            logger.info(f"Adding {len(requests)} Q&A knowledge entries (batch)")
+            
+            # Group by agent - each agent may use a different embedding model
+            by_agent: Dict[str, List[int]] = {}
+            for i, request in enumerate(requests):
+                by_agent.setdefault(request.agent_id, []).append(i)
+            
+            contents = [f"Q: {r.question}\nA: {r.answer}" for r in requests]
+            embeddings: List[Optional[List[float]]] = [None] * len(requests)
+            
+            for agent_id, indexes in by_agent.items():
+                embedding_model_name = self._get_embedding_model_name(agent_id)
+                logger.info(f"🔤 Adding Q&A knowledge batch for {agent_id} - Using embedding model: {embedding_model_name}")
+                
+                # Vertex AI accepts up to 250 instances per embeddings request
+                for start in range(0, len(indexes), 250):
+                    chunk = indexes[start:start + 250]
+                    vectors = self.vertex_ai.generate_embeddings_batch(
+                        [contents[i] for i in chunk],
+                        embedding_model_name=embedding_model_name
+                    )
+                    for i, vector in zip(chunk, vectors):
+                        embeddings[i] = vector
+            
+            knowledge_ids = []
+            batch = self.firestore_client.batch()
+            pending = 0
+            now = datetime.now(timezone.utc)
+            
+            for request, content, embedding in zip(requests, contents, embeddings):
+                knowledge_id = f"KB_{uuid.uuid4().hex[:12].upper()}"
+                batch.set(self.knowledge_collection.document(knowledge_id), {
+                    "knowledge_id": knowledge_id,
+                    "agent_id": request.agent_id,
+                    "type": KnowledgeType.QNA.value,
+                    "content": content,
+                    "embedding": embedding,
+                    "metadata": {
+                        "question": request.question,
+                        "answer": request.answer
+                    },
+                    "priority": 10,  # High priority for Q&A
+                    "created_at": now
+                })
+                knowledge_ids.append(knowledge_id)
+                pending += 1
+                
+                if pending >= settings.firestore_batch_size:
+                    batch.commit()
+                    batch = self.firestore_client.batch()
+                    pending = 0
+            
+            if pending:
+                batch.commit()
+            
+            for agent_id in by_agent:
+                get_semantic_cache().invalidate(agent_id)
+            
+            logger.info(f"✅ Q&A knowledge batch added: {len(knowledge_ids)} entries")
+            return knowledge_ids
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to add Q&A knowledge batch: {e}")
+            raise Exception(f"Failed to add Q&A knowledge batch: {str(e)}")
+    
     def list_knowledge(self, agent_id: str, kb_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """List all knowledge entries for an agent"""
         try:
@@ -737,6 +819,9 @@ class KnowledgeService:
                 "updated_at": datetime.now(timezone.utc)
             })
             
+            if agent_id:
+                get_semantic_cache().invalidate(agent_id)
+            
             logger.info(f"✅ Knowledge updated: {knowledge_id}")
             return {"knowledge_id": knowledge_id, "updated": True}
             
@@ -755,6 +840,10 @@ class KnowledgeService:
             
             knowledge_ref.delete()
             
+            agent_id = doc.to_dict().get('agent_id')
+            if agent_id:
+                get_semantic_cache().invalidate(agent_id)
+            
             logger.info(f"✅ Knowledge deleted: {knowledge_id}")
             return True
             
@@ -829,3 +918,14 @@ class KnowledgeService:
             logger.error(f"❌ Failed to retrieve knowledge: {e}")
             return []
 
+
+# Global instance
+_knowledge_service: Optional[KnowledgeService] = None
+
+
+def get_knowledge_service() -> KnowledgeService:
+    """Get or create singleton KnowledgeService instance"""
+    global _knowledge_service
+    if _knowledge_service is None:
+        _knowledge_service = KnowledgeService()
+    return _knowledge_service
@@ -0,0 +1,92 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCache:
+    """
+    Process-local LRU of deserialized models loaded from GCS.
+
+    Entries are keyed by (model path, generation of a marker object), so a
+    retrained model - which rewrites its artifacts and bumps the generation -
+    is picked up on the next lookup without explicit invalidation. Loads of
+    the same path are serialized so a cold model is fetched once, not once per
+    concurrent request.
+    """
+
+    def __init__(self, maxsize: int = 8):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[str, int], Any]" = OrderedDict()
+        self._path_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: Tuple[str, int]) -> Optional[Any]:
+        with self._lock:
+            model = self._entries.get(key)
+            if model is not None:
+                self._entries.move_to_end(key)
+            return model
+
+    def get_or_load(self, bucket, gcs_path: str, marker_path: str, loader: Callable[[Any, str], Any]) -> Any:
+        """Return the cached model for gcs_path, calling loader(bucket, gcs_path) on a miss
+
+        marker_path is the object whose generation identifies the model version.
+        """
+        marker = bucket.get_blob(marker_path)
+        if marker is None:
+            raise FileNotFoundError(f"Model not found in GCS: {marker_path}")
+        key = (gcs_path, marker.generation)
+
+        model = self._lookup(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            path_lock = self._path_locks.setdefault(gcs_path, threading.Lock())
+
+        with path_lock:
+            # Another request may have finished loading while we waited
+            model = self._lookup(key)
+            if model is not None:
+                return model
+
+            logger.info(f"📦 Model cache miss, loading {gcs_path} (generation {marker.generation})")
+            model = loader(bucket, gcs_path)
+
+            with self._lock:
+                # Older generations of this model can never be hit again
+                for stale_key in [k for k in self._entries if k[0] == gcs_path]:
+                    self._entries.pop(stale_key, None)
+                self._entries[key] = model
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            return model
+
+
+# Global instance
+_model_cache: Optional[ModelCache] = None
+
+
+def get_model_cache() -> ModelCache:
+    """Get or create singleton ModelCache instance for the small models (LR pipelines, TFLite/Keras)"""
+    global _model_cache
+    if _model_cache is None:
+        _model_cache = ModelCache(maxsize=8)
+    return _model_cache
+
+
+# A loaded DistilBERT model is ~260MB, so it gets its own cache with a much tighter limit
+_DISTILBERT_CACHE_MAX_ENTRIES = 2
+
+_distilbert_model_cache: Optional[ModelCache] = None
+
+
+def get_distilbert_model_cache() -> ModelCache:
+    """Get or create singleton ModelCache instance for DistilBERT models"""
+    global _distilbert_model_cache
+    if _distilbert_model_cache is None:
+        _distilbert_model_cache = ModelCache(maxsize=_DISTILBERT_CACHE_MAX_ENTRIES)
+    return _distilbert_model_cache
@@ -1,16 +1,75 @@
+import json
 import uuid
+import base64
+import asyncio
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from google.cloud import firestore
-from google.cloud import storage
+from google.cloud.exceptions import NotFound
 from google.cloud import pubsub_v1
+import google_crc32c
 
-from ..models import Project, ProjectCreate, ProjectUpdate, Dataset, TrainedModel, ProjectConfig, TextExample, ExampleAdd, ImageExampleAdd
-from ..config import gcp_clients
+from ..models import Project, ProjectCreate, ProjectUpdate, ProjectType, Dataset, TrainedModel, ProjectConfig, TextExample, ExampleAdd, ImageExampleAdd, TEACHABLE_MACHINE_TYPES
+from ..config import gcp_clients, settings
+from .response_cache import get_guest_projects_response_cache
+from .gcs_io import gcs_call
+from .image_embeddings import embeddings_dir, delete_embeddings
 
 logger = logging.getLogger(__name__)
 
+# Uploads are read from the client and written to GCS in chunks of this size
+_UPLOAD_READ_SIZE = 1024 * 1024
+
+# Most read buffers kept around for reuse (bounds retained memory to 32MB)
+_UPLOAD_BUFFER_POOL_SIZE = 32
+
+
+def _crc32c_of(fileobj) -> str:
+    """Base64 CRC32C of a seekable file, as GCS reports it in blob.crc32c (file is rewound)"""
+    checksum = google_crc32c.Checksum()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(_UPLOAD_READ_SIZE), b""):
+        checksum.update(chunk)
+    fileobj.seek(0)
+    return base64.b64encode(checksum.digest()).decode("ascii")
+
+
+class _BufferPool:
+    """Recycles fixed-size bytearrays so each streamed upload chunk doesn't allocate a new buffer"""
+    
+    def __init__(self, buffer_size: int, max_buffers: int):
+        self.buffer_size = buffer_size
+        self.max_buffers = max_buffers
+        self._free: List[bytearray] = []
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> bytearray:
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+        return bytearray(self.buffer_size)
+    
+    def release(self, buffer: bytearray):
+        with self._lock:
+            if len(self._free) < self.max_buffers:
+                self._free.append(buffer)
+
+
+_upload_buffers = _BufferPool(_UPLOAD_READ_SIZE, _UPLOAD_BUFFER_POOL_SIZE)
+
+# Upper bound on documents scanned per search, and the sort key for projects without createdAt
+_SEARCH_SCAN_LIMIT = 1000
+_EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+# Typed projects kept per process so unchanged documents skip pydantic re-validation
+_PROJECT_CACHE_MAX_ENTRIES = 256
+
+# Project types accepted by the ProjectType enum
+_VALID_TYPES = frozenset(t.value for t in ProjectType)
+
 
 class ProjectService:
     """Service layer for project management operations"""
@@ -20,11 +79,33 @@ class ProjectService:
         self.bucket = gcp_clients.get_bucket()
         self.topic_path = gcp_clients.get_topic_path()
         self.pubsub_client = gcp_clients.get_pubsub_client()
+        # project_id -> (Firestore update_time, typed Project), most recently used last
+        self._project_cache: "OrderedDict[str, Tuple[Any, Project]]" = OrderedDict()
+        self._project_cache_lock = threading.Lock()
+    
+    @staticmethod
+    def _detached(project: Project) -> Project:
+        """Copy of a cached project that callers can edit without touching the cache"""
+        return project.model_copy(update={'dataset': project.dataset.detached_copy()})
+    
+    def _cache_project(self, project: Project, update_time):
+        """Remember the typed project for the document version written/read at update_time"""
+        with self._project_cache_lock:
+            self._project_cache[project.id] = (update_time, self._detached(project))
+            self._project_cache.move_to_end(project.id)
+            while len(self._project_cache) > _PROJECT_CACHE_MAX_ENTRIES:
+                self._project_cache.popitem(last=False)
+    
+    @staticmethod
+    def _invalidate_project_lists(student_id: Optional[str]):
+        """Drop cached project list pages for a guest session after one of its projects changes"""
+        if student_id:
+            get_guest_projects_response_cache().invalidate(student_id)
     
     def _deserialize_project_data(self, data: dict) -> dict:
         """Helper method to properly deserialize nested objects from Firestore"""
         # Handle invalid project type enum values
-        if 'type' in data and data['type'] not in ['text-recognition', 'image-recognition', 'image-recognition-teachable-machine', 'pose-recognition-teachable-machine', 'classification', 'regression', 'custom']:
+        if 'type' in data and data['type'] not in _VALID_TYPES:
             logger.warning(f"Invalid project type '{data['type']}' found, defaulting to 'text-recognition'")
             data['type'] = 'text-recognition'
         
@@ -94,7 +175,7 @@ class ProjectService:
             # For teachable machine projects, don't use training config since they use Teachable Machine
             # For regular projects, use training config like text recognition
             config = None
-            if project_data.type not in ["image-recognition-teachable-machine", "pose-recognition-teachable-machine"]:
+            if project_data.type not in TEACHABLE_MACHINE_TYPES:
                 config = project_data.config or ProjectConfig()
             
             project = Project(
@@ -120,6 +201,7 @@ class ProjectService:
             # Convert to dict for Firestore
             project_dict = project.model_dump()
             self.collection.document(project_id).set(project_dict)
+            self._invalidate_project_lists(project.student_id)
             
             return project
         except Exception as e:
@@ -129,14 +211,42 @@ class ProjectService:
         """Get project by ID"""
         try:
             doc = self.collection.document(project_id).get()
-            if doc.exists:
-                data = doc.to_dict()
-                data = self._deserialize_project_data(data)
-                return Project(**data)
-            return None
+            if not doc.exists:
+                return None
+            return self._typed_project(doc)
+        except Exception as e:
+            raise Exception(f"Failed to get project: {str(e)}")
+    
+    async def get_project_if_owned(self, project_id: str, session_id: str) -> Optional[Project]:
+        """Get a project only if it belongs to the guest session, in one filtered query
+        
+        Returns None both when the project is missing and when another session owns it,
+        so callers cannot tell the two apart.
+        """
+        try:
+            query = (
+                self.collection
+                .where(filter=firestore.FieldFilter(firestore.FieldPath.document_id(), '==', self.collection.document(project_id)))
+                .where(filter=firestore.FieldFilter('student_id', '==', session_id))
+                .limit(1)
+            )
+            docs = await asyncio.get_running_loop().run_in_executor(None, query.get)
+            return self._typed_project(docs[0]) if docs else None
         except Exception as e:
             raise Exception(f"Failed to get project: {str(e)}")
     
+    def _typed_project(self, doc) -> Project:
+        """Project for a fetched snapshot; an unchanged document (same update_time) reuses the already-typed project"""
+        with self._project_cache_lock:
+            cached = self._project_cache.get(doc.id)
+            if cached is not None and cached[0] == doc.update_time:
+                self._project_cache.move_to_end(doc.id)
+                return self._detached(cached[1])
+        
+        project = Project(**self._deserialize_project_data(doc.to_dict()))
+        self._cache_project(project, doc.update_time)
+        return project
+    
     async def get_projects(
         self, 
         limit: int = 50, 
@@ -148,38 +258,21 @@ class ProjectService:
     ) -> List[Project]:
         """Get all projects with optional filtering"""
         try:
-            # For guest session filtering, use a simpler approach to avoid index requirements
             if guest_session_id:
-                # Query only by student_id for guest sessions
+                # Filter and sort in Firestore - served by the student_id composite
+                # indexes (see gcpsetup.md) instead of reading the whole session
                 query = self.collection.where('student_id', '==', guest_session_id)
-                docs = query.get()
-                
-                # Convert to projects and apply in-memory filtering and sorting
-                all_projects = []
-                for doc in docs:
-                    data = doc.to_dict()
-                    data = self._deserialize_project_data(data)
-                    project = Project(**data)
-                    
-                    # Apply additional filters in memory
-                    if status and project.status != status:
-                        continue
-                    if type and project.type != type:
-                        continue
-                    if created_by and project.createdBy != created_by:
-                        continue
-                    
-                    all_projects.append(project)
-                
-                # Sort by creation date (descending)
-                all_projects.sort(key=lambda p: p.createdAt, reverse=True)
+                if status:
+                    query = query.where('status', '==', status)
+                if type:
+                    query = query.where('type', '==', type)
+                if created_by:
+                    query = query.where('createdBy', '==', created_by)
                 
-                # Apply pagination
-                start_idx = offset
-                end_idx = offset + limit
-                projects = all_projects[start_idx:end_idx]
+                query = query.order_by('createdAt', direction=firestore.Query.DESCENDING)
+                docs = query.offset(offset).limit(limit).get()
                 
-                return projects
+                return [Project(**self._deserialize_project_data(doc.to_dict())) for doc in docs]
             else:
                 # For non-guest queries, use the original approach
                 query = self.collection.order_by('createdAt', direction=firestore.Query.DESCENDING)
@@ -205,6 +298,146 @@ class ProjectService:
         except Exception as e:
             raise Exception(f"Failed to get projects: {str(e)}")
     
+    def _guest_filter_query(self, filters: Dict[str, Any]):
+        """Build the Firestore query for a guest session filter dict (guest_session_id, status, type)"""
+        query = self.collection.where('student_id', '==', filters['guest_session_id'])
+        if filters.get('status'):
+            query = query.where('status', '==', filters['status'])
+        if filters.get('type'):
+            query = query.where('type', '==', filters['type'])
+        return query
+    
+    async def get_projects_with_count(
+        self,
+        filters: Dict[str, Any],
+        limit: int = 50,
+        offset: int = 0
+    ) -> Tuple[List[Project], int]:
+        """Get a page of a guest session's projects together with the exact total"""
+        try:
+            # The count is listed first so its aggregation query is already in flight
+            # on the executor while the page is being read
+            total, projects = await asyncio.gather(
+                self.count_projects(filters),
+                self.get_projects(
+                    limit=limit,
+                    offset=offset,
+                    status=filters.get('status'),
+                    type=filters.get('type'),
+                    created_by=None,
+                    guest_session_id=filters['guest_session_id']
+                )
+            )
+            
+            return projects, total
+        except Exception as e:
+            raise Exception(f"Failed to get projects: {str(e)}")
+    
+    @staticmethod
+    def encode_cursor(project: Project) -> str:
+        """Encode a project's (createdAt, id) sort key as an opaque page cursor"""
+        key = json.dumps([project.createdAt.isoformat(), project.id])
+        return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii")
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+        """Decode a page cursor back into its (createdAt, id) sort key; raises ValueError if malformed"""
+        try:
+            created_at, project_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return datetime.fromisoformat(created_at), str(project_id)
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {str(e)}")
+    
+    async def list_by_session_cursor(
+        self,
+        filters: Dict[str, Any],
+        after: Optional[Tuple[datetime, str]],
+        limit: int
+    ) -> Tuple[List[Project], Optional[str]]:
+        """
+        Get a guest session's projects newest first, starting after a (createdAt, id) key.
+        
+        Seeks straight to the page in the index instead of skipping `offset` documents,
+        and stays stable while projects are being added. Returns the page and the cursor
+        for the next one (None on the last page).
+        """
+        try:
+            query = (
+                self._guest_filter_query(filters)
+                .order_by('createdAt', direction=firestore.Query.DESCENDING)
+                .order_by(firestore.FieldPath.document_id(), direction=firestore.Query.DESCENDING)
+            )
+            if after:
+                created_at, project_id = after
+                query = query.start_after({
+                    'createdAt': created_at,
+                    firestore.FieldPath.document_id(): self.collection.document(project_id)
+                })
+            
+            # Fetch one extra document to learn whether another page exists
+            docs = await asyncio.get_running_loop().run_in_executor(None, query.limit(limit + 1).get)
+            projects = [Project(**self._deserialize_project_data(doc.to_dict())) for doc in docs[:limit]]
+            
+            next_cursor = self.encode_cursor(projects[-1]) if len(docs) > limit else None
+            return projects, next_cursor
+        except Exception as e:
+            raise Exception(f"Failed to get projects: {str(e)}")
+    
+    async def count_projects(self, filters: Dict[str, Any]) -> int:
+        """Count projects matching the guest session/status/type filters with an aggregation query"""
+        try:
+            query = self._guest_filter_query(filters)
+            result = await asyncio.get_running_loop().run_in_executor(None, query.count().get)
+            return int(result[0][0].value)
+        except Exception as e:
+            raise Exception(f"Failed to count projects: {str(e)}")
+    
+    async def count_guest_projects(self, guest_session_id: str) -> int:
+        """Count a guest session's projects with an aggregation query (no documents are read)"""
+        try:
+            result = self.collection.where('student_id', '==', guest_session_id).count().get()
+            return int(result[0][0].value)
+        except Exception as e:
+            raise Exception(f"Failed to count projects: {str(e)}")
+    
+    async def get_guest_project_summaries(self, guest_session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get only the identifying fields of a guest session's projects"""
+        try:
+            query = (
+                self.collection
+                .where('student_id', '==', guest_session_id)
+                .select(['id', 'name', 'type', 'status', 'createdAt'])
+                .limit(limit)
+            )
+            return [doc.to_dict() for doc in query.get()]
+        except Exception as e:
+            raise Exception(f"Failed to get project summaries: {str(e)}")
+    
+    async def update_project_for_session(self, project: Project, update_data: ProjectUpdate) -> Project:
+        """Update a project the route already loaded through its ownership dependency, without reading it again"""
+        try:
+            return self._apply_project_update(project, update_data)
+        except Exception as e:
+            raise Exception(f"Failed to update project: {str(e)}")
+    
+    async def delete_project_for_session(self, project_id: str, session_id: str):
+        """Delete a guest project whose ownership the route's dependency already checked"""
+        try:
+            self.collection.document(project_id).delete()
+            self._invalidate_project_lists(session_id)
+            await self._delete_project_embeddings(project_id)
+        except Exception as e:
+            raise Exception(f"Failed to delete project: {str(e)}")
+    
+    async def _delete_project_embeddings(self, project_id: str):
+        """Remove a deleted project's stored image embeddings (best effort; they are only a cache)"""
+        try:
+            deleted = await gcs_call(delete_embeddings, self.bucket, f"{embeddings_dir(project_id)}/")
+            if deleted:
+                logger.info(f"Deleted {deleted} stored embeddings for project {project_id}")
+        except Exception as e:
+            logger.warning(f"Failed to delete stored embeddings for project {project_id}: {str(e)}")
+    
     async def update_project(self, project_id: str, update_data: ProjectUpdate) -> Project:
         """Update project"""
         try:
@@ -212,30 +445,35 @@ class ProjectService:
             if not project:
                 raise Exception("Project not found")
             
-            # Update fields
-            for field, value in update_data.model_dump(exclude_unset=True).items():
-                if hasattr(project, field):
-                    # Special handling for config field based on project type
-                    if field == 'config':
-                        # For teachable machine projects, don't save config
-                        # For regular projects, save config like text recognition
-                        if update_data.type in ["image-recognition-teachable-machine", "pose-recognition-teachable-machine"] or (update_data.type is None and project.type in ["image-recognition-teachable-machine", "pose-recognition-teachable-machine"]):
-                            setattr(project, field, None)
-                        else:
-                            setattr(project, field, value)
-                    else:
-                        setattr(project, field, value)
-            
-            project.updatedAt = datetime.now(timezone.utc)
-            
-            # Update Firestore
-            project_dict = project.model_dump()
-            self.collection.document(project_id).set(project_dict)
-            
-            return project
+            return self._apply_project_update(project, update_data)
         except Exception as e:
             raise Exception(f"Failed to update project: {str(e)}")
     
+    def _apply_project_update(self, project: Project, update_data: ProjectUpdate) -> Project:
+        """Apply update fields to a loaded project and write it back"""
+        # Update fields
+        for field, value in update_data.model_dump(exclude_unset=True).items():
+            if hasattr(project, field):
+                # Special handling for config field based on project type
+                if field == 'config':
+                    # For teachable machine projects, don't save config
+                    # For regular projects, save config like text recognition
+                    if update_data.type in TEACHABLE_MACHINE_TYPES or (update_data.type is None and project.type in TEACHABLE_MACHINE_TYPES):
+                        setattr(project, field, None)
+                    else:
+                        setattr(project, field, value)
+                else:
+                    setattr(project, field, value)
+        
+        project.updatedAt = datetime.now(timezone.utc)
+        
+        # Update Firestore
+        project_dict = project.model_dump()
+        self.collection.document(project.id).set(project_dict)
+        self._invalidate_project_lists(project.student_id)
+        
+        return project
+    
     async def delete_project(self, project_id: str) -> bool:
         """Delete project by ID"""
         try:
@@ -245,6 +483,8 @@ class ProjectService:
             
             # Delete from Firestore
             self.collection.document(project_id).delete()
+            self._invalidate_project_lists(project.student_id)
+            await self._delete_project_embeddings(project_id)
             
             # TODO: Clean up associated files in GCS
             # TODO: Clean up training jobs
@@ -270,50 +510,150 @@ class ProjectService:
         except Exception as e:
             raise Exception(f"Failed to delete multiple projects: {str(e)}")
     
-    async def search_projects(self, search_query: str, filters: Dict[str, Any]) -> List[Project]:
-        """Search projects by query and filters"""
+    async def search_projects(
+        self,
+        search_query: str,
+        filters: Dict[str, Any],
+        offset: int = 0,
+        limit: int = 50
+    ) -> Tuple[List[Project], int]:
+        """Search projects by query and filters, returning one page and the total match count
+        
+        Firestore has no full-text index, so the equality filters run in Firestore, only the
+        searchable fields are fetched for matching, and full documents are read for the
+        requested page only.
+        """
         try:
-            # Extract guest session filter if present
+            # Extract guest session filter if present (without mutating the caller's dict)
+            filters = dict(filters)
             guest_session_id = filters.pop('guest_session_id', None)
             
-            # Get all projects first (in production, you'd use a search service)
-            # For guest sessions, we get all projects for that session to search through
-            all_projects = await self.get_projects(
-                limit=1000, 
-                guest_session_id=guest_session_id,
-                status=None,  # Don't filter in get_projects, we'll filter in memory
-                type=None,
-                created_by=None
-            )
+            query = self.collection
+            if guest_session_id:
+                query = query.where('student_id', '==', guest_session_id)
+            for filter_key, filter_value in filters.items():
+                query = query.where(filter_key, '==', filter_value)
+            query = query.select(['name', 'description', 'tags', 'createdAt']).limit(_SEARCH_SCAN_LIMIT)
             
-            # Apply search filter
+            # Apply search filter on the projected fields
             search_lower = search_query.lower()
-            filtered_projects = []
-            
-            for project in all_projects:
-                # Check if project matches search query
-                if (search_lower in project.name.lower() or 
-                    search_lower in project.description.lower() or
-                    any(search_lower in tag.lower() for tag in project.tags)):
-                    
-                    # Apply additional filters
-                    matches_filters = True
-                    for filter_key, filter_value in filters.items():
-                        if hasattr(project, filter_key):
-                            project_value = getattr(project, filter_key)
-                            if project_value != filter_value:
-                                matches_filters = False
-                                break
-                    
-                    if matches_filters:
-                        filtered_projects.append(project)
-            
-            return filtered_projects
+            matches = []
+            for doc in query.get():
+                data = doc.to_dict()
+                if (search_lower in (data.get('name') or '').lower() or
+                    search_lower in (data.get('description') or '').lower() or
+                    any(search_lower in str(tag).lower() for tag in data.get('tags') or [])):
+                    matches.append((data.get('createdAt') or _EPOCH, doc.reference))
+            
+            # Newest first, like the unfiltered list
+            matches.sort(key=lambda match: match[0], reverse=True)
+            page_refs = [ref for _, ref in matches[offset:offset + limit]]
+            
+            # get_all doesn't preserve order - put the page back in match order
+            snapshots = {}
+            if page_refs:
+                snapshots = {doc.id: doc for doc in gcp_clients.get_firestore_client().get_all(page_refs) if doc.exists}
+            projects = [
+                Project(**self._deserialize_project_data(snapshots[ref.id].to_dict()))
+                for ref in page_refs if ref.id in snapshots
+            ]
+            
+            return projects, len(matches)
         except Exception as e:
             raise Exception(f"Failed to search projects: {str(e)}")
     
-    async def upload_dataset(self, project_id: str, file_content: bytes, filename: str, content_type: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
-        """Upload dataset file for a project"""
+    async def stream_to_blob(self, gcs_path: str, source, content_type: str, max_bytes: int) -> int:
+        """Stream an async-readable source (an UploadFile or aiohttp response.content) into a GCS object
+        
+        The payload is never held in memory as a whole. It is streamed to a temporary object
+        and only copied over gcs_path once it has been read completely within max_bytes, so a
+        failed or oversized upload never touches an existing object at gcs_path. Raises
+        ValueError as soon as more than max_bytes have been read. Returns the size.
+        """
+        temp_blob = self.bucket.blob(f"{gcs_path}.upload-{uuid.uuid4().hex}")
+        size = 0
+        completed = False
+        
+        # UploadFiles can be read straight into a pooled buffer; other sources hand out fresh bytes
+        readinto = getattr(getattr(source, "file", None), "readinto", None)
+        buffer = _upload_buffers.acquire() if readinto is not None else None
+        
+        # Writer calls upload over the network once a chunk fills up - run them on the GCS pool
+        loop = asyncio.get_running_loop()
+        writer = temp_blob.open("wb", content_type=content_type, chunk_size=settings.gcs_chunk_size)
+        try:
+            while True:
+                if buffer is not None:
+                    count = await loop.run_in_executor(None, readinto, buffer)
+                    chunk = memoryview(buffer)[:count]
+                else:
+                    chunk = await source.read(_UPLOAD_READ_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB.")
+                # BlobWriter copies into its own buffer, so the pooled one is free again after this
+                await gcs_call(writer.write, chunk)
+            
+            # Only a fully read upload is finalized; closing commits the temporary object
+            await gcs_call(writer.close)
+            await gcs_call(self.bucket.copy_blob, temp_blob, self.bucket, gcs_path)
+            completed = True
+        finally:
+            if buffer is not None:
+                _upload_buffers.release(buffer)
+            if not completed:
+                # The writer is abandoned, not closed: an unfinalized resumable upload never becomes an object
+                logger.warning(f"Upload to {gcs_path} did not complete, discarding {temp_blob.name}")
+            await self._discard_temp_blob(temp_blob)
+        
+        return size
+    
+    async def _discard_temp_blob(self, temp_blob):
+        """Best-effort removal of a temporary upload object (it may never have been created)"""
+        try:
+            await gcs_call(temp_blob.delete)
+        except NotFound:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to remove temporary upload {temp_blob.name}: {str(e)}")
+    
+    async def upload_spooled_file(self, gcs_path: str, upload, content_type: str, max_bytes: int) -> int:
+        """Upload an UploadFile whose size is already known straight from its spooled file
+        
+        The GCS client reads upload.file itself, so the payload is never copied into Python
+        bytes, and an object already holding identical bytes (same CRC32C) is left alone.
+        Raises ValueError if the file is larger than max_bytes. Returns the size.
+        """
+        size = upload.size
+        if size > max_bytes:
+            raise ValueError(f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB.")
+        
+        loop = asyncio.get_running_loop()
+        await upload.seek(0)
+        crc32c = await loop.run_in_executor(None, _crc32c_of, upload.file)
+        
+        # Re-uploading an unchanged file is common while iterating - skip the PUT when GCS has these bytes
+        existing = await gcs_call(self.bucket.get_blob, gcs_path)
+        if existing is not None and existing.crc32c == crc32c and existing.size == size and existing.content_type == content_type:
+            logger.info(f"♻️ {gcs_path} unchanged (crc32c {crc32c}), skipping upload")
+            return size
+        
+        # A chunk size makes this a resumable upload sent (and retried) in chunk-sized pieces;
+        # GCS verifies the stored object against the CRC32C computed while sending
+        blob = self.bucket.blob(gcs_path, chunk_size=settings.gcs_chunk_size)
+        await gcs_call(
+            blob.upload_from_file, upload.file,
+            content_type=content_type, size=size, rewind=False, checksum="crc32c"
+        )
+        return size
+    
+    async def upload_dataset(self, project_id: str, source, filename: str, content_type: str, metadata: Dict[str, Any], max_bytes: int) -> Dict[str, Any]:
+        """Upload dataset file for a project from an UploadFile or other async-readable source
+        
+        Raises ValueError if the file is larger than max_bytes.
+        """
         try:
             # Get project
             project = await self.get_project(project_id)
@@ -323,13 +663,15 @@ class ProjectService:
             # Generate GCS path
             gcs_path = f"datasets/{project_id}/{filename}"
             
-            # Upload to GCS
-            blob = self.bucket.blob(gcs_path)
-            blob.upload_from_string(file_content, content_type=content_type)
+            # Upload to GCS - straight from the spool when the size is known, streamed otherwise
+            if getattr(source, "size", None) is not None:
+                size = await self.upload_spooled_file(gcs_path, source, content_type, max_bytes)
+            else:
+                size = await self.stream_to_blob(gcs_path, source, content_type, max_bytes)
             
             # Update project dataset
             project.dataset.filename = filename
-            project.dataset.size = len(file_content)
+            project.dataset.size = size
             project.dataset.uploadedAt = datetime.now(timezone.utc)
             project.dataset.gcsPath = f"gs://{self.bucket.name}/{gcs_path}"
             
@@ -342,11 +684,14 @@ class ProjectService:
             # Update Firestore
             project_dict = project.model_dump()
             self.collection.document(project_id).set(project_dict)
+            self._invalidate_project_lists(project.student_id)
             
             return {
                 'success': True,
                 'gcsPath': project.dataset.gcsPath
             }
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Failed to upload dataset: {str(e)}")
     
@@ -373,32 +718,19 @@ class ProjectService:
                     )
                     project.dataset.examples.append(example)
             
-            # Update labels list with stable ordering (new labels at top, existing order preserved)
-            existing_labels = project.dataset.labels or []
-            new_labels = [example.label for example in project.dataset.examples]
-            
-            # Create ordered labels: new labels first (in order of appearance), then existing labels
-            ordered_labels = []
-            seen_labels = set()
-            
-            # Add new labels first (in order of appearance in examples)
-            for label in new_labels:
-                if label not in seen_labels:
-                    ordered_labels.append(label)
-                    seen_labels.add(label)
-            
-            # Add existing labels that weren't in new labels (preserving their order)
-            for label in existing_labels:
-                if label not in seen_labels:
-                    ordered_labels.append(label)
-                    seen_labels.add(label)
-            
-            project.dataset.labels = ordered_labels
+            # Update labels list with stable ordering (new labels at top, existing order preserved):
+            # example labels in order of first appearance - the label index keys - then any
+            # existing labels not seen yet (update() keeps a repeated key where it already is)
+            ordered_labels = dict.fromkeys(project.dataset.label_index())
+            ordered_labels.update(dict.fromkeys(project.dataset.labels or []))
+            
+            project.dataset.labels = list(ordered_labels)
             project.dataset.records = len(project.dataset.examples)
             
             # Update Firestore
             project_dict = project.model_dump()
             self.collection.document(project_id).set(project_dict)
+            self._invalidate_project_lists(project.student_id)
             
             return {
                 'totalExamples': len(project.dataset.examples),
@@ -441,34 +773,13 @@ class ProjectService:
             
             # Update labels list with stable ordering (new labels at top, existing order preserved)
             # IMPORTANT: Preserve empty labels even if they have no examples
-            existing_labels = project.dataset.labels or []
-            new_text_labels = [example.label for example in project.dataset.examples]
-            new_image_labels = [example.label for example in project.dataset.image_examples]
-            
-            # Create ordered labels: new labels first (in order of appearance), then existing labels
-            ordered_labels = []
-            seen_labels = set()
-            
-            # Add new image labels first (in order of appearance in examples)
-            for label in new_image_labels:
-                if label not in seen_labels:
-                    ordered_labels.append(label)
-                    seen_labels.add(label)
-            
-            # Add new text labels (in order of appearance in examples)
-            for label in new_text_labels:
-                if label not in seen_labels:
-                    ordered_labels.append(label)
-                    seen_labels.add(label)
-            
-            # Add existing labels that weren't in new labels (preserving their order)
-            # This preserves empty labels even when they have no examples
-            for label in existing_labels:
-                if label not in seen_labels:
-                    ordered_labels.append(label)
-                    seen_labels.add(label)
-            
-            project.dataset.labels = ordered_labels
+            # Image labels first, then text labels (the label index keys), each in order of
+            # appearance, then existing labels not seen yet - this keeps empty labels
+            ordered_labels = dict.fromkeys([example.label for example in project.dataset.image_examples])
+            ordered_labels.update(dict.fromkeys(project.dataset.label_index()))
+            ordered_labels.update(dict.fromkeys(project.dataset.labels or []))
+            
+            project.dataset.labels = list(ordered_labels)
             
             # Update records count (total examples)
             project.dataset.records = len(project.dataset.examples) + len(project.dataset.image_examples)
@@ -476,6 +787,7 @@ class ProjectService:
             # Update Firestore
             project_dict = project.model_dump()
             self.collection.document(project_id).set(project_dict)
+            self._invalidate_project_lists(project.student_id)
             
             return {
                 'totalImages': len(project.dataset.image_examples),
@@ -502,7 +814,75 @@ class ProjectService:
         try:
             project.updatedAt = datetime.now(timezone.utc)
             project_dict = project.model_dump()
-            self.collection.document(project.id).set(project_dict)
+            write_result = self.collection.document(project.id).set(project_dict)
+            self._invalidate_project_lists(project.student_id)
+            self._cache_project(project, write_result.update_time)
             return project
         except Exception as e:
-            raise Exception(f"Failed to save project: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Failed to save project: {str(e)}")
+    
+    async def pull_examples(
+        self, project_id: str, label: str, position: Optional[int] = None, remove_label: bool = False
+    ) -> Tuple[int, int]:
+        """Remove a label's text examples (or only its position-th one) with a targeted update
+        
+        Only the examples array and counters are written, not the whole project, inside a
+        transaction so concurrent deletes cannot overwrite each other. With remove_label the
+        label is dropped from dataset.labels as well.
+        Returns (examples removed, examples now stored).
+        """
+        doc_ref = self.collection.document(project_id)
+        
+        @firestore.transactional
+        def _pull(transaction) -> Tuple[int, int, Optional[str]]:
+            snapshot = doc_ref.get(field_paths=['dataset.examples', 'student_id'], transaction=transaction)
+            if not snapshot.exists:
+                raise Exception("Project not found")
+            data = snapshot.to_dict() or {}
+            stored = (data.get('dataset') or {}).get('examples') or []
+            updates: Dict[str, Any] = {'updatedAt': datetime.now(timezone.utc)}
+            
+            if position is None:
+                # ArrayRemove matches whole stored maps, so pull the raw entries just read;
+                # every entry with the label goes, duplicates included
+                matching = [ex for ex in stored if isinstance(ex, dict) and ex.get('label') == label]
+                removed = len(matching)
+                if matching:
+                    updates['dataset.examples'] = firestore.ArrayRemove(matching)
+            else:
+                # ArrayRemove would also drop identical duplicates, so pop exactly this one
+                # entry and write the list back
+                positions = [i for i, ex in enumerate(stored) if isinstance(ex, dict) and ex.get('label') == label]
+                removed = 0
+                if 0 <= position < len(positions):
+                    stored.pop(positions[position])
+                    removed = 1
+                    updates['dataset.examples'] = stored
+            
+            remaining = len(stored) if position is not None else len(stored) - removed
+            if removed:
+                updates['dataset.records'] = remaining
+            if remove_label:
+                updates['dataset.labels'] = firestore.ArrayRemove([label])
+            transaction.update(doc_ref, updates)
+            return removed, remaining, data.get('student_id')
+        
+        try:
+            # The sync client blocks for the whole read-write, so keep it off the event loop
+            removed, remaining, student_id = await asyncio.to_thread(_pull, gcp_clients.get_firestore_client().transaction())
+            self._invalidate_project_lists(student_id)
+            return removed, remaining
+        except Exception as e:
+            raise Exception(f"Failed to remove examples: {str(e)}")
+
+
+# Global instance
+_project_service: Optional[ProjectService] = None
+
+
+def get_project_service() -> ProjectService:
+    """Get or create singleton ProjectService instance"""
+    global _project_service
+    if _project_service is None:
+        _project_service = ProjectService()
+    return _project_service
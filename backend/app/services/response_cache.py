@@ -0,0 +1,83 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+
+class ResponseCache:
+    """
+    Small in-process TTL cache for serialized JSON responses.
+
+    Each entry stores the encoded body together with its ETag so handlers can
+    answer conditional requests without touching Firestore or re-serializing.
+    Entries are tagged (e.g. with a classroom_id) so related responses can be
+    dropped together when the underlying data changes.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl_seconds: int = 60):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        """Return (etag, body) for a live entry, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry["stored_at"] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return entry["etag"], entry["body"]
+
+    def put(self, key: str, payload: Any, tag: Optional[str] = None) -> Tuple[str, bytes]:
+        """Serialize and cache a payload, returning its (etag, body)"""
+        # orjson handles plain JSON natively; jsonable_encoder only sees what it can't
+        # (models, datetime subclasses such as Firestore timestamps)
+        body = orjson.dumps(payload, default=jsonable_encoder)
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        with self._lock:
+            self._entries[key] = {"etag": etag, "body": body, "tag": tag, "stored_at": time.monotonic()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return etag, body
+
+    def invalidate(self, tag: str):
+        """Drop every entry carrying the given tag"""
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry["tag"] == tag]:
+                self._entries.pop(key, None)
+
+
+# Global instance
+_classroom_response_cache: Optional[ResponseCache] = None
+
+
+def get_classroom_response_cache() -> ResponseCache:
+    """Get or create singleton ResponseCache instance for classroom reads"""
+    global _classroom_response_cache
+    if _classroom_response_cache is None:
+        _classroom_response_cache = ResponseCache(maxsize=1000, ttl_seconds=60)
+    return _classroom_response_cache
+
+
+_guest_projects_response_cache: Optional[ResponseCache] = None
+
+
+def get_guest_projects_response_cache() -> ResponseCache:
+    """Get or create singleton ResponseCache instance for guest project list pages
+    
+    Invalidation only reaches this process, and a session's writes may land on another
+    instance, so entries live just long enough to absorb a burst of repeated polls.
+    """
+    global _guest_projects_response_cache
+    if _guest_projects_response_cache is None:
+        _guest_projects_response_cache = ResponseCache(maxsize=1000, ttl_seconds=2)
+    return _guest_projects_response_cache
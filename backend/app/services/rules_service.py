@@ -1,25 +1,65 @@
 import uuid
+import time
 import logging
 import re
 import json
+import threading
 from datetime import datetime, timezone
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, NamedTuple, Tuple
 from google.cloud import firestore
 
 from ..models import Rule, RuleSaveRequest, RuleCondition, RuleAction, RuleMatchType
 from ..config import gcp_clients
-from .agent_service import AgentService
+from .agent_service import get_agent_service
 
 logger = logging.getLogger(__name__)
 
 # Import for LLM-based matching
 try:
-    from .vertex_ai_service import VertexAIService
+    from .vertex_ai_service import get_vertex_ai_service
     LLM_AVAILABLE = True
 except ImportError:
     LLM_AVAILABLE = False
     logger.warning("⚠️ VertexAIService not available - LLM rule matching disabled")
 
+# Condition predicates take (message, message_lower, context)
+ConditionPredicate = Callable[[str, str, Dict[str, Any]], bool]
+
+_WANTS_FILLER_WORDS = frozenset({'talk', 'about', 'discuss', 'know', 'learn', 'get', 'find', 'see', 'buy', 'purchase', 'order'})
+_TALKS_FILLER_WORDS = frozenset({'about', 'the', 'a', 'an', 'some', 'any'})
+_QUESTION_MARKERS = ('?', 'what', 'how', 'why', 'when', 'where', 'who', 'which', 'can', 'could', 'would', 'should')
+
+_NEGATIVE_WORDS = ('negative', 'angry', 'anger', 'frustrated', 'frustrating', 'upset', 'mad', 'annoyed', 'irritated', 'sad', 'unhappy', 'disappointed', 'scolding', 'rude', 'hostile', 'aggressive', 'hate', 'stupid', 'bad', 'terrible', 'awful', 'worst')
+_POSITIVE_WORDS = ('positive', 'happy', 'glad', 'pleased', 'satisfied', 'excited', 'joyful', 'grateful', 'thankful', 'love', 'great', 'wonderful', 'amazing', 'excellent', 'good', 'nice', 'fantastic', 'awesome')
+_NEUTRAL_WORDS = ('neutral', 'okay', 'ok', 'fine', 'normal', 'indifferent')
+_DETECTED_NEGATIVE = frozenset({'negative', 'angry', 'frustrated', 'sad', 'upset'})
+_DETECTED_POSITIVE = frozenset({'positive', 'happy', 'satisfied', 'excited'})
+_DETECTED_NEUTRAL = frozenset({'neutral', 'mixed'})
+
+_EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+_PHONE_RE = re.compile(r'[\+]?[(]?[0-9]{1,3}[)]?[-\s\.]?[(]?[0-9]{1,4}[)]?[-\s\.]?[0-9]{1,4}[-\s\.]?[0-9]{1,9}')
+_NAME_RES = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r"my name is\s+([A-Z][a-z]+)",
+    r"i am\s+([A-Z][a-z]+)",
+    r"i'm\s+([A-Z][a-z]+)",
+    r"call me\s+([A-Z][a-z]+)"
+))
+
+# How long compiled rules are trusted before re-reading Firestore (covers edits made on other instances)
+_COMPILED_RULES_TTL_SECONDS = 60
+
+
+class _CompiledRule(NamedTuple):
+    rule: Rule
+    conditions: Tuple[Tuple[RuleCondition, ConditionPredicate], ...]
+    match_all: bool
+
+
+class _CompiledRuleSet(NamedTuple):
+    rules: List[Rule]
+    compiled: Tuple[_CompiledRule, ...]
+    loaded_at: float
+
 
 class RulesService:
     """Service layer for rules management with multiple conditions and actions support"""
@@ -53,6 +93,8 @@ class RulesService:
         self._rules_collection = None
         self._vertex_ai = None
         self._agent_service = None
+        self._compiled_rules: Dict[str, _CompiledRuleSet] = {}
+        self._compiled_rules_lock = threading.Lock()
         self._initialized = False
     
     def _ensure_initialized(self):
@@ -70,7 +112,7 @@ class RulesService:
             # Initialize LLM service for smart rule matching
             if LLM_AVAILABLE:
                 try:
-                    self._vertex_ai = VertexAIService(self._project_id)
+                    self._vertex_ai = get_vertex_ai_service(self._project_id)
                     logger.info("✅ RulesService initialized with LLM-based matching")
                 except Exception as e:
                     logger.warning(f"⚠️ Failed to initialize VertexAI for rules: {e}")
@@ -79,7 +121,7 @@ class RulesService:
                 logger.info("✅ RulesService initialized with code-based matching only")
             
             # Initialize Agent Service for loading settings
-            self._agent_service = AgentService()
+            self._agent_service = get_agent_service()
             
             self._initialized = True
         except Exception as e:
@@ -171,6 +213,7 @@ class RulesService:
             # Save to Firestore (set with merge to preserve existing fields during update)
             rule_ref = self.rules_collection.document(rule_id)
             rule_ref.set(rule_data, merge=is_update)
+            self.invalidate_compiled_rules(request.agent_id)
             
             logger.info(f"✅ Rule saved: {rule_id} with {len(request.conditions)} conditions and {len(request.actions)} actions")
             
@@ -286,6 +329,7 @@ class RulesService:
         try:
             rule_ref = self.rules_collection.document(rule_id)
             rule_ref.delete()
+            self.invalidate_compiled_rules()
             
             logger.info(f"✅ Rule deleted: {rule_id}")
             return True
@@ -302,6 +346,7 @@ class RulesService:
                 "active": active,
                 "updated_at": datetime.now(timezone.utc)
             })
+            self.invalidate_compiled_rules()
             
             status = "enabled" if active else "disabled"
             logger.info(f"✅ Rule {rule_id} {status}")
@@ -311,6 +356,35 @@ class RulesService:
             logger.error(f"❌ Failed to update rule status: {e}")
             raise Exception(f"Failed to update rule status: {str(e)}")
     
+    def invalidate_compiled_rules(self, agent_id: Optional[str] = None):
+        """Drop compiled rules for an agent, or for all agents if agent_id is None"""
+        with self._compiled_rules_lock:
+            if agent_id is None:
+                self._compiled_rules.clear()
+            else:
+                self._compiled_rules.pop(agent_id, None)
+    
+    def _get_compiled_rules(self, agent_id: str) -> _CompiledRuleSet:
+        """Get an agent's rules with their conditions compiled to predicates, cached per agent"""
+        with self._compiled_rules_lock:
+            cached = self._compiled_rules.get(agent_id)
+        if cached and time.monotonic() - cached.loaded_at < _COMPILED_RULES_TTL_SECONDS:
+            return cached
+        
+        rules = self.get_rules(agent_id)
+        compiled = tuple(
+            _CompiledRule(
+                rule=rule,
+                conditions=tuple((c, self._compile_condition(c)) for c in rule.conditions),
+                match_all=rule.match_type == RuleMatchType.ALL
+            )
+            for rule in rules
+        )
+        rule_set = _CompiledRuleSet(rules=rules, compiled=compiled, loaded_at=time.monotonic())
+        with self._compiled_rules_lock:
+            self._compiled_rules[agent_id] = rule_set
+        return rule_set
+    
     def evaluate_rules(self, agent_id: str, message: str, context: Dict[str, Any]) -> Optional[Rule]:
         """
         Evaluate rules against message and context using LLM-based matching.
@@ -324,7 +398,8 @@ class RulesService:
         - entities: list - extracted entities
         """
         try:
-            rules = self.get_rules(agent_id)
+            rule_set = self._get_compiled_rules(agent_id)
+            rules = rule_set.rules
             
             if not rules:
                 logger.info("📋 No rules configured for this agent")
@@ -342,10 +417,11 @@ class RulesService:
                 logger.info("🤖 LLM found no matching rules, trying code-based fallback...")
             
             # Fallback to code-based matching
-            for rule in rules:
-                if self._rule_matches(rule, message, context):
-                    logger.info(f"✅ Rule matched (code-based): {rule.rule_id}")
-                    return rule
+            message_lower = message.lower()
+            for compiled_rule in rule_set.compiled:
+                if self._rule_matches(compiled_rule, message, message_lower, context):
+                    logger.info(f"✅ Rule matched (code-based): {compiled_rule.rule.rule_id}")
+                    return compiled_rule.rule
             
             return None
             
@@ -448,24 +524,24 @@ Return 0 for matched_rule if no rule clearly applies. Be smart about matching -
             logger.error(f"❌ LLM rule matching failed: {e}")
             return None
     
-    def _rule_matches(self, rule: Rule, message: str, context: Dict[str, Any]) -> bool:
-        """Check if a rule matches the message and context"""
+    def _rule_matches(self, compiled_rule: _CompiledRule, message: str, message_lower: str, context: Dict[str, Any]) -> bool:
+        """Check if a compiled rule matches the message and context"""
+        rule = compiled_rule.rule
         try:
             logger.info(f"🔎 Evaluating rule '{rule.name}' (ID: {rule.rule_id}) against message: '{message[:50]}...'")
             condition_results = []
             
-            for condition in rule.conditions:
-                matched = self._evaluate_condition(condition, message, context)
+            for condition, predicate in compiled_rule.conditions:
+                try:
+                    matched = predicate(message, message_lower, context)
+                except Exception as e:
+                    logger.error(f"❌ Condition evaluation failed: {e}")
+                    matched = False
                 condition_results.append(matched)
                 logger.info(f"   └─ Condition '{condition.type}': '{condition.value}' → {'✓ MATCH' if matched else '✗ NO MATCH'}")
             
-            # Apply match type logic
-            if rule.match_type == RuleMatchType.ALL:
-                # All conditions must match (AND logic)
-                final_match = all(condition_results)
-            else:
-                # Any condition can match (OR logic)
-                final_match = any(condition_results)
+            # Apply match type logic: ALL = AND, ANY = OR
+            final_match = all(condition_results) if compiled_rule.match_all else any(condition_results)
             
             logger.info(f"   └─ Match type: {rule.match_type}, Final result: {'✓ RULE MATCHES' if final_match else '✗ RULE DOES NOT MATCH'}")
             return final_match
@@ -474,163 +550,107 @@ Return 0 for matched_rule if no rule clearly applies. Be smart about matching -
             logger.error(f"❌ Rule matching failed: {e}")
             return False
 
-    def _evaluate_condition(self, condition: RuleCondition, message: str, context: Dict[str, Any]) -> bool:
-        """Evaluate a single condition against the message and context"""
-        try:
-            condition_type = condition.type
-            condition_value = condition.value.lower() if condition.value else ""
-            message_lower = message.lower()
-            
-            if condition_type == "Conversation starts":
-                # Check if this is the first message in the conversation
-                return context.get("is_conversation_start", False)
+    def _compile_condition(self, condition: RuleCondition) -> ConditionPredicate:
+        """
+        Compile a condition into a predicate. Everything that depends only on the
+        rule (lowercasing, keyword sets, regexes) is computed once here.
+        """
+        condition_type = condition.type
+        condition_value = condition.value.lower() if condition.value else ""
+        
+        if condition_type == "Conversation starts":
+            # Check if this is the first message in the conversation
+            return lambda message, message_lower, context: context.get("is_conversation_start", False)
+        
+        if condition_type == "User wants to":
+            # Check if user's intent matches; key topic words are the condition
+            # minus filler words (e.g., "talk about saree" → "saree")
+            key_words = frozenset(condition_value.split()) - _WANTS_FILLER_WORDS
+            fuzzy = self._compile_fuzzy_match(condition_value)
             
-            elif condition_type == "User wants to":
-                # Check if user's intent matches
-                # Extract key topic words from condition value (e.g., "talk about saree" → "saree")
+            def wants_to(message: str, message_lower: str, context: Dict[str, Any]) -> bool:
                 detected_intent = context.get("intent", {}).get("intent", "").lower()
-                
-                # Remove common filler words to get the key topic
-                filler_words = {'talk', 'about', 'discuss', 'know', 'learn', 'get', 'find', 'see', 'buy', 'purchase', 'order'}
-                condition_words = set(condition_value.split())
-                key_words = condition_words - filler_words
-                
-                # Check if any key word is in message
-                key_topic_match = any(word in message_lower for word in key_words) if key_words else False
-                
-                logger.info(f"🔍 'User wants to' check: condition='{condition_value}', key_words={key_words}, message contains key={key_topic_match}")
-                
                 return (
                     condition_value in detected_intent or
                     condition_value in message_lower or
-                    key_topic_match or  # Match if key topic word is present
-                    self._fuzzy_match(condition_value, message_lower)
+                    any(word in message_lower for word in key_words) or  # Match if key topic word is present
+                    fuzzy(message_lower)
                 )
+            return wants_to
+        
+        if condition_type == "User talks about":
+            # Check if user mentions a topic - direct, key word or word-boundary match
+            key_words = frozenset(condition_value.split()) - _TALKS_FILLER_WORDS
+            topic_re = re.compile(r'\b' + re.escape(condition_value) + r'\b', re.IGNORECASE)
             
-            elif condition_type == "User talks about":
-                # Check if user mentions a topic - more flexible matching
-                # Also extract key words from multi-word conditions
-                condition_words = set(condition_value.split())
-                filler_words = {'about', 'the', 'a', 'an', 'some', 'any'}
-                key_words = condition_words - filler_words
-                
-                # Check direct match or key word match
-                direct_match = condition_value in message_lower
-                key_word_match = any(word in message_lower for word in key_words) if key_words else False
-                topic_match = self._topic_match(condition_value, message_lower)
-                
-                result = direct_match or key_word_match or topic_match
-                logger.info(f"🔍 'User talks about' check: topic='{condition_value}', key_words={key_words}, direct={direct_match}, key_word={key_word_match}, topic={topic_match}, result={result}")
-                
-                return result
-            
-            elif condition_type == "User asks about":
-                # Check if user is asking about something
-                is_question = any(q in message_lower for q in ['?', 'what', 'how', 'why', 'when', 'where', 'who', 'which', 'can', 'could', 'would', 'should'])
-                return is_question and condition_value in message_lower
+            def talks_about(message: str, message_lower: str, context: Dict[str, Any]) -> bool:
+                return (
+                    condition_value in message_lower or
+                    any(word in message_lower for word in key_words) or
+                    topic_re.search(message_lower) is not None
+                )
+            return talks_about
+        
+        if condition_type == "User asks about":
+            # Check if user is asking about something
+            return lambda message, message_lower, context: (
+                condition_value in message_lower and
+                any(q in message_lower for q in _QUESTION_MARKERS)
+            )
+        
+        if condition_type == "User sentiment is":
+            # Map the condition's sentiment expression to a category once
+            condition_is_negative = any(word in condition_value for word in _NEGATIVE_WORDS)
+            condition_is_positive = any(word in condition_value for word in _POSITIVE_WORDS)
+            condition_is_neutral = any(word in condition_value for word in _NEUTRAL_WORDS)
             
-            elif condition_type == "User sentiment is":
-                # Check if sentiment matches - with flexible matching
+            def sentiment_is(message: str, message_lower: str, context: Dict[str, Any]) -> bool:
                 detected_sentiment = context.get("sentiment", {}).get("sentiment", "").lower()
-                condition_lower = condition_value.lower()
-                
-                # Map various sentiment expressions to standard categories
-                negative_words = {'negative', 'angry', 'anger', 'frustrated', 'frustrating', 'upset', 'mad', 'annoyed', 'irritated', 'sad', 'unhappy', 'disappointed', 'scolding', 'rude', 'hostile', 'aggressive', 'hate', 'stupid', 'bad', 'terrible', 'awful', 'worst'}
-                positive_words = {'positive', 'happy', 'glad', 'pleased', 'satisfied', 'excited', 'joyful', 'grateful', 'thankful', 'love', 'great', 'wonderful', 'amazing', 'excellent', 'good', 'nice', 'fantastic', 'awesome'}
-                neutral_words = {'neutral', 'okay', 'ok', 'fine', 'normal', 'indifferent'}
-                
-                # Check if condition contains negative/positive/neutral sentiment words
-                condition_is_negative = any(word in condition_lower for word in negative_words)
-                condition_is_positive = any(word in condition_lower for word in positive_words)
-                condition_is_neutral = any(word in condition_lower for word in neutral_words)
-                
-                # Check detected sentiment category
-                detected_is_negative = detected_sentiment in ['negative', 'angry', 'frustrated', 'sad', 'upset']
-                detected_is_positive = detected_sentiment in ['positive', 'happy', 'satisfied', 'excited']
-                detected_is_neutral = detected_sentiment in ['neutral', 'mixed']
-                
-                # Match if categories align
-                category_match = (
-                    (condition_is_negative and detected_is_negative) or
-                    (condition_is_positive and detected_is_positive) or
-                    (condition_is_neutral and detected_is_neutral)
+                # Match if categories align, or on a direct match
+                return (
+                    (condition_is_negative and detected_sentiment in _DETECTED_NEGATIVE) or
+                    (condition_is_positive and detected_sentiment in _DETECTED_POSITIVE) or
+                    (condition_is_neutral and detected_sentiment in _DETECTED_NEUTRAL) or
+                    condition_value in detected_sentiment
                 )
-                
-                # Also check direct match
-                direct_match = condition_value in detected_sentiment or detected_sentiment == condition_value
-                
-                result = category_match or direct_match
-                logger.info(f"🔍 'User sentiment is' check: condition='{condition_value}', detected='{detected_sentiment}', condition_negative={condition_is_negative}, detected_negative={detected_is_negative}, result={result}")
-                
-                return result
-            
-            elif condition_type == "User provides":
-                # Check if user provides specific information (email, phone, name, etc.)
-                return self._check_user_provides(condition_value, message)
-            
-            elif condition_type == "The sentence contains":
-                # Simple keyword/phrase matching
-                return condition_value in message_lower
-            
-            return False
-            
-        except Exception as e:
-            logger.error(f"❌ Condition evaluation failed: {e}")
-            return False
-    
-    def _fuzzy_match(self, target: str, text: str, threshold: float = 0.7) -> bool:
-        """Simple fuzzy matching using word overlap"""
-        target_words = set(target.split())
-        text_words = set(text.split())
+            return sentiment_is
         
-        if not target_words:
-            return False
+        if condition_type == "User provides":
+            # Check if user provides specific information (email, phone, name, etc.)
+            return self._compile_user_provides(condition_value)
         
-        overlap = len(target_words & text_words)
-        return (overlap / len(target_words)) >= threshold
-    
-    def _topic_match(self, topic: str, text: str) -> bool:
-        """Check if a topic is mentioned in text using various matching strategies"""
-        # Direct match
-        if topic in text:
-            return True
+        if condition_type == "The sentence contains":
+            # Simple keyword/phrase matching
+            return lambda message, message_lower, context: condition_value in message_lower
         
-        # Word boundary match
-        pattern = r'\b' + re.escape(topic) + r'\b'
-        if re.search(pattern, text, re.IGNORECASE):
-            return True
+        return lambda message, message_lower, context: False
+    
+    def _compile_fuzzy_match(self, target: str, threshold: float = 0.7) -> Callable[[str], bool]:
+        """Simple fuzzy matching using word overlap"""
+        target_words = frozenset(target.split())
+        if not target_words:
+            return lambda text: False
         
-        return False
+        required = threshold * len(target_words)
+        return lambda text: len(target_words.intersection(text.split())) >= required
     
-    def _check_user_provides(self, info_type: str, message: str) -> bool:
+    def _compile_user_provides(self, info_type: str) -> ConditionPredicate:
         """Check if user provides specific type of information"""
-        info_type_lower = info_type.lower()
-        
         # Email detection
-        if 'email' in info_type_lower:
-            email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-            return bool(re.search(email_pattern, message))
+        if 'email' in info_type:
+            return lambda message, message_lower, context: _EMAIL_RE.search(message) is not None
         
         # Phone detection
-        if 'phone' in info_type_lower or 'number' in info_type_lower:
-            phone_pattern = r'[\+]?[(]?[0-9]{1,3}[)]?[-\s\.]?[(]?[0-9]{1,4}[)]?[-\s\.]?[0-9]{1,4}[-\s\.]?[0-9]{1,9}'
-            return bool(re.search(phone_pattern, message))
+        if 'phone' in info_type or 'number' in info_type:
+            return lambda message, message_lower, context: _PHONE_RE.search(message) is not None
         
-        # Name detection (capitalized words)
-        if 'name' in info_type_lower:
-            # Look for "my name is X" or "I am X" patterns
-            name_patterns = [
-                r"my name is\s+([A-Z][a-z]+)",
-                r"i am\s+([A-Z][a-z]+)",
-                r"i'm\s+([A-Z][a-z]+)",
-                r"call me\s+([A-Z][a-z]+)"
-            ]
-            for pattern in name_patterns:
-                if re.search(pattern, message, re.IGNORECASE):
-                    return True
+        # Name detection - "my name is X" or "I am X" patterns
+        name_patterns = _NAME_RES if 'name' in info_type else ()
         
         # Generic - check if the info_type keyword appears
-        return info_type_lower in message.lower()
+        return lambda message, message_lower, context: (
+            any(pattern.search(message) for pattern in name_patterns) or info_type in message_lower
+        )
     
     def execute_actions(self, rule: Rule, message: str, context: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -700,3 +720,15 @@ Return 0 for matched_rule if no rule clearly applies. Be smart about matching -
         except Exception as e:
             logger.error(f"❌ Failed to execute actions: {e}")
             return results
+
+
+# Global instance
+_rules_service: Optional[RulesService] = None
+
+
+def get_rules_service() -> RulesService:
+    """Get or create singleton RulesService instance"""
+    global _rules_service
+    if _rules_service is None:
+        _rules_service = RulesService()
+    return _rules_service
@@ -0,0 +1,120 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _AgentIndex:
+    """Flat inner-product index over L2-normalized embeddings for one agent"""
+
+    def __init__(self):
+        self.vectors: Optional[np.ndarray] = None
+        self.entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.rows: List[int] = []
+        self.next_id = 0
+
+
+class SemanticCache:
+    """
+    In-process semantic cache for chat responses.
+
+    Entries are scoped per agent so personas never share answers. A lookup
+    returns the cached payload when the cosine similarity between the query
+    embedding and a cached embedding is at least `threshold`.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries_per_agent: int = 500, ttl_seconds: int = 3600):
+        self.threshold = threshold
+        self.max_entries_per_agent = max_entries_per_agent
+        self.ttl_seconds = ttl_seconds
+        self._indexes: Dict[str, _AgentIndex] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if vec.ndim != 1 or norm == 0:
+            return None
+        return vec / norm
+
+    def _remove(self, index: _AgentIndex, entry_id: int):
+        row = index.rows.index(entry_id)
+        index.rows.pop(row)
+        index.entries.pop(entry_id, None)
+        index.vectors = np.delete(index.vectors, row, axis=0) if index.rows else None
+
+    def lookup(self, agent_id: str, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """Return the cached payload for the nearest neighbour above threshold"""
+        query = self._normalize(embedding)
+        if query is None:
+            return None
+
+        with self._lock:
+            index = self._indexes.get(agent_id)
+            if index is None or index.vectors is None:
+                return None
+            if index.vectors.shape[1] != query.shape[0]:
+                # Embedding model changed for this agent - old entries are unusable
+                self._indexes.pop(agent_id, None)
+                return None
+
+            scores = index.vectors @ query
+            row = int(np.argmax(scores))
+            score = float(scores[row])
+            if score < self.threshold:
+                return None
+
+            entry_id = index.rows[row]
+            entry = index.entries[entry_id]
+            if time.monotonic() - entry["stored_at"] > self.ttl_seconds:
+                self._remove(index, entry_id)
+                return None
+
+            index.entries.move_to_end(entry_id)
+            logger.info(f"⚡ Semantic cache hit for agent {agent_id} (similarity: {score:.3f})")
+            return {**entry["payload"], "similarity": score}
+
+    def store(self, agent_id: str, embedding: List[float], payload: Dict[str, Any]):
+        """Cache a payload under the given query embedding"""
+        vec = self._normalize(embedding)
+        if vec is None:
+            return
+
+        with self._lock:
+            index = self._indexes.setdefault(agent_id, _AgentIndex())
+            if index.vectors is not None and index.vectors.shape[1] != vec.shape[0]:
+                index = self._indexes[agent_id] = _AgentIndex()
+
+            entry_id = index.next_id
+            index.next_id += 1
+            index.entries[entry_id] = {"payload": payload, "stored_at": time.monotonic()}
+            index.rows.append(entry_id)
+            index.vectors = vec[np.newaxis, :] if index.vectors is None else np.vstack([index.vectors, vec])
+
+            # Evict least recently used entries once the agent is over budget
+            while len(index.entries) > self.max_entries_per_agent:
+                oldest_id = next(iter(index.entries))
+                self._remove(index, oldest_id)
+
+    def invalidate(self, agent_id: str):
+        """Drop all cached responses for an agent (e.g. after its knowledge changes)"""
+        with self._lock:
+            self._indexes.pop(agent_id, None)
+
+
+# Global instance
+_semantic_cache: Optional[SemanticCache] = None
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Get or create singleton SemanticCache instance"""
+    global _semantic_cache
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache()
+    return _semantic_cache
@@ -5,6 +5,7 @@ from google.cloud import firestore
 
 from ..models import Student, StudentJoin
 from ..config import gcp_clients
+from .response_cache import get_classroom_response_cache
 
 
 class StudentService:
@@ -47,6 +48,7 @@ class StudentService:
             
             # Add student to classroom's students array
             await self._add_student_to_classroom(teacher_id, classroom_id, student_id)
+            get_classroom_response_cache().invalidate(classroom_id)
             
             return student
             
@@ -133,24 +135,46 @@ class StudentService:
             projects_query = self.projects_collection.where('createdBy', '==', student_id)
             project_docs = projects_query.get()
             
-            projects = []
-            for doc in project_docs:
-                project_data = doc.to_dict()
-                projects.append({
-                    'project_id': project_data.get('id'),
-                    'project_name': project_data.get('name'),
-                    'data_uploaded': project_data.get('dataset', {}).get('records', 0),
-                    'model_trained': project_data.get('status') == 'trained',
-                    'tests_done': 0,  # TODO: Implement test tracking
-                    'scratch_linked': False,  # TODO: Implement Scratch linking tracking
-                    'created_at': project_data.get('createdAt'),
-                    'status': project_data.get('status')
-                })
-            
-            return projects
+            return [self._project_summary(doc.to_dict()) for doc in project_docs]
         except Exception as e:
             raise Exception(f"Failed to get student projects: {str(e)}")
     
+    async def get_projects_by_student_ids(self, student_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Get projects for many students with one query per 30 ids, grouped by student"""
+        try:
+            projects_by_student: Dict[str, List[Dict[str, Any]]] = {student_id: [] for student_id in student_ids}
+            
+            # Firestore 'in' filters accept at most 30 values
+            for start in range(0, len(student_ids), 30):
+                chunk = student_ids[start:start + 30]
+                project_docs = (
+                    self.projects_collection
+                    .where('createdBy', 'in', chunk)
+                    .select(['id', 'name', 'dataset.records', 'status', 'createdAt', 'createdBy'])
+                    .get()
+                )
+                for doc in project_docs:
+                    project_data = doc.to_dict()
+                    projects_by_student[project_data.get('createdBy')].append(self._project_summary(project_data))
+            
+            return projects_by_student
+        except Exception as e:
+            raise Exception(f"Failed to get projects by student ids: {str(e)}")
+    
+    @staticmethod
+    def _project_summary(project_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a project document for student/classroom listings"""
+        return {
+            'project_id': project_data.get('id'),
+            'project_name': project_data.get('name'),
+            'data_uploaded': project_data.get('dataset', {}).get('records', 0),
+            'model_trained': project_data.get('status') == 'trained',
+            'tests_done': 0,  # TODO: Implement test tracking
+            'scratch_linked': False,  # TODO: Implement Scratch linking tracking
+            'created_at': project_data.get('createdAt'),
+            'status': project_data.get('status')
+        }
+    
     async def get_students_by_classroom(self, classroom_id: str) -> List[Student]:
         """Get all students in a specific classroom"""
         try:
@@ -166,6 +190,19 @@ class StudentService:
         except Exception as e:
             raise Exception(f"Failed to get students by classroom: {str(e)}")
 
+    async def get_classroom_roster(self, classroom_id: str) -> List[Dict[str, Any]]:
+        """Get only the student_id and name of active students in a classroom"""
+        try:
+            query = (
+                self.collection
+                .where('classroom_id', '==', classroom_id)
+                .where('active', '==', True)
+                .select(['student_id', 'name'])
+            )
+            return [doc.to_dict() for doc in query.get()]
+        except Exception as e:
+            raise Exception(f"Failed to get classroom roster: {str(e)}")
+
     async def update_student(self, student_id: str, update_data: Dict[str, Any]) -> Student:
         """Update student information"""
         try:
@@ -181,6 +218,7 @@ class StudentService:
             # Update Firestore
             student_dict = student.model_dump()
             self.collection.document(student_id).set(student_dict)
+            get_classroom_response_cache().invalidate(student.classroom_id)
             
             return student
         except Exception as e:
@@ -199,6 +237,7 @@ class StudentService:
             
             # Delete student document
             self.collection.document(student_id).delete()
+            get_classroom_response_cache().invalidate(student.classroom_id)
             
             return True
         except Exception as e:
@@ -289,3 +328,15 @@ class StudentService:
             
         except Exception as e:
             raise Exception(f"Failed to get student demos: {str(e)}")
+
+
+# Global instance
+_student_service: Optional[StudentService] = None
+
+
+def get_student_service() -> StudentService:
+    """Get or create singleton StudentService instance"""
+    global _student_service
+    if _student_service is None:
+        _student_service = StudentService()
+    return _student_service
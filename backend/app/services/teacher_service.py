@@ -270,3 +270,15 @@ class TeacherService:
             return True
         except Exception as e:
             raise Exception(f"Failed to delete teacher: {str(e)}")
+
+
+# Global instance
+_teacher_service: Optional[TeacherService] = None
+
+
+def get_teacher_service() -> TeacherService:
+    """Get or create singleton TeacherService instance"""
+    global _teacher_service
+    if _teacher_service is None:
+        _teacher_service = TeacherService()
+    return _teacher_service
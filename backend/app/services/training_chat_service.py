@@ -18,10 +18,10 @@ from enum import Enum
 from google.cloud import firestore
 
 from ..config import gcp_clients
-from .vertex_ai_service import VertexAIService
-from .agent_service import AgentService
-from .knowledge_service import KnowledgeService
-from .rules_service import RulesService
+from .vertex_ai_service import get_vertex_ai_service
+from .agent_service import get_agent_service
+from .knowledge_service import get_knowledge_service
+from .rules_service import get_rules_service
 
 logger = logging.getLogger(__name__)
 
@@ -69,10 +69,10 @@ class TrainingChatService:
             self._chats_collection = self._firestore_client.collection('training_chats')
             
             # Initialize services
-            self._vertex_ai = VertexAIService(self._project_id)
-            self._agent_service = AgentService()
-            self._knowledge_service = KnowledgeService()
-            self._rules_service = RulesService()
+            self._vertex_ai = get_vertex_ai_service(self._project_id)
+            self._agent_service = get_agent_service()
+            self._knowledge_service = get_knowledge_service()
+            self._rules_service = get_rules_service()
             
             self._initialized = True
             logger.info("✅ TrainingChatService initialized")
@@ -1638,3 +1638,14 @@ Only respond with the JSON, no other text.{model_instructions}"""
             logger.error(f"❌ Error deleting training message: {e}", exc_info=True)
             return False
 
+
+# Global instance
+_training_chat_service: Optional[TrainingChatService] = None
+
+
+def get_training_chat_service() -> TrainingChatService:
+    """Get or create singleton TrainingChatService instance"""
+    global _training_chat_service
+    if _training_chat_service is None:
+        _training_chat_service = TrainingChatService()
+    return _training_chat_service
@@ -1,5 +1,5 @@
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator
 from google import genai
 from google.genai import types
 from vertexai.language_models import TextEmbeddingModel
@@ -164,6 +164,23 @@ Return ONLY a valid JSON object, no other text. Example format:
                 raise Exception(f"Model '{model_name or self.model_name}' may not be available. Supported models: gemini-2.5-flash-lite, gemini-2.5-pro. Error: {error_msg}")
             raise Exception(f"Failed to generate text: {error_msg}")
     
+    def generate_text_stream(self, prompt: str, model_name: Optional[str] = None) -> Iterator[str]:
+        """Generate text using specified model or default, yielding chunks as they are produced"""
+        try:
+            model = model_name or self.model_name
+            logger.info(f"🤖 Using model (streaming): {model}")
+            
+            for chunk in self.client.models.generate_content_stream(
+                model=model,
+                contents=prompt
+            ):
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(f"❌ Failed to stream text with model '{model_name or self.model_name}': {error_msg}")
+            raise Exception(f"Failed to generate text: {error_msg}")
+    
     def generate_text_with_search(self, prompt: str, enable_search: bool = False, model_name: Optional[str] = None) -> Dict[str, Any]:
         """
         Generate text using specified model or default with optional Google Search Grounding.
@@ -491,3 +508,14 @@ Return ONLY a valid JSON object, no other text."""
             return self.jaccard_similarity(vec1, vec2)
         else:  # Default to cosine similarity
             return self.cosine_similarity(vec1, vec2)
+
+
+# Global instances, one per project (each holds a genai client and aiplatform init)
+_vertex_ai_services: Dict[str, VertexAIService] = {}
+
+
+def get_vertex_ai_service(project_id: str) -> VertexAIService:
+    """Get or create singleton VertexAIService instance for a project"""
+    if project_id not in _vertex_ai_services:
+        _vertex_ai_services[project_id] = VertexAIService(project_id)
+    return _vertex_ai_services[project_id]
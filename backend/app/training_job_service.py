@@ -1,13 +1,14 @@
 import uuid
 import json
+import asyncio
 from datetime import datetime, timezone, timedelta
 from typing import List, Optional, Dict, Any
 from google.cloud import firestore, storage, pubsub_v1
 from google.cloud.exceptions import NotFound
 
 from .models import TrainingJob, TrainingJobStatus, Project, TextExample
-from .training_service import trainer
 from .config import gcp_clients
+from .services.response_cache import get_guest_projects_response_cache
 
 
 class TrainingJobService:
@@ -75,8 +76,24 @@ class TrainingJobService:
         self._ensure_initialized()
         return self._bucket
     
-    async def create_training_job(self, project_id: str, config: Optional[dict] = None) -> TrainingJob:
-        """Create a new training job and add to queue"""
+    async def create_training_job(self, project_id: str, config: Optional[dict] = None,
+                                  project_updates: Optional[Dict[str, Any]] = None) -> TrainingJob:
+        """Create a new training job and add to queue
+        
+        project_updates are extra fields written to the project in the same batch as the
+        job document and currentJobId.
+        """
+        # The sync Firestore/Pub/Sub clients block for every round-trip, so keep them off the event loop
+        return await asyncio.to_thread(self._create_training_job, project_id, config, project_updates)
+    
+    @staticmethod
+    def _invalidate_project_lists(student_id: Optional[str]):
+        """Drop cached project list pages for a guest session after one of its projects changes"""
+        if student_id:
+            get_guest_projects_response_cache().invalidate(student_id)
+    
+    def _create_training_job(self, project_id: str, config: Optional[dict],
+                             project_updates: Optional[Dict[str, Any]]) -> TrainingJob:
         try:
             # Check if project exists and has examples
             project_doc = self.projects_collection.document(project_id).get()
@@ -103,15 +120,17 @@ class TrainingJobService:
                 config=config
             )
             
-            # Save job to Firestore
-            self.jobs_collection.document(job_id).set(training_job.model_dump())
-            
-            # Update project with job ID
-            self.projects_collection.document(project_id).update({
+            # Save the job and point the project at it in one commit
+            batch = self.firestore_client.batch()
+            batch.set(self.jobs_collection.document(job_id), training_job.model_dump())
+            batch.update(self.projects_collection.document(project_id), {
                 'currentJobId': job_id,
                 'status': 'queued',
-                'updatedAt': datetime.now(timezone.utc).isoformat()
+                'updatedAt': datetime.now(timezone.utc).isoformat(),
+                **(project_updates or {})
             })
+            batch.commit()
+            self._invalidate_project_lists(project.student_id)
             
             # Publish job to Pub/Sub queue
             job_message = {
@@ -156,6 +175,10 @@ class TrainingJobService:
     
     async def process_training_job(self, job_id: str) -> bool:
         """Process a training job (called by worker)"""
+        # Deferred so importing this service (e.g. for job status) does not load the ML stack
+        from .training_service import trainer
+        
+        student_id = None
         try:
             # Get job details
             job_doc = self.jobs_collection.document(job_id).get()
@@ -185,6 +208,8 @@ class TrainingJobService:
             
             project_data = project_doc.to_dict()
             project = Project(**project_data)
+            student_id = project.student_id
+            self._invalidate_project_lists(student_id)
             
             if not project.dataset.examples:
                 raise Exception("No examples found for training")
@@ -210,7 +235,7 @@ class TrainingJobService:
             self.jobs_collection.document(job_id).update({'progress': 70.0})
             
             # Save model directly to GCS
-            model_filename = f"model_{job.projectId}.pkl"
+            model_filename = f"model_{job.projectId}.joblib"
             model_path = f"models/{job.projectId}/{model_filename}"
             
             # Save model directly to GCS without local storage
@@ -233,6 +258,7 @@ class TrainingJobService:
             }
             
             self.projects_collection.document(job.projectId).update(model_update)
+            self._invalidate_project_lists(student_id)
             
             # Update job as completed
             self.jobs_collection.document(job_id).update({
@@ -257,6 +283,7 @@ class TrainingJobService:
                 'status': 'failed',
                 'updatedAt': datetime.now(timezone.utc).isoformat()
             })
+            self._invalidate_project_lists(student_id)
             
             raise Exception(f"Training failed: {str(e)}")
     
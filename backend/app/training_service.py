@@ -1,3 +1,4 @@
+import io
 import joblib
 import pickle
 from typing import List, Dict, Any, Tuple, Optional
@@ -13,6 +14,8 @@ import re
 import spacy
 import logging
 
+from .services.model_cache import get_model_cache, get_distilbert_model_cache
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -157,6 +160,26 @@ class EnhancedTextPreprocessor:
         return ' '.join(tokens)
 
 
+# zlib level for joblib model artifacts - most of the size win at a fraction of level 9's cost
+_MODEL_COMPRESS_LEVEL = 3
+
+
+def _dump_model_data(model_data: Dict[str, Any], fileobj) -> None:
+    """Serialize model data with joblib (compressed, highest pickle protocol)"""
+    joblib.dump(model_data, fileobj, compress=_MODEL_COMPRESS_LEVEL, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_model_data(fileobj, path: str) -> Any:
+    """Deserialize model data written by joblib, or by plain pickle for legacy .pkl artifacts
+    
+    The format is chosen by path suffix, so a corrupt or incompatible joblib file raises
+    its own error instead of an unrelated unpickling one.
+    """
+    if path.endswith('.pkl'):
+        return pickle.load(fileobj)
+    return joblib.load(fileobj)
+
+
 class EnhancedLogisticRegressionTrainer:
     """Enhanced training service for logistic regression text classification"""
     
@@ -379,7 +402,7 @@ class EnhancedLogisticRegressionTrainer:
         try:
             # Load model
             with open(model_path, 'rb') as f:
-                model_data = pickle.load(f)
+                model_data = _load_model_data(f, model_path)
             
             # Handle different model formats
             if isinstance(model_data, dict):
@@ -460,55 +483,60 @@ class EnhancedLogisticRegressionTrainer:
                 'alternatives': []
             }
     
+    @staticmethod
+    def _load_model_from_gcs(bucket, gcs_path: str) -> Tuple[Any, Dict[str, str]]:
+        """Download and deserialize a saved pipeline as (pipeline, {training_text: label}) for exact matching"""
+        # Download model from GCS
+        blob = bucket.blob(gcs_path)
+        model_bytes = blob.download_as_bytes()
+        
+        # Deserialize model data
+        model_data = _load_model_data(io.BytesIO(model_bytes), gcs_path)
+        
+        # Handle different model formats
+        if isinstance(model_data, dict):
+            if 'pipeline' in model_data:
+                exact_labels: Dict[str, str] = {}
+                for training_text, training_label in zip(model_data.get('training_texts') or [], model_data.get('training_labels') or []):
+                    # First occurrence wins, as in the original linear scan
+                    exact_labels.setdefault(training_text, training_label)
+                return model_data['pipeline'], exact_labels
+            # Legacy format
+            raise ValueError("Model format not supported - only complete trained pipelines are supported")
+        # Very old format
+        return model_data, {}
+    
     def predict_from_gcs(self, text: str, bucket, gcs_path: str) -> Dict[str, Any]:
         """Make prediction using model stored in GCS with enhanced exact matching"""
         try:
-            # Download model from GCS
-            blob = bucket.blob(gcs_path)
-            model_bytes = blob.download_as_bytes()
-            
-            # Deserialize model data
-            model_data = pickle.loads(model_bytes)
-            
-            # Handle different model formats
-            if isinstance(model_data, dict):
-                if 'pipeline' in model_data:
-                    pipeline = model_data['pipeline']
-                    training_texts = model_data.get('training_texts', [])
-                    training_labels = model_data.get('training_labels', [])
-                else:
-                    # Legacy format
-                    raise ValueError("Model format not supported - only complete trained pipelines are supported")
-            else:
-                # Very old format
-                pipeline = model_data
-                training_texts = []
-                training_labels = []
+            # Deserialized pipelines stay resident between predictions (reloaded after retraining)
+            pipeline, exact_labels = get_model_cache().get_or_load(
+                bucket, gcs_path, gcs_path, self._load_model_from_gcs
+            )
             
             # Preprocess input text
             processed_text = self.preprocessor.preprocess_text(text)
             
             # Check for exact match in training data (NEW FEATURE)
-            if training_texts and training_labels:
-                for i, training_text in enumerate(training_texts):
-                    if processed_text == training_text:
-                        exact_label = training_labels[i]
-                        return {
-                            'label': exact_label,
-                            'confidence': 100.0,  # 100% confidence for exact matches
-                            'alternatives': []
-                        }
+            exact_label = exact_labels.get(processed_text)
+            if exact_label is not None:
+                return {
+                    'label': exact_label,
+                    'confidence': 100.0,  # 100% confidence for exact matches
+                    'alternatives': []
+                }
             
-            # Make prediction using the pipeline
-            prediction = pipeline.predict([processed_text])[0]
+            # Vectorize and score once; the predicted label is the most probable class
             probabilities = pipeline.predict_proba([processed_text])[0]
-            
-            # Get confidence and alternatives
-            confidence = max(probabilities) * 100
-            alternatives = []
+            best = int(np.argmax(probabilities))
             
             # Get class labels from the pipeline
             classes = pipeline.classes_
+            prediction = classes[best]
+            
+            # Get confidence and alternatives
+            confidence = probabilities[best] * 100
+            alternatives = []
             
             for i, (label, prob) in enumerate(zip(classes, probabilities)):
                 if label != prediction:
@@ -544,7 +572,7 @@ class EnhancedLogisticRegressionTrainer:
         }
         
         with open(model_path, 'wb') as f:
-            pickle.dump(model_data, f)
+            _dump_model_data(model_data, f)
         
         return model_path
     
@@ -565,7 +593,9 @@ class EnhancedLogisticRegressionTrainer:
         }
         
         # Serialize model data
-        model_bytes = pickle.dumps(model_data)
+        buffer = io.BytesIO()
+        _dump_model_data(model_data, buffer)
+        model_bytes = buffer.getvalue()
         
         # Upload to GCS with retry logic
         blob = bucket.blob(gcs_path)
@@ -923,30 +953,34 @@ class DistilBERTTrainer:
                                 raise upload_err
                     return False
                 
-                for root, dirs, files in os.walk(temp_dir):
-                    for file in files:
-                        local_path = os.path.join(root, file)
-                        file_size = os.path.getsize(local_path)
-                        
-                        # Read file content and upload directly to cloud
-                        with open(local_path, 'rb') as f:
-                            file_content = f.read()
-                        
-                        # Get relative path from temp_dir
-                        rel_path = os.path.relpath(local_path, temp_dir)
-                        # Use forward slashes for GCS
-                        gcs_file_path = f"{gcs_path}/{rel_path}".replace('\\', '/')
-                        
-                        # Upload with retry logic
-                        blob = bucket.blob(gcs_file_path)
-                        
-                        # Log file size for large files
-                        if file_size > 1024 * 1024:  # > 1MB
-                            logger.info(f"  📦 Uploading large file: {file} ({file_size / (1024*1024):.1f} MB)")
-                        
-                        upload_with_retry(blob, file_content, gcs_file_path)
-                        uploaded_files.append(gcs_file_path)
-                        logger.info(f"  ☁️ Uploaded to cloud: {gcs_file_path}")
+                local_paths = [os.path.join(root, file) for root, dirs, files in os.walk(temp_dir) for file in files]
+                # metadata.json goes last: its generation is the model cache key, so it must only
+                # change once the new weights and tokenizer are all in place
+                local_paths.sort(key=lambda path: os.path.relpath(path, temp_dir) == 'metadata.json')
+                
+                for local_path in local_paths:
+                    file = os.path.basename(local_path)
+                    file_size = os.path.getsize(local_path)
+                    
+                    # Read file content and upload directly to cloud
+                    with open(local_path, 'rb') as f:
+                        file_content = f.read()
+                    
+                    # Get relative path from temp_dir
+                    rel_path = os.path.relpath(local_path, temp_dir)
+                    # Use forward slashes for GCS
+                    gcs_file_path = f"{gcs_path}/{rel_path}".replace('\\', '/')
+                    
+                    # Upload with retry logic
+                    blob = bucket.blob(gcs_file_path)
+                    
+                    # Log file size for large files
+                    if file_size > 1024 * 1024:  # > 1MB
+                        logger.info(f"  📦 Uploading large file: {file} ({file_size / (1024*1024):.1f} MB)")
+                    
+                    upload_with_retry(blob, file_content, gcs_file_path)
+                    uploaded_files.append(gcs_file_path)
+                    logger.info(f"  ☁️ Uploaded to cloud: {gcs_file_path}")
                 
                 logger.info(f"✅ All files saved to cloud storage ({len(uploaded_files)} files)")
                 
@@ -970,112 +1004,129 @@ class DistilBERTTrainer:
             logger.error(f"Full traceback: {traceback.format_exc()}")
             raise Exception(f"Failed to save DistilBERT model: {str(e)}")
     
-    def predict_from_gcs(self, text: str, bucket, gcs_path: str) -> Dict[str, Any]:
-        """Make prediction using DistilBERT model stored in GCS"""
+    @staticmethod
+    def _load_model_from_gcs(bucket, gcs_path: str) -> Dict[str, Any]:
+        """Download a saved DistilBERT model directory and load tokenizer, model and metadata"""
         import tempfile
         import os
         import json
-        import torch
         from transformers import AutoTokenizer, AutoModelForSequenceClassification
         
+        # Create temporary directory for downloading model
+        with tempfile.TemporaryDirectory() as temp_dir:
+            logger.info(f"📥 Downloading DistilBERT model from GCS: {gcs_path}")
+            
+            # List all files in the GCS directory
+            blobs = bucket.list_blobs(prefix=gcs_path)
+            downloaded_files = []
+            
+            for blob in blobs:
+                # Get relative path
+                rel_path = blob.name.replace(gcs_path + '/', '')
+                if rel_path:  # Skip if it's the directory itself
+                    local_path = os.path.join(temp_dir, rel_path)
+                    # Create directory if needed
+                    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                    # Download file
+                    blob.download_to_filename(local_path)
+                    downloaded_files.append(rel_path)
+                    logger.info(f"  ✅ Downloaded: {rel_path}")
+            
+            if not downloaded_files:
+                raise ValueError(f"No model files found in GCS path: {gcs_path}")
+            
+            # Load metadata
+            metadata_path = os.path.join(temp_dir, 'metadata.json')
+            if not os.path.exists(metadata_path):
+                raise ValueError("metadata.json not found in model directory")
+            with open(metadata_path, 'r') as f:
+                metadata = json.load(f)
+            
+            # Load model and tokenizer
+            logger.info("🔄 Loading DistilBERT model and tokenizer...")
+            tokenizer = AutoTokenizer.from_pretrained(temp_dir)
+            model = AutoModelForSequenceClassification.from_pretrained(temp_dir)
+            model.eval()
+            logger.info("✅ Model loaded successfully")
+        
+        return {
+            'tokenizer': tokenizer,
+            'model': model,
+            'class_names': metadata.get('class_names', []),
+            'training_texts': metadata.get('training_texts', []),
+            'training_labels': metadata.get('training_labels', []),
+            'id_to_label': metadata.get('id_to_label', {}),
+        }
+    
+    def predict_from_gcs(self, text: str, bucket, gcs_path: str) -> Dict[str, Any]:
+        """Make prediction using DistilBERT model stored in GCS"""
+        import torch
+        
         try:
-            # Create temporary directory for downloading model
-            with tempfile.TemporaryDirectory() as temp_dir:
-                logger.info(f"📥 Downloading DistilBERT model from GCS: {gcs_path}")
-                
-                # List all files in the GCS directory
-                blobs = bucket.list_blobs(prefix=gcs_path)
-                downloaded_files = []
-                
-                for blob in blobs:
-                    # Get relative path
-                    rel_path = blob.name.replace(gcs_path + '/', '')
-                    if rel_path:  # Skip if it's the directory itself
-                        local_path = os.path.join(temp_dir, rel_path)
-                        # Create directory if needed
-                        os.makedirs(os.path.dirname(local_path), exist_ok=True)
-                        # Download file
-                        blob.download_to_filename(local_path)
-                        downloaded_files.append(rel_path)
-                        logger.info(f"  ✅ Downloaded: {rel_path}")
-                
-                if not downloaded_files:
-                    raise ValueError(f"No model files found in GCS path: {gcs_path}")
-                
-                # Load metadata
-                metadata_path = os.path.join(temp_dir, 'metadata.json')
-                if os.path.exists(metadata_path):
-                    with open(metadata_path, 'r') as f:
-                        metadata = json.load(f)
-                    class_names = metadata.get('class_names', [])
-                    training_texts = metadata.get('training_texts', [])
-                    training_labels = metadata.get('training_labels', [])
-                    id_to_label = metadata.get('id_to_label', {})
-                else:
-                    raise ValueError("metadata.json not found in model directory")
-                
-                # Check for exact match in training data
-                processed_text = text.lower().strip()
-                if training_texts and training_labels:
-                    for i, training_text in enumerate(training_texts):
-                        if processed_text == training_text.lower().strip():
-                            exact_label = training_labels[i]
-                            return {
-                                'label': exact_label,
-                                'confidence': 100.0,  # 100% confidence for exact matches
-                                'alternatives': []
-                            }
-                
-                # Load model and tokenizer
-                logger.info("🔄 Loading DistilBERT model and tokenizer...")
-                self.tokenizer = AutoTokenizer.from_pretrained(temp_dir)
-                self.model = AutoModelForSequenceClassification.from_pretrained(temp_dir)
-                self.model.eval()
-                logger.info("✅ Model loaded successfully")
-                
-                # Tokenize input text
-                inputs = self.tokenizer(
-                    text,
-                    truncation=True,
-                    padding='max_length',
-                    max_length=128,
-                    return_tensors='pt'
-                )
-                
-                # Make prediction
-                with torch.no_grad():
-                    outputs = self.model(**inputs)
-                    logits = outputs.logits
-                    
-                    # Apply softmax to get probabilities
-                    probabilities = torch.nn.functional.softmax(logits, dim=-1)[0]
-                    probabilities_np = probabilities.cpu().numpy()
-                
-                # Get predicted class
-                predicted_id = int(torch.argmax(probabilities, dim=-1).item())
-                predicted_label = id_to_label.get(predicted_id, class_names[predicted_id] if predicted_id < len(class_names) else 'unknown')
-                
-                # Calculate confidence (same as Logistic Regression: max probability * 100)
-                confidence = float(probabilities_np[predicted_id]) * 100
-                
-                # Get alternatives (all other classes)
-                alternatives = []
-                for i, prob in enumerate(probabilities_np):
-                    if i != predicted_id:
-                        label = id_to_label.get(i, class_names[i] if i < len(class_names) else f'class_{i}')
-                        alternatives.append({
-                            'label': label,
-                            'confidence': round(float(prob) * 100, 2)
-                        })
-                
-                # Sort alternatives by confidence
-                alternatives.sort(key=lambda x: x['confidence'], reverse=True)
+            # Loaded models stay resident between predictions; metadata.json is rewritten on retrain
+            loaded = get_distilbert_model_cache().get_or_load(
+                bucket, gcs_path, f"{gcs_path}/metadata.json", self._load_model_from_gcs
+            )
+            class_names = loaded['class_names']
+            training_texts = loaded['training_texts']
+            training_labels = loaded['training_labels']
+            id_to_label = loaded['id_to_label']
+            
+            # Check for exact match in training data
+            processed_text = text.lower().strip()
+            if training_texts and training_labels:
+                for i, training_text in enumerate(training_texts):
+                    if processed_text == training_text.lower().strip():
+                        exact_label = training_labels[i]
+                        return {
+                            'label': exact_label,
+                            'confidence': 100.0,  # 100% confidence for exact matches
+                            'alternatives': []
+                        }
+            
+            # Tokenize input text
+            inputs = loaded['tokenizer'](
+                text,
+                truncation=True,
+                padding='max_length',
+                max_length=128,
+                return_tensors='pt'
+            )
+            
+            # Make prediction
+            with torch.no_grad():
+                outputs = loaded['model'](**inputs)
+                logits = outputs.logits
                 
-                return {
-                    'label': predicted_label,
-                    'confidence': round(confidence, 2),
-                    'alternatives': alternatives[:2]  # Top 2 alternatives
-                }
+                # Apply softmax to get probabilities
+                probabilities = torch.nn.functional.softmax(logits, dim=-1)[0]
+                probabilities_np = probabilities.cpu().numpy()
+            
+            # Get predicted class
+            predicted_id = int(torch.argmax(probabilities, dim=-1).item())
+            predicted_label = id_to_label.get(predicted_id, class_names[predicted_id] if predicted_id < len(class_names) else 'unknown')
+            
+            # Calculate confidence (same as Logistic Regression: max probability * 100)
+            confidence = float(probabilities_np[predicted_id]) * 100
+            
+            # Get alternatives (all other classes)
+            alternatives = []
+            for i, prob in enumerate(probabilities_np):
+                if i != predicted_id:
+                    label = id_to_label.get(i, class_names[i] if i < len(class_names) else f'class_{i}')
+                    alternatives.append({
+                        'label': label,
+                        'confidence': round(float(prob) * 100, 2)
+                    })
+            
+            # Sort alternatives by confidence
+            alternatives.sort(key=lambda x: x['confidence'], reverse=True)
+            
+            return {
+                'label': predicted_label,
+                'confidence': round(confidence, 2),
+                'alternatives': alternatives[:2]  # Top 2 alternatives
+            }
                 
         except Exception as e:
             logger.error(f"❌ Failed to load/predict with DistilBERT model: {e}")